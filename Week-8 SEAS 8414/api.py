@@ -0,0 +1,164 @@
+"""
+Headless HTTP API for the Mini-SOAR pipeline (prediction -> attribution).
+
+Same models and feature encoding as the Streamlit UI, so SOAR playbooks can call
+them without going through Streamlit:
+
+    POST /classify          one input object   -> verdict + confidence
+    POST /classify/batch    JSON array          -> one result per input
+    POST /attribute         one input object   -> verdict + actor (only if MALICIOUS)
+    POST /attribute/batch   JSON array          -> one result per input
+    GET  /health            model availability
+
+Inputs use the sidebar field names from scoring.INPUT_FIELDS (e.g. {"url_length": "Long",
+"uses_ip": true}) and/or a raw "url" (lexical features via url_features.py); missing
+fields take the UI defaults. Every response carries "timings_ms" for the request.
+
+Models are loaded once per worker process, so run it multi-worker with e.g.:
+    gunicorn -w 4 -b 0.0.0.0:8000 api:app
+"""
+import os
+import time
+import threading
+
+import pandas as pd
+from flask import Flask, request, jsonify
+
+from scoring import MODEL_DIR, load_artifacts, encode_inputs, classify_frame, attribute_frame
+
+# Rows scored per predict_model call; bounds memory for very large arrays
+BATCH_SIZE = int(os.environ.get("API_BATCH_SIZE", "1000"))
+MAX_BATCH = int(os.environ.get("API_MAX_BATCH", "50000"))
+
+app = Flask(__name__)
+
+# Seconds between load attempts while some model is still missing (e.g. training still running)
+RELOAD_INTERVAL = float(os.environ.get("API_MODEL_RELOAD_SECONDS", "5"))
+
+_artifacts = None
+_artifacts_loaded_at = 0.0
+_artifacts_lock = threading.Lock()
+
+
+def _needs_load():
+    if _artifacts is None:
+        return True
+    missing = any(a is None for a in _artifacts)
+    return missing and time.monotonic() - _artifacts_loaded_at >= RELOAD_INTERVAL
+
+
+def get_artifacts():
+    """
+    Load the models on first use and keep them for the lifetime of the worker once all of them
+    exist. While any is missing, loading is retried at most every RELOAD_INTERVAL seconds.
+    """
+    global _artifacts, _artifacts_loaded_at
+    if _needs_load():
+        with _artifacts_lock:
+            if _needs_load():
+                _artifacts = load_artifacts(MODEL_DIR)
+                _artifacts_loaded_at = time.monotonic()
+    return _artifacts
+
+
+def _chunks(frame: pd.DataFrame):
+    for start in range(0, len(frame), BATCH_SIZE):
+        yield frame.iloc[start:start + BATCH_SIZE]
+
+
+def _read_inputs(batch: bool):
+    """Return (records, error_response) from the JSON body."""
+    payload = request.get_json(silent=True)
+    if batch:
+        if not isinstance(payload, list) or not payload:
+            return None, (jsonify({"error": "Expected a non-empty JSON array"}), 400)
+        if len(payload) > MAX_BATCH:
+            return None, (jsonify({"error": f"Batch too large (max {MAX_BATCH})"}), 413)
+        records = payload
+    else:
+        records = [payload]
+    if not all(isinstance(r, dict) for r in records):
+        return None, (jsonify({"error": "Each input must be a JSON object"}), 400)
+    return records, None
+
+
+def _score(batch: bool, attribute: bool):
+    t0 = time.perf_counter()
+    cls_model, clu_model, cluster_map = get_artifacts()
+    if cls_model is None:
+        return jsonify({"error": "Classifier not found. Run `python train_model.py` first."}), 503
+    if attribute and (clu_model is None or cluster_map is None):
+        return jsonify({"error": "Attribution model or mapping not found. Re-run `train_model.py`."}), 503
+
+    records, error = _read_inputs(batch)
+    if error:
+        return error
+    try:
+        feats = encode_inputs(records)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    t_encode = time.perf_counter()
+
+    verdicts, confidences = [], []
+    for chunk in _chunks(feats):
+        v, c = classify_frame(cls_model, chunk)
+        verdicts.extend(v)
+        confidences.extend(c)
+    results = [{"verdict": v, "confidence": c} for v, c in zip(verdicts, confidences)]
+    t_classify = time.perf_counter()
+
+    timings = {
+        "encode": (t_encode - t0) * 1000,
+        "classify": (t_classify - t_encode) * 1000,
+    }
+    if attribute:
+        # Attribution only runs on MALICIOUS rows, as in the UI
+        malicious = [i for i, v in enumerate(verdicts) if v == "MALICIOUS"]
+        for result in results:
+            result.update({"cluster_id": None, "mapped_actor": None})
+        if malicious:
+            positions = iter(malicious)
+            for chunk in _chunks(feats.iloc[malicious]):
+                for cid, actor in attribute_frame(clu_model, cluster_map, chunk):
+                    results[next(positions)].update({"cluster_id": cid, "mapped_actor": actor})
+        timings["attribute"] = (time.perf_counter() - t_classify) * 1000
+    timings["total"] = (time.perf_counter() - t0) * 1000
+
+    timings = {k: round(v, 3) for k, v in timings.items()}
+    if batch:
+        return jsonify({"results": results, "count": len(results), "timings_ms": timings})
+    return jsonify({**results[0], "timings_ms": timings})
+
+
+@app.route('/health')
+def health():
+    cls_model, clu_model, cluster_map = get_artifacts()
+    return jsonify({
+        "classifier": cls_model is not None,
+        "attribution": clu_model is not None and cluster_map is not None,
+        "pid": os.getpid(),
+    })
+
+
+@app.route('/classify', methods=['POST'])
+def classify():
+    return _score(batch=False, attribute=False)
+
+
+@app.route('/classify/batch', methods=['POST'])
+def classify_batch():
+    return _score(batch=True, attribute=False)
+
+
+@app.route('/attribute', methods=['POST'])
+def attribute():
+    return _score(batch=False, attribute=True)
+
+
+@app.route('/attribute/batch', methods=['POST'])
+def attribute_batch():
+    return _score(batch=True, attribute=True)
+
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=int(os.environ.get("API_PORT", "8000")))
@@ -1,29 +1,17 @@
-import os
-import json
 import streamlit as st
-import pandas as pd
 
 # PyCaret helpers
-from pycaret.classification import load_model as load_cls_model, predict_model as predict_cls
-from pycaret.clustering import load_model as load_clu_model, predict_model as predict_clu
+from pycaret.classification import predict_model as predict_cls
+from pycaret.clustering import predict_model as predict_clu
+
+from scoring import MODEL_DIR, load_artifacts, encode_inputs
 
 st.set_page_config(page_title="Mini-SOAR: Prediction → Attribution", layout="wide")
 st.title("🧠 Mini-SOAR: From Prediction to Attribution")
 
-MODEL_DIR = os.environ.get("MODEL_DIR", "models")
-CLS_PATH = os.path.join(MODEL_DIR, "phishing_url_detector")
-CLU_PATH = os.path.join(MODEL_DIR, "threat_actor_profiler")
-MAP_PATH = os.path.join(MODEL_DIR, "cluster_mapping.json")
-
 @st.cache_resource
 def _load_artifacts():
-    cls = load_cls_model(CLS_PATH) if os.path.exists(CLS_PATH + ".pkl") else None
-    clu = load_clu_model(CLU_PATH) if os.path.exists(CLU_PATH + ".pkl") else None
-    mapping = None
-    if os.path.exists(MAP_PATH):
-        with open(MAP_PATH, "r") as f:
-            mapping = {int(k): v for k, v in json.load(f).items()}
-    return cls, clu, mapping
+    return load_artifacts(MODEL_DIR)
 
 cls_model, clu_model, cluster_map = _load_artifacts()
 
@@ -57,22 +45,22 @@ with st.sidebar:
 
     submitted = st.button("Analyze", type="primary", use_container_width=True)
 
-# Map UI → model feature values (match train_model.py encoding)
+# Map UI → model feature values (match train_model.py encoding, see scoring.py)
 def build_feature_row():
-    return pd.DataFrame([{
-        "having_IP_Address": 1 if uses_ip else -1,
-        "URL_Length": {"Short": -1, "Normal": 0, "Long": 1}[url_length],
-        "Shortining_Service": 1 if shortened else -1,
-        "having_At_Symbol": 1 if has_at_symbol else -1,
-        "double_slash_redirecting": 1 if double_slash_redirect else -1,
-        "Prefix_Suffix": 1 if prefix_suffix else -1,
-        "having_Sub_Domain": {"None": -1, "One": 0, "Many": 1}[subdomains],
-        "SSLfinal_State": {"Trusted": 1, "None": 0, "Suspicious": -1}[ssl_state],
-        "URL_of_Anchor": {"Low/Benign": 1, "Neutral": 0, "High/Suspicious": -1}[url_of_anchor],
-        "Links_in_tags": {"Low/Benign": 1, "Neutral": 0, "High/Suspicious": -1}[links_in_tags],
-        "SFH": {"Low/Benign": 1, "Neutral": 0, "High/Suspicious": -1}[sfh],
-        "Abnormal_URL": 1 if abnormal_url else -1,
-        "has_political_keyword": 1 if has_political_keyword else 0,
+    return encode_inputs([{
+        "uses_ip": uses_ip,
+        "url_length": url_length,
+        "shortened": shortened,
+        "has_at_symbol": has_at_symbol,
+        "double_slash_redirect": double_slash_redirect,
+        "prefix_suffix": prefix_suffix,
+        "subdomains": subdomains,
+        "ssl_state": ssl_state,
+        "url_of_anchor": url_of_anchor,
+        "links_in_tags": links_in_tags,
+        "sfh": sfh,
+        "abnormal_url": abnormal_url,
+        "has_political_keyword": has_political_keyword,
     }])
 
 # Tabs
@@ -0,0 +1,157 @@
+"""
+Shared scoring helpers for the Mini-SOAR models.
+
+Used by both the Streamlit UI (app.py) and the headless API (api.py) so that
+artifact loading and the UI -> model feature encoding stay identical.
+"""
+import os
+import json
+import pandas as pd
+
+MODEL_DIR = os.environ.get("MODEL_DIR", "models")
+
+# Column order used by train_model.py
+FEATURE_COLUMNS = [
+    "having_IP_Address",
+    "URL_Length",
+    "Shortining_Service",
+    "having_At_Symbol",
+    "double_slash_redirecting",
+    "Prefix_Suffix",
+    "having_Sub_Domain",
+    "SSLfinal_State",
+    "URL_of_Anchor",
+    "Links_in_tags",
+    "SFH",
+    "Abnormal_URL",
+    "has_political_keyword",
+]
+
+URL_LENGTH = {"Short": -1, "Normal": 0, "Long": 1}
+SUBDOMAINS = {"None": -1, "One": 0, "Many": 1}
+SSL_STATE = {"Trusted": 1, "None": 0, "Suspicious": -1}
+TRI_LEVEL = {"Low/Benign": 1, "Neutral": 0, "High/Suspicious": -1}
+
+# Input field -> (model column, encoding). Checkbox fields encode as {True: on, False: off}.
+INPUT_FIELDS = {
+    "uses_ip": ("having_IP_Address", {True: 1, False: -1}),
+    "url_length": ("URL_Length", URL_LENGTH),
+    "shortened": ("Shortining_Service", {True: 1, False: -1}),
+    "has_at_symbol": ("having_At_Symbol", {True: 1, False: -1}),
+    "double_slash_redirect": ("double_slash_redirecting", {True: 1, False: -1}),
+    "prefix_suffix": ("Prefix_Suffix", {True: 1, False: -1}),
+    "subdomains": ("having_Sub_Domain", SUBDOMAINS),
+    "ssl_state": ("SSLfinal_State", SSL_STATE),
+    "url_of_anchor": ("URL_of_Anchor", TRI_LEVEL),
+    "links_in_tags": ("Links_in_tags", TRI_LEVEL),
+    "sfh": ("SFH", TRI_LEVEL),
+    "abnormal_url": ("Abnormal_URL", {True: 1, False: -1}),
+    "has_political_keyword": ("has_political_keyword", {True: 1, False: 0}),
+}
+
+# Same defaults as the Streamlit sidebar
+DEFAULT_INPUTS = {
+    "uses_ip": False,
+    "url_length": "Normal",
+    "shortened": False,
+    "has_at_symbol": False,
+    "double_slash_redirect": False,
+    "prefix_suffix": False,
+    "subdomains": "One",
+    "ssl_state": "Trusted",
+    "url_of_anchor": "Neutral",
+    "links_in_tags": "Neutral",
+    "sfh": "High/Suspicious",
+    "abnormal_url": False,
+    "has_political_keyword": False,
+}
+
+
+def load_artifacts(model_dir: str = MODEL_DIR):
+    """Load (classifier, clusterer, cluster->actor mapping); missing artifacts are returned as None."""
+    # PyCaret is imported lazily so lightweight users of this module (e.g. url_features.py) don't pay for it
+    from pycaret.classification import load_model as load_cls_model
+    from pycaret.clustering import load_model as load_clu_model
+
+    cls_path = os.path.join(model_dir, "phishing_url_detector")
+    clu_path = os.path.join(model_dir, "threat_actor_profiler")
+    map_path = os.path.join(model_dir, "cluster_mapping.json")
+
+    cls = load_cls_model(cls_path) if os.path.exists(cls_path + ".pkl") else None
+    clu = load_clu_model(clu_path) if os.path.exists(clu_path + ".pkl") else None
+    mapping = None
+    if os.path.exists(map_path):
+        with open(map_path, "r") as f:
+            mapping = {int(k): v for k, v in json.load(f).items()}
+    return cls, clu, mapping
+
+
+def encode_inputs(records) -> pd.DataFrame:
+    """
+    Encode a list of UI-style input dicts into model features (one row per record).
+
+    Missing fields fall back to DEFAULT_INPUTS. A record may also carry a raw "url", whose
+    lexical features (see url_features.py) replace the matching UI fields, and/or already-encoded
+    model columns (e.g. "SSLfinal_State": -1), which take precedence over both.
+    Encoding is done column-wise so large batches stay vectorized.
+
+    Raises:
+        ValueError: if a field holds a value outside its allowed choices.
+    """
+    raw = pd.DataFrame.from_records(list(records))
+    n = len(raw)
+    lexical = None
+    if "url" in raw:
+        from url_features import LEXICAL_COLUMNS, extract_features
+
+        has_url = raw["url"].map(lambda u: isinstance(u, str) and bool(u.strip()))
+        lexical = pd.DataFrame(
+            [extract_features(u) for u in raw.loc[has_url, "url"]],
+            index=raw.index[has_url], columns=FEATURE_COLUMNS,
+        )[LEXICAL_COLUMNS].reindex(raw.index)
+    encoded = {}
+    for field, (column, choices) in INPUT_FIELDS.items():
+        if field in raw:
+            values = raw[field].astype(object).where(raw[field].notna(), DEFAULT_INPUTS[field])
+        else:
+            values = pd.Series([DEFAULT_INPUTS[field]] * n, index=raw.index, dtype=object)
+        mapped = values.map(choices)
+        if mapped.isna().any():
+            bad = values[mapped.isna()].iloc[0]
+            raise ValueError(f"Invalid value for '{field}': {bad!r}. Expected one of {list(choices)}")
+
+        if lexical is not None and column in lexical:
+            mapped = lexical[column].where(lexical[column].notna(), mapped)
+        if column in raw:
+            override = pd.to_numeric(raw[column], errors="coerce")
+            mapped = override.where(override.notna(), mapped)
+        encoded[column] = mapped.astype(int)
+    return pd.DataFrame(encoded, index=raw.index, columns=FEATURE_COLUMNS)
+
+
+def cluster_id(value) -> int:
+    """Normalize a PyCaret cluster label (0 or 'Cluster 0') to an int."""
+    return int(str(value).rsplit(" ", 1)[-1])
+
+
+def classify_frame(cls_model, feats: pd.DataFrame):
+    """Score a feature frame; returns (verdicts, confidences). Confidences are None without score columns."""
+    from pycaret.classification import predict_model as predict_cls
+
+    pred = predict_cls(cls_model, data=feats)
+    verdicts = pred["prediction_label"].astype(str).tolist()
+    score_cols = [c for c in pred.columns if c.lower().startswith("score")]
+    if score_cols:
+        confidences = pred[score_cols].max(axis=1).astype(float).tolist()
+    else:
+        confidences = [None] * len(pred)
+    return verdicts, confidences
+
+
+def attribute_frame(clu_model, mapping, feats: pd.DataFrame):
+    """Assign clusters to a feature frame; returns a list of (cluster_id, actor)."""
+    from pycaret.clustering import predict_model as predict_clu
+
+    clu_pred = predict_clu(clu_model, data=feats)
+    ids = [cluster_id(v) for v in clu_pred["Cluster"]]
+    return [(cid, mapping.get(cid, "Unknown")) for cid in ids]
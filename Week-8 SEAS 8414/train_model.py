@@ -1,5 +1,14 @@
 import os
+import sys
 import json
+import time
+import signal
+import argparse
+import threading
+import multiprocessing as mp
+from contextlib import contextmanager
+from queue import Empty
+
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt  
@@ -134,64 +143,400 @@ def generate_synthetic_data(num_samples: int = 500) -> pd.DataFrame:
     return df
 
 
-def train_models(df: pd.DataFrame, out_dir: str = "models") -> None:
+class StageProfiler:
     """
-    Minimal additions to meet objectives:
-    - Train classifier (BENIGN vs MALICIOUS) with PyCaret Classification
-    - Train clustering model (K-Means, k=3) with PyCaret Clustering
-    - Save both models and a cluster→actor mapping to JSON
+    Records wall time, CPU time and peak RSS for each named training stage.
+
+    On Linux both cover the whole process tree, since with n_jobs most of the work runs in
+    joblib/loky worker processes: CPU time is summed from /proc/<pid>/stat (including reaped
+    children) and peak RSS is the largest sum of resident memory across the tree, sampled in a
+    background thread (pages shared between processes are counted once per process). Elsewhere
+    only the calling process is measured; each record's "scope" says which applies.
     """
-    os.makedirs(out_dir, exist_ok=True)
 
-    #Classification
-    cls_setup = setup(
-        data=df.copy(),
-        target="label",
-        session_id=RANDOM_STATE,
-        train_size=0.8,
-        fold=5,
-        silent=True,
-        verbose=False,
-    )
-    best_cls = compare_models()
-    best_cls = finalize_model(best_cls)
-    save_model(best_cls, os.path.join(out_dir, "phishing_url_detector"))
+    def __init__(self, pipeline: str, budgets: dict = None, default_budget: float = None,
+                 sample_interval: float = 0.05, on_record=None):
+        self.pipeline = pipeline
+        self.budgets = budgets or {}
+        self.default_budget = default_budget
+        self.sample_interval = sample_interval
+        self.on_record = on_record
+        self.records = []
+
+    def budget_for(self, stage: str):
+        """Budget in seconds for a stage: '<pipeline>.<stage>', then '<stage>', then the default."""
+        for key in (f"{self.pipeline}.{stage}", stage):
+            if key in self.budgets:
+                return self.budgets[key]
+        return self.default_budget
+
+    @contextmanager
+    def stage(self, name: str):
+        peak = [_tree_rss()]
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(self.sample_interval):
+                peak[0] = max(peak[0], _tree_rss())
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        wall0, cpu0 = time.perf_counter(), _tree_cpu()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "failed"
+            raise
+        finally:
+            wall, cpu = time.perf_counter() - wall0, _tree_cpu() - cpu0
+            done.set()
+            sampler.join()
+            peak_rss = max(peak[0], _tree_rss()) or _max_rss()
+            budget = self.budget_for(name)
+            if status == "ok" and budget is not None and wall > budget:
+                status = "over_budget"
+            record = {
+                "pipeline": self.pipeline,
+                "stage": name,
+                "wall_s": round(wall, 3),
+                "cpu_s": round(cpu, 3),
+                "peak_rss_mb": round(peak_rss / 2 ** 20, 1),
+                "scope": PROFILE_SCOPE,
+                "budget_s": budget,
+                "status": status,
+            }
+            self.records.append(record)
+            if self.on_record:
+                self.on_record(record)
+
+
+PROFILE_SCOPE = "process_tree" if os.path.exists("/proc/self/stat") else "process"
+
+
+def _process_tree() -> list:
+    """This process and all of its descendants (Linux); just this process elsewhere."""
+    pids, todo = [], [os.getpid()]
+    while todo:
+        pid = todo.pop()
+        pids.append(pid)
+        try:
+            for task in os.listdir(f"/proc/{pid}/task"):
+                with open(f"/proc/{pid}/task/{task}/children") as f:
+                    todo.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass  # exited meanwhile, or no /proc
+    return pids
+
+
+def _tree_cpu() -> float:
+    """CPU seconds used so far by the process tree, including children it has reaped."""
+    if PROFILE_SCOPE != "process_tree":
+        return time.process_time()
+    ticks = 0
+    for pid in _process_tree():
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        ticks += sum(int(v) for v in fields[11:15])  # utime, stime, cutime, cstime
+    return ticks / os.sysconf("SC_CLK_TCK")
 
-    # Clustering
+
+def _tree_rss() -> int:
+    """Resident bytes summed over the process tree."""
+    total = 0
+    for pid in _process_tree():
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, AttributeError):
+            continue
+    return total
+
+
+def _max_rss() -> int:
+    try:
+        import resource
+    except ImportError:
+        return 0
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def _train_classifier(df: pd.DataFrame, out_dir: str, profiler: StageProfiler, n_jobs: int = -1) -> None:
+    """Train and save the BENIGN vs MALICIOUS classifier with PyCaret Classification."""
+    with profiler.stage("setup"):
+        setup(
+            data=df.copy(),
+            target="label",
+            session_id=RANDOM_STATE,
+            train_size=0.8,
+            fold=5,
+            n_jobs=n_jobs,
+            silent=True,
+            verbose=False,
+        )
+    with profiler.stage("compare_models"):
+        budget = profiler.budget_for("compare_models")
+        # PyCaret's budget_time is in minutes and stops the sweep between models
+        best_cls = compare_models(budget_time=budget / 60 if budget else None)
+    with profiler.stage("finalize_model"):
+        best_cls = finalize_model(best_cls)
+    with profiler.stage("save_model"):
+        save_model(best_cls, os.path.join(out_dir, "phishing_url_detector"))
+
+
+def _train_clusterer(df: pd.DataFrame, out_dir: str, profiler: StageProfiler, n_jobs: int = -1) -> dict:
+    """Train and save the K-Means (k=3) actor profiler; returns the cluster -> actor mapping."""
     # IMPORTANT: clustering uses features-only; keep actor_profile to build mapping
     features_only = df.drop(columns=["label"]).copy()
     actor_series = features_only.pop("actor_profile")
 
-    clu_setup(
-        data=features_only.copy(),
-        session_id=RANDOM_STATE,
-        normalize=True,
-        silent=True,
-        verbose=False,
-    )
-    kmeans = clu_create_model("kmeans", num_clusters=3)
-    clustered = clu_assign_model(kmeans, transformation=True)
+    with profiler.stage("setup"):
+        clu_setup(
+            data=features_only.copy(),
+            session_id=RANDOM_STATE,
+            normalize=True,
+            n_jobs=n_jobs,
+            silent=True,
+            verbose=False,
+        )
+    with profiler.stage("clustering"):
+        kmeans = clu_create_model("kmeans", num_clusters=3)
+        clustered = clu_assign_model(kmeans, transformation=True)
 
-    # Build majority mapping: cluster id -> dominant actor_profile
-    mapping = {}
-    for cid in sorted(clustered["Cluster"].unique()):
-        subset = clustered[clustered["Cluster"] == cid]
-        maj = actor_series.loc[subset.index].dropna().value_counts().idxmax()
-        mapping[int(cid)] = str(maj)
+    with profiler.stage("mapping"):
+        # Build majority mapping: cluster id -> dominant actor_profile
+        mapping = {}
+        for cid in sorted(clustered["Cluster"].unique()):
+            subset = clustered[clustered["Cluster"] == cid]
+            maj = actor_series.loc[subset.index].dropna().value_counts().idxmax()
+            mapping[int(cid)] = str(maj)
 
-    clu_save_model(kmeans, os.path.join(out_dir, "threat_actor_profiler"))
-    with open(os.path.join(out_dir, "cluster_mapping.json"), "w") as f:
-        json.dump(mapping, f, indent=2)
+    with profiler.stage("save_model"):
+        clu_save_model(kmeans, os.path.join(out_dir, "threat_actor_profiler"))
+        with open(os.path.join(out_dir, "cluster_mapping.json"), "w") as f:
+            json.dump(mapping, f, indent=2)
+    return mapping
 
-    # Optional: persist data for testing
-    df.to_csv(os.path.join(out_dir, "synthetic_urls.csv"), index=False)
 
+PIPELINES = {
+    "classification": _train_classifier,
+    "clustering": _train_clusterer,
+}
+STAGES = {
+    "classification": ["setup", "compare_models", "finalize_model", "save_model"],
+    "clustering": ["setup", "clustering", "mapping", "save_model"],
+}
+
+
+def _write_profile(out_dir: str, records: list, mode: str, total_wall: float, n_jobs: int) -> str:
+    path = os.path.join(out_dir, "training_profile.json")
+    with open(path, "w") as f:
+        json.dump({
+            "mode": mode,
+            "n_jobs": n_jobs,
+            "total_wall_s": round(total_wall, 3),
+            "stages": records,
+        }, f, indent=2)
+
+    print(f"\nTraining profile ({mode}, total {total_wall:.1f}s):")
+    for r in records:
+        cpu = "-" if r["cpu_s"] is None else f"{r['cpu_s']:.2f}s"
+        peak = "-" if r["peak_rss_mb"] is None else f"{r['peak_rss_mb']:.1f} MB"
+        print(f"  {r['pipeline'] + '.' + r['stage']:<34} wall {r['wall_s']:>8.2f}s  cpu {cpu:>9}  "
+              f"peak {peak:>11}  {r['status']}")
+    return path
+
+
+def _print_saved(out_dir: str, mapping: dict) -> None:
     print("Saved classification model   ->", os.path.join(out_dir, "phishing_url_detector.pkl"))
     print("Saved clustering model       ->", os.path.join(out_dir, "threat_actor_profiler.pkl"))
     print("Saved cluster→actor mapping  ->", os.path.join(out_dir, "cluster_mapping.json"))
+    print("Saved training profile       ->", os.path.join(out_dir, "training_profile.json"))
     print("Mapping:", json.dumps(mapping, indent=2))
 
 
+def train_models(df: pd.DataFrame, out_dir: str = "models", n_jobs: int = -1,
+                 stage_budget: float = None, budgets: dict = None) -> None:
+    """
+    Minimal additions to meet objectives:
+    - Train classifier (BENIGN vs MALICIOUS) with PyCaret Classification
+    - Train clustering model (K-Means, k=3) with PyCaret Clustering
+    - Save both models and a cluster→actor mapping to JSON
+    - Write per-stage wall/CPU/memory to training_profile.json
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+
+    cls_profiler = StageProfiler("classification", budgets, stage_budget)
+    _train_classifier(df, out_dir, cls_profiler, n_jobs)
+    clu_profiler = StageProfiler("clustering", budgets, stage_budget)
+    mapping = _train_clusterer(df, out_dir, clu_profiler, n_jobs)
+
+    # Optional: persist data for testing
+    df.to_csv(os.path.join(out_dir, "synthetic_urls.csv"), index=False)
+
+    _write_profile(out_dir, cls_profiler.records + clu_profiler.records, "sequential",
+                   time.perf_counter() - start, n_jobs)
+    _print_saved(out_dir, mapping)
+
+
+# How often the parent checks on workers while waiting for their results
+WORKER_POLL_SECONDS = 1.0
+
+
+def _pipeline_worker(pipeline, df, out_dir, n_jobs, stage_budget, budgets, queue):
+    if hasattr(os, "setsid"):
+        # Own process group, so a budget kill also reaches the joblib/loky workers
+        os.setsid()
+    # Stage records are streamed to the parent so they survive a budget kill
+    profiler = StageProfiler(pipeline, budgets, stage_budget,
+                             on_record=lambda record: queue.put(("stage", pipeline, record)))
+    try:
+        result = PIPELINES[pipeline](df, out_dir, profiler, n_jobs)
+        queue.put(("done", pipeline, result, None))
+    except Exception as e:
+        queue.put(("done", pipeline, None, f"{type(e).__name__}: {e}"))
+
+
+def _kill_pipeline(proc, grace: float = 5.0) -> None:
+    """Terminate a pipeline worker together with the processes it started."""
+    def signal_group(sig):
+        try:
+            os.killpg(proc.pid, sig)
+        except (ProcessLookupError, PermissionError, AttributeError):
+            pass  # the worker has not called setsid yet, or the group is gone
+
+    signal_group(getattr(signal, "SIGTERM", None))
+    proc.terminate()
+    proc.join(grace)
+    if hasattr(signal, "SIGKILL"):
+        signal_group(signal.SIGKILL)
+        if proc.is_alive():
+            proc.kill()
+
+
+def train_models_parallel(df: pd.DataFrame, out_dir: str = "models", n_jobs: int = None,
+                          stage_budget: float = None, budgets: dict = None) -> None:
+    """
+    Same outputs as train_models, but the classification and clustering pipelines run in
+    separate processes, each with its own n_jobs (default: half the cores each).
+
+    compare_models honours its stage budget natively (PyCaret budget_time). When every stage
+    of a pipeline has a budget, the sum is also enforced as a hard limit on that pipeline's
+    process, which is terminated and reported as "timed_out" if it overruns.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    if n_jobs is None:
+        n_jobs = max(1, (os.cpu_count() or 2) // len(PIPELINES))
+
+    # spawn, not fork: PyCaret/joblib state and threads don't survive fork cleanly
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    procs, deadlines = {}, {}
+    for pipeline in PIPELINES:
+        probe = StageProfiler(pipeline, budgets, stage_budget)
+        stage_budgets = [probe.budget_for(s) for s in STAGES[pipeline]]
+        if all(b is not None for b in stage_budgets):
+            deadlines[pipeline] = start + sum(stage_budgets)
+        procs[pipeline] = ctx.Process(
+            target=_pipeline_worker,
+            args=(pipeline, df, out_dir, n_jobs, stage_budget, budgets, queue),
+            name=f"train-{pipeline}",
+        )
+        procs[pipeline].start()
+
+    records = {p: [] for p in procs}
+    results, errors = {}, {}
+    pending = set(procs)
+
+    def handle(kind, pipeline, *payload):
+        if kind == "stage":
+            records[pipeline].append(payload[0])
+            return
+        pending.discard(pipeline)
+        results[pipeline], error = payload
+        if error:
+            errors[pipeline] = error
+
+    while pending:
+        live = [deadlines[p] for p in pending if p in deadlines]
+        # Bounded even without deadlines, so a worker that dies silently is noticed
+        timeout = WORKER_POLL_SECONDS
+        if live:
+            timeout = min(timeout, max(0.0, min(live) - time.perf_counter()))
+        try:
+            handle(*queue.get(timeout=timeout))
+            continue
+        except Empty:
+            pass
+        now = time.perf_counter()
+        for p in [p for p in pending if p in deadlines and now >= deadlines[p]]:
+            _kill_pipeline(procs[p])
+            pending.discard(p)
+            errors[p] = "pipeline exceeded its total stage budget"
+            # The stage that was running when the budget ran out
+            done_stages = len(records[p])
+            running = STAGES[p][done_stages] if done_stages < len(STAGES[p]) else "shutdown"
+            elapsed = now - start - sum(r["wall_s"] for r in records[p])
+            records[p].append({
+                "pipeline": p, "stage": running, "wall_s": round(elapsed, 3), "cpu_s": None,
+                "peak_rss_mb": None, "scope": PROFILE_SCOPE, "budget_s": StageProfiler(p, budgets, stage_budget).budget_for(running),
+                "status": "timed_out",
+            })
+        dead = [p for p in pending if not procs[p].is_alive()]
+        if dead:
+            # Take anything a worker posted just before exiting, then give up on the rest
+            try:
+                while True:
+                    handle(*queue.get(timeout=0.1))
+            except Empty:
+                pass
+            for p in [p for p in dead if p in pending]:
+                _kill_pipeline(procs[p])  # its loky workers may have outlived it
+                pending.discard(p)
+                errors[p] = f"worker process died (exit code {procs[p].exitcode})"
+    for proc in procs.values():
+        proc.join()
+
+    df.to_csv(os.path.join(out_dir, "synthetic_urls.csv"), index=False)
+    all_records = [r for p in PIPELINES for r in records[p]]
+    _write_profile(out_dir, all_records, "parallel", time.perf_counter() - start, n_jobs)
+    if errors:
+        raise RuntimeError("Training failed: " + "; ".join(f"{p}: {e}" for p, e in errors.items()))
+    _print_saved(out_dir, results["clustering"])
+
+
+def _parse_budgets(items) -> dict:
+    budgets = {}
+    for item in items or []:
+        stage, _, secs = item.partition("=")
+        budgets[stage.strip()] = float(secs)
+    return budgets
+
+
 if __name__ == "__main__":
-    data = generate_synthetic_data(num_samples=1500)  # modestly larger set for better clusters
-    train_models(data, out_dir=os.environ.get("MODEL_DIR", "models"))
+    ap = argparse.ArgumentParser(description="Train the Mini-SOAR classifier and actor profiler.")
+    ap.add_argument("--parallel", action="store_true",
+                    help="Run classification and clustering in separate processes")
+    ap.add_argument("--n-jobs", type=int, default=None,
+                    help="PyCaret n_jobs per pipeline (default: -1 sequential, cores/2 parallel)")
+    ap.add_argument("--stage-budget", type=float, default=None, help="Default time budget per stage, in seconds")
+    ap.add_argument("--budget", action="append", metavar="STAGE=SECONDS",
+                    help="Per-stage budget, e.g. compare_models=300 or clustering.setup=30 (repeatable)")
+    ap.add_argument("--samples", type=int, default=1500)
+    args = ap.parse_args()
+
+    data = generate_synthetic_data(num_samples=args.samples)  # modestly larger set for better clusters
+    out = os.environ.get("MODEL_DIR", "models")
+    budgets = _parse_budgets(args.budget)
+    if args.parallel:
+        train_models_parallel(data, out_dir=out, n_jobs=args.n_jobs, stage_budget=args.stage_budget, budgets=budgets)
+    else:
+        train_models(data, out_dir=out, n_jobs=-1 if args.n_jobs is None else args.n_jobs,
+                     stage_budget=args.stage_budget, budgets=budgets)
@@ -0,0 +1,218 @@
+"""
+Bulk raw-URL -> model feature extractor for the Mini-SOAR classifier.
+
+Turns raw URLs into the same 13-column encoding used by train_model.py (and the
+sliders in app.py), so URL feeds can be scored directly. Everything is derived
+lexically from the URL string, so it works fully offline:
+
+  having_IP_Address         1 if the host is an IPv4/IPv6/decimal/hex IP literal, else -1
+  URL_Length                -1 (<54 chars), 0 (54-75), 1 (>75)
+  Shortining_Service        1 if the host is a known URL shortener, else -1
+  having_At_Symbol          1 if '@' appears anywhere in the URL, else -1
+  double_slash_redirecting  1 if '//' appears after the scheme, else -1
+  Prefix_Suffix             1 if the host contains '-', else -1
+  having_Sub_Domain         -1 (no subdomain), 0 (one), 1 (two or more); 'www.' is ignored
+  SSLfinal_State            1 for https, 0 otherwise (certificate trust needs a live check)
+  Abnormal_URL              1 for a non-default port, punycode host or dot-less hostname, else -1
+  has_political_keyword     1 if a political keyword appears in the URL, else 0
+
+URL_of_Anchor, Links_in_tags and SFH describe the fetched page, not the URL, so they
+are emitted as 0 (Neutral).
+
+Usage:
+    python url_features.py urls.txt -o features.csv
+    python url_features.py feed.csv --column url --workers 8 -o features.csv
+"""
+import argparse
+import csv
+import re
+import sys
+import time
+from itertools import islice
+from multiprocessing import Pool
+
+from scoring import FEATURE_COLUMNS
+
+# Columns that can be derived from the URL string alone
+LEXICAL_COLUMNS = [
+    "having_IP_Address",
+    "URL_Length",
+    "Shortining_Service",
+    "having_At_Symbol",
+    "double_slash_redirecting",
+    "Prefix_Suffix",
+    "having_Sub_Domain",
+    "SSLfinal_State",
+    "Abnormal_URL",
+    "has_political_keyword",
+]
+
+SHORTENER_DOMAINS = frozenset("""
+bit.ly bitly.com goo.gl tinyurl.com ow.ly t.co is.gd v.gd buff.ly adf.ly bit.do cutt.ly cutt.us
+shorturl.at rebrand.ly tiny.cc lnkd.in db.tt qr.ae qr.net cur.lv ity.im q.gs po.st bc.vc twitthis.com
+u.to j.mp buzurl.com u.bb yourls.org x.co prettylinkpro.com scrnch.me filoops.info vzturl.com 1url.com
+tweez.me link.zip.net trib.al rb.gy s.id t.ly shorte.st soo.gd clck.ru youtu.be amzn.to fb.me
+tr.im migre.me short.to budurl.com ping.fm post.ly just.as su.pr snipurl.com snurl.com short.ie
+kl.am wp.me rubyurl.com om.ly to.ly lnk.to hyperurl.co tiny.one shorturl.com
+""".split())
+
+# Second-level public suffixes, so "bbc.co.uk" counts as a bare registered domain
+SECOND_LEVEL_SUFFIXES = frozenset("""
+co.uk ac.uk gov.uk org.uk me.uk net.uk com.au net.au org.au edu.au gov.au co.nz org.nz co.jp ne.jp
+or.jp co.in net.in org.in co.za org.za com.br net.br com.cn net.cn org.cn com.mx com.ar com.tr com.sg
+com.hk com.tw co.kr co.il com.my com.ph com.pk com.ng com.eg com.sa com.ua co.id
+""".split())
+
+POLITICAL_KEYWORDS = (
+    "election", "vote", "voting", "ballot", "protest", "government", "regime", "propaganda",
+    "political", "politics", "senate", "parliament", "president", "referendum", "revolution",
+    "activist", "freedom", "liberty", "justice", "democracy", "resist", "occupy",
+)
+
+# Single-pass tokenizer: scheme, authority and the remainder in one regex match
+_URL_RE = re.compile(r"^\s*(?:([A-Za-z][A-Za-z0-9+.\-]*):)?(//)?([^/?#\\]*)(.*?)\s*$", re.S)
+_POLITICAL_RE = re.compile("|".join(POLITICAL_KEYWORDS))
+_IPV4_CHARS = frozenset("0123456789.")
+_HEX_CHARS = frozenset("0123456789abcdefx.")
+_DEFAULT_PORTS = {"": ("",), "http": ("", "80"), "https": ("", "443")}
+
+
+def _is_ip_literal(host: str) -> bool:
+    """Cheap IP-literal check: dotted quad, bracketed IPv6, or a bare decimal/hex integer form."""
+    if not host:
+        return False
+    if host[0] == "[":
+        return True
+    last = host[-1]
+    if not (last.isdigit() or "a" <= last <= "f"):
+        return False
+    if _IPV4_CHARS.issuperset(host):
+        parts = host.split(".")
+        # 1-4 parts covers dotted quads and the integer shorthands browsers accept (e.g. 3232235777)
+        return len(parts) <= 4 and all(p and len(p) <= 10 for p in parts)
+    if "0x" in host and _HEX_CHARS.issuperset(host):
+        return True
+    return False
+
+
+def extract_features(url: str) -> tuple:
+    """Encode one raw URL as a tuple in FEATURE_COLUMNS order."""
+    m = _URL_RE.match(url)
+    scheme, slashes, netloc, rest = m.groups()
+    scheme = (scheme or "").lower()
+    if scheme and not slashes and scheme not in ("http", "https"):
+        # "example.com:8080/path" - the "scheme" was really a host:port
+        netloc, rest, scheme = (scheme + ":" + netloc), rest, ""
+
+    userinfo_end = netloc.rfind("@")
+    hostport = netloc[userinfo_end + 1:].lower()
+    if hostport.startswith("["):
+        close = hostport.find("]")
+        host, port = hostport[:close + 1], hostport[close + 2:]
+    else:
+        host, _, port = hostport.partition(":")
+    host = host.rstrip(".")
+
+    is_ip = _is_ip_literal(host)
+    bare = host[4:] if host.startswith("www.") else host
+
+    if is_ip:
+        sub_domain = -1
+    else:
+        labels = bare.count(".") + 1
+        registered = 3 if bare[bare.rfind(".", 0, bare.rfind(".")) + 1:] in SECOND_LEVEL_SUFFIXES else 2
+        extra = labels - registered
+        sub_domain = -1 if extra <= 0 else (0 if extra == 1 else 1)
+
+    n = len(url)
+    scheme_slash = url.find("//")
+    return (
+        1 if is_ip else -1,
+        -1 if n < 54 else (0 if n <= 75 else 1),
+        1 if bare in SHORTENER_DOMAINS else -1,
+        1 if "@" in url else -1,
+        1 if url.find("//", scheme_slash + 2 if slashes else 0) != -1 else -1,
+        1 if "-" in host else -1,
+        sub_domain,
+        1 if scheme == "https" else 0,
+        0,  # URL_of_Anchor (page content)
+        0,  # Links_in_tags (page content)
+        0,  # SFH (page content)
+        1 if (port not in _DEFAULT_PORTS.get(scheme, ("",)) or "xn--" in host
+              or (not is_ip and "." not in host)) else -1,
+        1 if _POLITICAL_RE.search(url.lower()) else 0,
+    )
+
+
+def _extract_chunk(urls):
+    return [(u,) + extract_features(u) for u in urls]
+
+
+def _chunked(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_urls(path: str, column: str = None):
+    """Stream URLs from a text file (one per line) or from a CSV column."""
+    with open(path, "r", encoding="utf-8", errors="replace", newline="") as f:
+        if column:
+            for row in csv.DictReader(f):
+                url = (row.get(column) or "").strip()
+                if url:
+                    yield url
+        else:
+            for line in f:
+                url = line.strip()
+                if url and not url.startswith("#"):
+                    yield url
+
+
+def extract_file(in_path: str, out, column: str = None, workers: int = 1, chunk_size: int = 50000) -> int:
+    """
+    Stream URLs from in_path and write url + FEATURE_COLUMNS rows as CSV to the file object out.
+
+    Memory stays bounded by chunk_size (times workers). Returns the number of rows written.
+    """
+    writer = csv.writer(out)
+    writer.writerow(["url"] + FEATURE_COLUMNS)
+    chunks = _chunked(iter_urls(in_path, column), chunk_size)
+    total = 0
+    if workers > 1:
+        with Pool(workers) as pool:
+            for rows in pool.imap(_extract_chunk, chunks):
+                writer.writerows(rows)
+                total += len(rows)
+    else:
+        for chunk in chunks:
+            rows = _extract_chunk(chunk)
+            writer.writerows(rows)
+            total += len(rows)
+    return total
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Extract Mini-SOAR model features from raw URLs.")
+    ap.add_argument("input", help="Text file with one URL per line, or a CSV (see --column)")
+    ap.add_argument("-o", "--output", default="-", help="Output CSV path (default: stdout)")
+    ap.add_argument("--column", default=None, help="Read URLs from this CSV column instead of plain lines")
+    ap.add_argument("--workers", type=int, default=1, help="Worker processes for extraction")
+    ap.add_argument("--chunk-size", type=int, default=50000, help="URLs per work unit")
+    args = ap.parse_args()
+
+    start = time.perf_counter()
+    if args.output == "-":
+        total = extract_file(args.input, sys.stdout, args.column, args.workers, args.chunk_size)
+    else:
+        with open(args.output, "w", newline="", encoding="utf-8") as out:
+            total = extract_file(args.input, out, args.column, args.workers, args.chunk_size)
+    elapsed = time.perf_counter() - start
+    print(f"Extracted {total} URLs in {elapsed:.2f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Admission control in front of token verification.
+
+Two independent gates:
+
+  * a per-client sliding-window rate limit (approximated from the current and previous
+    fixed windows, O(1) memory per client). Over the limit -> 429 with Retry-After.
+  * a cap on concurrent token verifications. Callers wait up to `queue_timeout` seconds
+    for a slot, and at most `max_queue` of them may wait. Otherwise -> 503 with Retry-After.
+
+Client state is split across striped locks, so requests from different clients rarely
+contend. At most `max_clients` clients are tracked: each stripe holds max_clients // stripes,
+dropping idle clients first and then the oldest one. Decisions and queue waits are exported
+through metrics.REGISTRY.
+"""
+import math
+import time
+import threading
+import zlib
+
+from metrics import REGISTRY
+
+ADMISSION_DECISIONS = REGISTRY.counter(
+    "admission_decisions_total", "Admission decisions on /protected", ("decision",))
+ADMISSION_QUEUE_WAIT = REGISTRY.histogram(
+    "admission_queue_wait_seconds", "Time spent waiting for a verification slot",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5))
+
+
+class Overloaded(Exception):
+    """No verification slot became free in time."""
+
+    def __init__(self, retry_after):
+        super().__init__("verification capacity exhausted")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, rate_limit=50, window=1.0, max_concurrent=16, max_queue=64, queue_timeout=0.05,
+                 overload_retry_after=1, stripes=32, max_clients=100000, clock=time.monotonic):
+        self.rate_limit = rate_limit
+        self.window = window
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self.overload_retry_after = overload_retry_after
+        self.max_clients_per_stripe = max(1, max_clients // stripes)
+        self.clock = clock
+        self._stripes = [({}, threading.Lock()) for _ in range(stripes)]
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._waiting = 0
+        self._waiting_lock = threading.Lock()
+
+    # --- per-client rate limit -------------------------------------------------------
+
+    def check_rate(self, client):
+        """Count one request for `client`; returns (allowed, retry_after_seconds)."""
+        if not self.rate_limit:
+            return True, 0  # RATE_LIMIT=0 turns the per-client limit off
+        clients, lock = self._stripes[zlib.crc32(client.encode()) % len(self._stripes)]
+        now = self.clock()
+        window_start = now - now % self.window
+        with lock:
+            state = clients.get(client)
+            if state is None:
+                if len(clients) >= self.max_clients_per_stripe:
+                    self._prune(clients, window_start)
+                if len(clients) >= self.max_clients_per_stripe:
+                    # Still full of active clients: forget the longest-tracked one
+                    del clients[next(iter(clients))]
+                state = clients[client] = [window_start, 0, 0]  # [window start, previous count, current count]
+            elif state[0] != window_start:
+                state[1] = state[2] if window_start - state[0] == self.window else 0
+                state[2] = 0
+                state[0] = window_start
+            elapsed = now - window_start
+            previous, current = state[1], state[2]
+            estimate = previous * (1 - elapsed / self.window) + current
+            if estimate + 1 <= self.rate_limit:
+                state[2] = current + 1
+                return True, 0
+        ADMISSION_DECISIONS.inc("rate_limited")
+        return False, self._retry_after(previous, current, elapsed)
+
+    def _retry_after(self, previous, current, elapsed):
+        if current + 1 > self.rate_limit or previous == 0:
+            wait = self.window - elapsed
+        else:
+            # When the previous window's weight has decayed enough to fit one more request
+            wait = self.window * (1 - (self.rate_limit - current - 1) / previous) - elapsed
+        return max(1, math.ceil(wait))
+
+    def _prune(self, clients, window_start):
+        for client in [c for c, state in clients.items() if window_start - state[0] > self.window]:
+            del clients[client]
+
+    # --- verification concurrency cap -------------------------------------------------
+
+    def limit_concurrency(self, fn):
+        """Wrap fn so at most max_concurrent calls run at once; raises Overloaded when saturated."""
+        def guarded(*args, **kwargs):
+            if not self._slots.acquire(blocking=False):
+                with self._waiting_lock:
+                    if self._waiting >= self.max_queue:
+                        ADMISSION_DECISIONS.inc("shed_queue_full")
+                        raise Overloaded(self.overload_retry_after)
+                    self._waiting += 1
+                start = time.perf_counter()
+                try:
+                    acquired = self._slots.acquire(timeout=self.queue_timeout)
+                finally:
+                    with self._waiting_lock:
+                        self._waiting -= 1
+                ADMISSION_QUEUE_WAIT.observe(time.perf_counter() - start)
+                if not acquired:
+                    ADMISSION_DECISIONS.inc("shed_timeout")
+                    raise Overloaded(self.overload_retry_after)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._slots.release()
+        return guarded
+
+    def admit(self):
+        """Record a request that passed every gate (including cache hits that never queued)."""
+        ADMISSION_DECISIONS.inc("admitted")
+
+    def tracked_clients(self):
+        return sum(len(clients) for clients, _ in self._stripes)
+
+    def stats(self):
+        return {
+            "admitted": ADMISSION_DECISIONS.value("admitted"),
+            "rate_limited": ADMISSION_DECISIONS.value("rate_limited"),
+            "shed_queue_full": ADMISSION_DECISIONS.value("shed_queue_full"),
+            "shed_timeout": ADMISSION_DECISIONS.value("shed_timeout"),
+            "waiting": self._waiting,
+            "tracked_clients": self.tracked_clients(),
+        }
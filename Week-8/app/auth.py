@@ -1,10 +1,23 @@
 import os
+import time
+import logging
+import threading
+
+import requests
+from jose import jwk, jws, jwt
+from jose.exceptions import JOSEError, JWSError, JWTError, JWTClaimsError, ExpiredSignatureError
 from flask import Flask, redirect, url_for, session, jsonify
 from authlib.integrations.flask_client import OAuth
 
+from session_store import make_session_interface
+from metrics import AUTH_FAILURES
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "super-secret-key")
+# Cookie holds only a session id; the user data stays server-side
+app.session_interface = make_session_interface()
 
 oauth = OAuth(app)
 oauth.register(
@@ -17,12 +30,198 @@ oauth.register(
     }
 )
 
+KEYCLOAK_ISSUER = f'{os.getenv("KEYCLOAK_URL")}/realms/{os.getenv("KEYCLOAK_REALM")}'
+# Accepted "aud" values; Keycloak needs an audience mapper for the client id to appear in access tokens
+KEYCLOAK_AUDIENCE = [a for a in os.getenv("KEYCLOAK_AUDIENCE", os.getenv("KEYCLOAK_CLIENT_ID") or "").split(",") if a]
+TOKEN_ALGORITHMS = ["RS256", "RS384", "RS512", "ES256", "ES384", "ES512", "PS256"]
+
+
+class JWKSCache:
+    """
+    Signing keys from the issuer's JWKS endpoint, indexed by "kid".
+
+    Lookups are plain dict reads (no lock, no network). A background thread refreshes the
+    keys every `refresh_interval` seconds; an unknown kid forces a refetch, rate-limited to
+    one per `min_refetch_interval` seconds so garbage tokens can't hammer the IdP. If a
+    fetch fails, the previous keys stay in use.
+    """
+
+    def __init__(self, jwks_uri=None, issuer=KEYCLOAK_ISSUER, refresh_interval=300,
+                 min_refetch_interval=30, timeout=5):
+        self.jwks_uri = jwks_uri
+        self.issuer = issuer
+        self.refresh_interval = refresh_interval
+        self.min_refetch_interval = min_refetch_interval
+        self.timeout = timeout
+        self._keys = {}
+        self._lock = threading.Lock()
+        self._last_fetch = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _discover_jwks_uri(self):
+        resp = requests.get(f"{self.issuer}/.well-known/openid-configuration", timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json()["jwks_uri"]
+
+    def refresh(self):
+        """Fetch the JWKS and swap in the new key map. Returns True on success."""
+        with self._lock:
+            return self._fetch()
+
+    def _fetch(self):
+        self._last_fetch = time.monotonic()
+        try:
+            if not self.jwks_uri:
+                self.jwks_uri = self._discover_jwks_uri()
+            resp = requests.get(self.jwks_uri, timeout=self.timeout)
+            resp.raise_for_status()
+            body = resp.json()
+            if not isinstance(body, dict) or not isinstance(body.get("keys", []), list):
+                raise ValueError("JWKS is not an object with a \"keys\" list")
+            keys = {}
+            for key in body.get("keys", []):
+                if not isinstance(key, dict) or key.get("use", "sig") != "sig" or "kid" not in key:
+                    continue
+                try:
+                    keys[key["kid"]] = jwk.construct(key, key.get("alg", "RS256"))
+                except JOSEError as e:
+                    logger.warning("Skipping unusable JWKS key %s: %s", key.get("kid"), e)
+        except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+            logger.warning("JWKS refresh from %s failed, keeping %d cached keys: %s",
+                           self.jwks_uri or self.issuer, len(self._keys), e)
+            return False
+        # Swap the whole map so readers never see a partial update
+        self._keys = keys
+        logger.info("Loaded %d signing keys from %s", len(keys), self.jwks_uri)
+        return True
+
+    def get(self, kid):
+        key = self._keys.get(kid)
+        if key is None and time.monotonic() - self._last_fetch >= self.min_refetch_interval:
+            # Unknown kid: the IdP may have rotated its keys since the last refresh.
+            # Re-check under the lock so concurrent misses trigger a single fetch.
+            with self._lock:
+                if kid not in self._keys and time.monotonic() - self._last_fetch >= self.min_refetch_interval:
+                    self._fetch()
+            key = self._keys.get(kid)
+        return key
+
+    def start(self):
+        """Load the keys now and keep them fresh from a daemon thread."""
+        if self._thread is None:
+            self.refresh()
+            self._thread = threading.Thread(target=self._run, name="jwks-refresh", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh()
+
+
+class UnknownKeyError(JWTError):
+    """The token's kid is not in the issuer's JWKS, even after a refetch."""
+
+
+class UnsupportedAlgorithmError(JWTError):
+    pass
+
+
+class MalformedTokenError(JWTError):
+    """The token is not a well-formed JWS with a JSON header and payload."""
+
+
+class InvalidSignatureError(JWTError):
+    """The signature does not match the token's key and algorithm."""
+
+
+def failure_reason(error):
+    """Short label for why a token was rejected (used as the auth_failures_total reason)."""
+    if isinstance(error, ExpiredSignatureError):
+        return "expired"
+    if isinstance(error, JWTClaimsError):
+        return "invalid_claims"
+    if isinstance(error, UnknownKeyError):
+        return "unknown_kid"
+    if isinstance(error, UnsupportedAlgorithmError):
+        return "unsupported_alg"
+    if isinstance(error, MalformedTokenError):
+        return "malformed"
+    return "invalid_signature"
+
+
+class TokenVerifier:
+    """Validates a bearer JWT locally: signature (by kid), exp, iss and aud."""
+
+    def __init__(self, keys, issuer=KEYCLOAK_ISSUER, audience=None, leeway=30):
+        self.keys = keys
+        self.issuer = issuer
+        self.audience = audience if audience is not None else KEYCLOAK_AUDIENCE
+        self.leeway = leeway
+
+    def verify(self, token):
+        """Return the token claims, or raise JOSEError describing why the token was rejected."""
+        try:
+            # Decodes every segment, so a structurally broken token fails here
+            header = jws.get_unverified_headers(token)
+        except JWSError as e:
+            raise MalformedTokenError(f"Malformed token: {e}") from e
+        alg, kid = header.get("alg"), header.get("kid")
+        # Header values are arbitrary JSON; a list kid would break the key lookup
+        if not isinstance(alg, str) or not isinstance(kid, (str, type(None))):
+            raise MalformedTokenError(f"Malformed token header: alg={alg!r}, kid={kid!r}")
+        if alg not in TOKEN_ALGORITHMS:
+            raise UnsupportedAlgorithmError(f"Unsupported algorithm {alg!r}")
+        key = self.keys.get(kid)
+        if key is None:
+            raise UnknownKeyError(f"Unknown signing key {kid!r}")
+        try:
+            claims = jwt.decode(
+                token, key,
+                algorithms=TOKEN_ALGORITHMS,
+                issuer=self.issuer,
+                options={"verify_aud": False, "require_exp": True, "require_iss": True, "leeway": self.leeway},
+            )
+        except (ExpiredSignatureError, JWTClaimsError):
+            raise
+        except JWTError as e:
+            # jose re-raises the JWSError from signature checking as a plain JWTError
+            if isinstance(e.__context__, JWSError):
+                raise InvalidSignatureError(str(e)) from e
+            raise MalformedTokenError(str(e)) from e
+        aud = claims.get("aud")
+        aud = [aud] if isinstance(aud, str) else (aud or [])
+        if not set(aud) & set(self.audience):
+            raise JWTClaimsError(f"Invalid audience {aud!r}")
+        return claims
+
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+
+def get_verifier():
+    global _verifier
+    if _verifier is None:
+        with _verifier_lock:
+            if _verifier is None:
+                _verifier = TokenVerifier(JWKSCache(
+                    jwks_uri=os.getenv("KEYCLOAK_JWKS_URI"),
+                    refresh_interval=int(os.getenv("JWKS_REFRESH_SECONDS", "300")),
+                ).start())
+    return _verifier
+
+
 def verify_token(token):
     try:
-        userinfo = oauth.keycloak.parse_id_token({'access_token': token})
-        return userinfo  # Typically includes email, name, etc.
-    except Exception as e:
-        print(f"Token verification failed: {e}")
+        return get_verifier().verify(token)  # Typically includes email, name, etc.
+    except JOSEError as e:
+        AUTH_FAILURES.inc(failure_reason(e))
+        logger.debug("Token verification failed: %s", e)
         return None
 
 def prepare_flask_request(req):
@@ -60,10 +259,15 @@ def login():
 def auth_callback():
     token = oauth.keycloak.authorize_access_token()
     user = oauth.keycloak.parse_id_token(token)
-    session['user'] = user
+    session.regenerate()
+    session['user'] = dict(user)
     return redirect(url_for('index'))
 
 @app.route('/logout')
 def logout():
     session.clear()
     return redirect(url_for('index'))
+
+@app.route('/session-stats')
+def session_stats():
+    return jsonify(app.session_interface.stats())
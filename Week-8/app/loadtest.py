@@ -0,0 +1,196 @@
+"""
+Concurrent load generator for the Flask API's / and /protected endpoints.
+
+Tokens are minted up front from an OIDC token endpoint (the bundled mock_oidc.py by
+default) and handed out round-robin, so the measured time is the API's, not the IdP's.
+Reports p50/p95/p99 latency, throughput and error rates per endpoint.
+
+Self-contained run (mock issuer + API started in-process, no Keycloak needed):
+    python loadtest.py --start-mock --start-app --concurrency 64 --duration 30
+
+Against running services:
+    python loadtest.py --api http://localhost:5000 --token-url http://localhost:8081/realms/myrealm/protocol/openid-connect/token
+"""
+import os
+import sys
+import math
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from collections import Counter
+
+import requests
+from werkzeug.serving import make_server
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    # Smallest value with at least pct% of the data at or below it
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def mint_tokens(token_url, count, client_id, client_secret=None, password="password"):
+    """Fetch `count` access tokens (one per synthetic user) from the token endpoint."""
+    tokens = []
+    with requests.Session() as s:
+        for i in range(count):
+            resp = s.post(token_url, data={
+                "grant_type": "password",
+                "client_id": client_id,
+                "client_secret": client_secret,
+                "username": f"loadtest-user-{i}",
+                "password": password,
+            }, timeout=10)
+            resp.raise_for_status()
+            tokens.append(resp.json()["access_token"])
+    return tokens
+
+
+class Worker(threading.Thread):
+    def __init__(self, api, tokens, deadline, protected_ratio, interval, seed):
+        super().__init__(daemon=True)
+        self.api = api.rstrip("/")
+        self.tokens = tokens
+        self.deadline = deadline
+        self.protected_ratio = protected_ratio
+        self.interval = interval  # seconds between sends for rate-limited runs, else 0
+        self.rng = random.Random(seed)
+        self.latencies = {"/": [], "/protected": []}
+        self.statuses = {"/": Counter(), "/protected": Counter()}
+
+    def run(self):
+        session = requests.Session()
+        i = self.rng.randrange(len(self.tokens))
+        next_send = time.perf_counter()
+        while True:
+            if self.interval:
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                next_send += self.interval
+            if time.perf_counter() >= self.deadline:
+                break
+            if self.rng.random() < self.protected_ratio:
+                path = "/protected"
+                headers = {"Authorization": f"Bearer {self.tokens[i % len(self.tokens)]}"}
+                i += 1
+            else:
+                path, headers = "/", None
+            start = time.perf_counter()
+            try:
+                status = session.get(self.api + path, headers=headers, timeout=10).status_code
+            except requests.RequestException as e:
+                status = type(e).__name__
+            self.latencies[path].append(time.perf_counter() - start)
+            self.statuses[path][status] += 1
+        session.close()
+
+
+def run_load(api, tokens, concurrency, duration, protected_ratio=0.8, rate=None, seed=0):
+    """Drive the API with `concurrency` threads for `duration` seconds; returns the report dict."""
+    interval = concurrency / rate if rate else 0
+    start = time.perf_counter()
+    deadline = start + duration
+    workers = [Worker(api, tokens, deadline, protected_ratio, interval, seed + n) for n in range(concurrency)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+
+    report = {"concurrency": concurrency, "duration_s": round(elapsed, 3), "target_rps": rate, "endpoints": {}}
+    for path in ("/", "/protected"):
+        latencies = sorted(x for w in workers for x in w.latencies[path])
+        statuses = Counter()
+        for w in workers:
+            statuses.update(w.statuses[path])
+        total = len(latencies)
+        errors = sum(n for status, n in statuses.items() if not (isinstance(status, int) and status < 400))
+        report["endpoints"][path] = {
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 1),
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "statuses": {str(k): v for k, v in sorted(statuses.items(), key=str)},
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        }
+    total = sum(e["requests"] for e in report["endpoints"].values())
+    report["total_requests"] = total
+    report["throughput_rps"] = round(total / elapsed, 1)
+    return report
+
+
+def _serve(app, host, port):
+    # Per-request access logs would dominate the measurement
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server(host, port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Load test / and /protected")
+    ap.add_argument("--api", default="http://127.0.0.1:5000", help="Base URL of the Flask API")
+    ap.add_argument("--token-url", default=None, help="OIDC token endpoint (default: the mock issuer)")
+    ap.add_argument("--realm", default=os.getenv("KEYCLOAK_REALM", "myrealm"))
+    ap.add_argument("--client-id", default=os.getenv("KEYCLOAK_CLIENT_ID", "flask-client"))
+    ap.add_argument("--client-secret", default=os.getenv("CLIENT_SECRET"))
+    ap.add_argument("--tokens", type=int, default=100, help="Size of the pre-minted token pool")
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--duration", type=float, default=10.0, help="Seconds")
+    ap.add_argument("--rate", type=float, default=None, help="Target total requests/s (default: as fast as possible)")
+    ap.add_argument("--protected-ratio", type=float, default=0.8, help="Share of requests sent to /protected")
+    ap.add_argument("--start-mock", action="store_true", help="Run mock_oidc.py in-process on --mock-port")
+    ap.add_argument("--mock-port", type=int, default=8081)
+    ap.add_argument("--start-app", action="store_true", help="Run main.py's app in-process at --api's port")
+    ap.add_argument("--json", default=None, help="Also write the report to this file")
+    args = ap.parse_args()
+
+    mock_base = f"http://127.0.0.1:{args.mock_port}"
+    servers = []
+    if args.start_mock:
+        from mock_oidc import create_app
+        servers.append(_serve(create_app(mock_base, args.realm, args.client_id), "127.0.0.1", args.mock_port))
+    if args.start_app:
+        # auth.py reads its issuer config at import time
+        if args.start_mock:
+            os.environ.update({"KEYCLOAK_URL": mock_base, "KEYCLOAK_REALM": args.realm,
+                               "KEYCLOAK_CLIENT_ID": args.client_id})
+        # Every request comes from 127.0.0.1, so the per-client limit would answer most of them
+        # with 429; switch it off unless RATE_LIMIT is set explicitly
+        os.environ.setdefault("RATE_LIMIT", "0")
+        from main import app
+        port = int(args.api.rsplit(":", 1)[-1].split("/")[0])
+        servers.append(_serve(app, "127.0.0.1", port))
+
+    token_url = args.token_url or f"{mock_base}/realms/{args.realm}/protocol/openid-connect/token"
+    print(f"Minting {args.tokens} tokens from {token_url} ...", file=sys.stderr)
+    tokens = mint_tokens(token_url, args.tokens, args.client_id, args.client_secret)
+
+    print(f"Running {args.concurrency} workers for {args.duration:.0f}s against {args.api} ...", file=sys.stderr)
+    report = run_load(args.api, tokens, args.concurrency, args.duration, args.protected_ratio, args.rate)
+    for server in servers:
+        server.shutdown()
+
+    print(f"\n{'endpoint':<12}{'requests':>10}{'rps':>10}{'errors':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for path, e in report["endpoints"].items():
+        print(f"{path:<12}{e['requests']:>10}{e['throughput_rps']:>10}{e['error_rate']:>9.2%}"
+              f"{e['p50_ms']:>10}{e['p95_ms']:>10}{e['p99_ms']:>10}")
+    print(f"\nTotal: {report['total_requests']} requests, {report['throughput_rps']} req/s")
+    for path, e in report["endpoints"].items():
+        print(f"  {path} statuses: {e['statuses']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,60 @@
+import os
 from flask import Flask, request, jsonify
 from auth import verify_token
+from token_cache import TokenCache
+from metrics import REGISTRY, AUTH_FAILURES, RequestMetrics, span
+from admission import AdmissionController, Overloaded
 app = Flask(__name__)
+request_metrics = RequestMetrics(app)
+
+# Verified claims per bearer token, so repeat calls skip signature/claim checks
+token_cache = TokenCache(
+    maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "10000")),
+    max_ttl=int(os.getenv("TOKEN_CACHE_TTL", "300")),
+    on_revoked=lambda: AUTH_FAILURES.inc("revoked"),
+)
+
+
+def _token_cache_metrics():
+    stats = token_cache.stats()
+    return [
+        "# HELP token_cache_lookups_total Verified-token cache lookups",
+        "# TYPE token_cache_lookups_total counter",
+        f'token_cache_lookups_total{{result="hit"}} {stats["hits"]}',
+        f'token_cache_lookups_total{{result="miss"}} {stats["misses"]}',
+        "# HELP token_cache_entries Cached verified tokens",
+        "# TYPE token_cache_entries gauge",
+        f"token_cache_entries {stats['size']}",
+        "# HELP token_cache_verify_saved_seconds_total Verification time skipped by cache hits",
+        "# TYPE token_cache_verify_saved_seconds_total counter",
+        f"token_cache_verify_saved_seconds_total {stats['verify_time_saved_ms'] / 1000}",
+    ]
+
+
+REGISTRY.register_collector(_token_cache_metrics)
+
+# Per-client rate limit and a cap on concurrent verifications, so a token storm is shed
+# with a fast 429/503 instead of stalling every client
+admission = AdmissionController(
+    rate_limit=int(os.getenv("RATE_LIMIT", "50")),
+    window=float(os.getenv("RATE_LIMIT_WINDOW", "1")),
+    max_concurrent=int(os.getenv("VERIFY_MAX_CONCURRENT", "16")),
+    max_queue=int(os.getenv("VERIFY_MAX_QUEUE", "64")),
+    queue_timeout=float(os.getenv("VERIFY_QUEUE_TIMEOUT_MS", "50")) / 1000,
+)
+limited_verify_token = admission.limit_concurrency(verify_token)
+TRUST_PROXY = os.getenv("TRUST_PROXY", "false").lower() == "true"
+
+
+def bearer_token():
+    auth_header = request.headers.get('Authorization', '')
+    return auth_header.replace("Bearer ", "")
+
+
+def client_key():
+    if TRUST_PROXY and request.headers.get('X-Forwarded-For'):
+        return request.headers['X-Forwarded-For'].split(",")[0].strip()
+    return request.remote_addr or "unknown"
 
 @app.route('/')
 def public():
@@ -8,12 +62,46 @@ def public():
 
 @app.route('/protected')
 def protected():
-    auth_header = request.headers.get('Authorization', '')
-    token = auth_header.replace("Bearer ", "")
-    user = verify_token(token)
+    allowed, retry_after = admission.check_rate(client_key())
+    if not allowed:
+        return jsonify({"msg": "Too many requests"}), 429, {"Retry-After": str(retry_after)}
+    token = bearer_token()
+    if not token:
+        AUTH_FAILURES.inc("missing_token")
+        return jsonify({"msg": "Unauthorized"}), 401
+    with span("verification"):
+        try:
+            user = token_cache.get_or_verify(token, limited_verify_token)
+        except Overloaded as e:
+            return jsonify({"msg": "Service overloaded"}), 503, {"Retry-After": str(e.retry_after)}
+    admission.admit()
     if not user:
         return jsonify({"msg": "Unauthorized"}), 401
-    return jsonify({"msg": "Protected resource accessed!", "user": user})
+    with span("serialization"):
+        return jsonify({"msg": "Protected resource accessed!", "user": user})
+
+@app.route('/logout', methods=['POST'])
+def logout():
+    token = bearer_token()
+    user = token_cache.get_or_verify(token, verify_token)
+    if not user:
+        return jsonify({"msg": "Unauthorized"}), 401
+    if not user.get("sid") and not user.get("jti"):
+        # Nothing to denylist it by: revoking would only drop the cache entry and re-verify it
+        return jsonify({"msg": "Token has no jti or sid and cannot be revoked; it stays valid until it expires.",
+                        "exp": user.get("exp")}), 400
+    if user.get("sid"):
+        token_cache.revoke_session(user["sid"])
+    token_cache.revoke_token(token, user)
+    return jsonify({"msg": "Logged out."})
+
+@app.route('/token-cache')
+def token_cache_stats():
+    return jsonify(token_cache.stats())
+
+@app.route('/admission')
+def admission_stats():
+    return jsonify(admission.stats())
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,209 @@
+"""
+Minimal in-process metrics with Prometheus text exposition, plus per-request phase timing.
+
+    from metrics import RequestMetrics, span
+    request_metrics = RequestMetrics(app)          # per-route latency histograms + GET /metrics
+    with span("verification"):                     # time a phase of the current request
+        ...
+
+Each request's latency is split into the explicitly timed phases ("verification",
+"serialization", ...) and "handler", which is whatever time is left. Requests slower than
+SLOW_REQUEST_MS have their spans logged as JSON and kept for GET /metrics/slow.
+
+Recording is a dict lookup, a bisect and a few integer increments under a per-metric
+lock, so it is cheap enough to leave on.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from bisect import bisect_left
+from collections import deque
+
+from flask import g, has_request_context, request, jsonify, Response
+
+logger = logging.getLogger(__name__)
+
+# Seconds; tuned for sub-millisecond cache hits up to multi-second IdP stalls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _labels(names, values, extra=""):
+    parts = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, v in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {v}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labelvalues -> [bucket counts..., +Inf count], sum
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1])) for k, v in self._series.items())
+        for labelvalues, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []  # callables returning extra exposition lines at scrape time
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def register_collector(self, fn):
+        self.collectors.append(fn)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "Request latency by route", ("route", "method", "status"))
+PHASE_LATENCY = REGISTRY.histogram(
+    "http_request_phase_seconds", "Request latency split by phase", ("route", "phase"))
+AUTH_FAILURES = REGISTRY.counter(
+    "auth_failures_total", "Rejected bearer tokens by reason", ("reason",))
+
+
+class span:
+    """Time one phase of the current request; a no-op outside a request."""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if has_request_context() and "_spans" in g:
+            end = time.perf_counter()
+            g._spans.append((self.name, self.start, end - self.start))
+        return False
+
+
+class RequestMetrics:
+    """Flask hooks recording per-route latency and phases, serving /metrics and /metrics/slow."""
+
+    def __init__(self, app, registry=REGISTRY, slow_ms=None, keep_slow=100):
+        self.registry = registry
+        self.slow_seconds = float(slow_ms if slow_ms is not None else os.getenv("SLOW_REQUEST_MS", "250")) / 1000
+        self.slow_requests = deque(maxlen=keep_slow)
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+        app.add_url_rule("/metrics", "metrics", self._metrics)
+        app.add_url_rule("/metrics/slow", "metrics_slow", self._slow)
+
+    def _before(self):
+        g._t0 = time.perf_counter()
+        g._spans = []
+
+    def _after(self, response):
+        g._status = response.status_code
+        return response
+
+    def _teardown(self, exc):
+        # Runs even when the view raised, so failed requests are recorded too (after_request is skipped then)
+        t0 = g.pop("_t0", None)
+        if t0 is None:
+            return
+        total = time.perf_counter() - t0
+        spans = g.pop("_spans", [])
+        status = 500 if exc is not None else g.pop("_status", 500)
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        if route.startswith("/metrics"):
+            return
+
+        REQUEST_LATENCY.observe(total, route, request.method, status)
+        timed = 0.0
+        for name, _, duration in spans:
+            PHASE_LATENCY.observe(duration, route, name)
+            timed += duration
+        PHASE_LATENCY.observe(max(0.0, total - timed), route, "handler")
+
+        if total >= self.slow_seconds:
+            record = {
+                "route": route,
+                "method": request.method,
+                "status": status,
+                "total_ms": round(total * 1000, 3),
+                "spans": [{"name": n, "start_ms": round((s - t0) * 1000, 3), "duration_ms": round(d * 1000, 3)}
+                          for n, s, d in spans],
+                "at": time.time(),
+            }
+            self.slow_requests.append(record)
+            logger.warning("Slow request: %s", json.dumps(record))
+
+    def _metrics(self):
+        return Response(self.registry.render(), mimetype="text/plain; version=0.0.4")
+
+    def _slow(self):
+        return jsonify(list(self.slow_requests))
@@ -0,0 +1,131 @@
+"""
+Local stand-in for the Keycloak OIDC endpoints, for testing without a real Keycloak.
+
+Serves the pieces auth.py and testapi.py talk to, under the same paths as Keycloak:
+
+    GET  /realms/<realm>/.well-known/openid-configuration
+    GET  /realms/<realm>/protocol/openid-connect/certs     (JWKS: current + previous key)
+    POST /realms/<realm>/protocol/openid-connect/token     (password / client_credentials)
+    POST /realms/<realm>/rotate                            (new signing key; old one stays published)
+
+It can also be used in-process: MockIssuer.mint() signs tokens directly.
+
+Usage:
+    python mock_oidc.py --port 8081 --realm myrealm
+    KEYCLOAK_URL=http://localhost:8081 KEYCLOAK_REALM=myrealm KEYCLOAK_CLIENT_ID=flask-client python main.py
+"""
+import os
+import time
+import uuid
+import argparse
+import threading
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from flask import Flask, request, jsonify
+from jose import jwk, jwt
+
+
+class MockIssuer:
+    """RSA-signing token issuer with key rotation. Keeps the last `keep` keys in its JWKS."""
+
+    def __init__(self, issuer, audience="flask-client", token_ttl=300, keep=2):
+        self.issuer = issuer
+        self.audience = audience
+        self.token_ttl = token_ttl
+        self.keep = keep
+        self._keys = []  # newest first: (kid, private_pem, public_jwk)
+        self._lock = threading.Lock()
+        self.rotate()
+
+    def rotate(self):
+        """Generate a new signing key; returns its kid."""
+        private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        pem = private.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ).decode()
+        kid = uuid.uuid4().hex[:16]
+        public = jwk.construct(pem, "RS256").public_key().to_dict()
+        public.update({"kid": kid, "use": "sig", "alg": "RS256"})
+        with self._lock:
+            self._keys = [(kid, pem, public)] + self._keys[:self.keep - 1]
+        return kid
+
+    @property
+    def current_kid(self):
+        return self._keys[0][0]
+
+    def jwks(self):
+        return {"keys": [public for _, _, public in self._keys]}
+
+    def mint(self, subject="testuser", ttl=None, **claims):
+        """Sign an access token with the current key. Extra claims override the defaults."""
+        kid, pem, _ = self._keys[0]
+        now = int(time.time())
+        payload = {
+            "iss": self.issuer,
+            "aud": self.audience,
+            "azp": self.audience,
+            "sub": subject,
+            "preferred_username": subject,
+            "iat": now,
+            "exp": now + (self.token_ttl if ttl is None else ttl),
+            "jti": uuid.uuid4().hex,
+            "sid": uuid.uuid4().hex,
+        }
+        payload.update(claims)
+        return jwt.encode(payload, pem, algorithm="RS256", headers={"kid": kid})
+
+
+def create_app(base_url, realm="myrealm", client_id="flask-client", token_ttl=300):
+    issuer_url = f"{base_url}/realms/{realm}"
+    issuer = MockIssuer(issuer_url, audience=client_id, token_ttl=token_ttl)
+    app = Flask(__name__)
+    app.config["ISSUER"] = issuer
+    prefix = f"/realms/{realm}"
+
+    @app.route(f"{prefix}/.well-known/openid-configuration")
+    def discovery():
+        return jsonify({
+            "issuer": issuer_url,
+            "jwks_uri": f"{issuer_url}/protocol/openid-connect/certs",
+            "token_endpoint": f"{issuer_url}/protocol/openid-connect/token",
+            "authorization_endpoint": f"{issuer_url}/protocol/openid-connect/auth",
+            "id_token_signing_alg_values_supported": ["RS256"],
+        })
+
+    @app.route(f"{prefix}/protocol/openid-connect/certs")
+    def certs():
+        return jsonify(issuer.jwks())
+
+    @app.route(f"{prefix}/protocol/openid-connect/token", methods=["POST"])
+    def token():
+        grant = request.form.get("grant_type")
+        if grant not in ("password", "client_credentials"):
+            return jsonify({"error": "unsupported_grant_type"}), 400
+        subject = request.form.get("username") or request.form.get("client_id") or "service-account"
+        access_token = issuer.mint(subject)
+        return jsonify({
+            "access_token": access_token,
+            "token_type": "Bearer",
+            "expires_in": issuer.token_ttl,
+        })
+
+    @app.route(f"{prefix}/rotate", methods=["POST"])
+    def rotate():
+        return jsonify({"kid": issuer.rotate()})
+
+    return app
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Local mock OIDC issuer")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8081)
+    ap.add_argument("--realm", default=os.getenv("KEYCLOAK_REALM", "myrealm"))
+    ap.add_argument("--client-id", default=os.getenv("KEYCLOAK_CLIENT_ID", "flask-client"))
+    ap.add_argument("--token-ttl", type=int, default=300)
+    args = ap.parse_args()
+    create_app(f"http://{args.host}:{args.port}", args.realm, args.client_id, args.token_ttl).run(
+        host=args.host, port=args.port, threaded=True
+    )
@@ -0,0 +1,285 @@
+"""
+Server-side sessions for the Flask app.
+
+The session cookie carries only an opaque random id (~32 bytes); the session data
+(e.g. the parsed ID token) lives in a store on the server and is only loaded if the
+request actually touches `session`. Idle sessions are expired in bulk.
+
+Backends (SESSION_BACKEND):
+    memory  bounded LRU in process memory (default)
+    sqlite  local SQLite file (SESSION_DB, default sessions.db), shared by all workers on the host
+"""
+import os
+import json
+import time
+import sqlite3
+import secrets
+import threading
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin
+
+
+class MemorySessionStore:
+    """LRU of sid -> (data, last_seen); the least recently used session is dropped past maxsize."""
+
+    def __init__(self, maxsize=100000, idle_ttl=1800, clock=time.time):
+        self.maxsize = maxsize
+        self.idle_ttl = idle_ttl
+        self.clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        """Return (data, last_seen), or None if unknown or idle too long."""
+        with self._lock:
+            entry = self._sessions.get(sid)
+            if entry is None:
+                return None
+            if entry[1] + self.idle_ttl <= self.clock():
+                del self._sessions[sid]
+                return None
+            self._sessions.move_to_end(sid)
+            return entry
+
+    def set(self, sid, data):
+        with self._lock:
+            self._sessions[sid] = (data, self.clock())
+            self._sessions.move_to_end(sid)
+            while len(self._sessions) > self.maxsize:
+                self._sessions.popitem(last=False)
+
+    def touch(self, sid):
+        with self._lock:
+            entry = self._sessions.get(sid)
+            if entry is not None:
+                self._sessions[sid] = (entry[0], self.clock())
+                self._sessions.move_to_end(sid)
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def purge_expired(self):
+        """Drop all idle sessions; returns how many were removed."""
+        cutoff = self.clock() - self.idle_ttl
+        with self._lock:
+            idle = [sid for sid, (_, last_seen) in self._sessions.items() if last_seen <= cutoff]
+            for sid in idle:
+                del self._sessions[sid]
+            return len(idle)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class SQLiteSessionStore:
+    """Sessions in a local SQLite database (WAL mode, one connection per thread)."""
+
+    def __init__(self, path="sessions.db", idle_ttl=1800, clock=time.time):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self.clock = clock
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions "
+                         "(sid TEXT PRIMARY KEY, data TEXT NOT NULL, last_seen REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, sid):
+        row = self._conn().execute(
+            "SELECT data, last_seen FROM sessions WHERE sid = ? AND last_seen > ?",
+            (sid, self.clock() - self.idle_ttl),
+        ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def set(self, sid, data):
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO sessions (sid, data, last_seen) VALUES (?, ?, ?)",
+                         (sid, json.dumps(data), self.clock()))
+
+    def touch(self, sid):
+        with self._conn() as conn:
+            conn.execute("UPDATE sessions SET last_seen = ? WHERE sid = ?", (self.clock(), sid))
+
+    def delete(self, sid):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def purge_expired(self):
+        with self._conn() as conn:
+            return conn.execute("DELETE FROM sessions WHERE last_seen <= ?",
+                                (self.clock() - self.idle_ttl,)).rowcount
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+class ServerSideSession(SessionMixin):
+    """Session whose data is fetched from the store on first access."""
+
+    def __init__(self, store, sid=None):
+        self.store = store
+        self.sid = sid
+        self.new = sid is None
+        self.modified = False
+        self.accessed = False
+        self.last_seen = None
+        self.load_seconds = 0.0
+        self._data = None
+
+    def _load(self):
+        self.accessed = True
+        if self._data is None:
+            start = time.perf_counter()
+            entry = self.store.get(self.sid) if self.sid else None
+            self.load_seconds = time.perf_counter() - start
+            if entry is None:
+                # Unknown or expired id: start over with a fresh one
+                self.sid, self.new = None, True
+                self._data = {}
+            else:
+                self._data, self.last_seen = entry
+        return self._data
+
+    @property
+    def loaded(self):
+        return self._data is not None
+
+    def regenerate(self):
+        """Move the data to a new session id (call on login to prevent session fixation)."""
+        data = self._load()
+        if self.sid:
+            self.store.delete(self.sid)
+        self.sid, self.new, self.modified = None, True, True
+        return data
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __setitem__(self, key, value):
+        self._load()[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self._load()[key]
+        self.modified = True
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def clear(self):
+        self._load().clear()
+        self.modified = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Flask session interface backed by a MemorySessionStore or SQLiteSessionStore.
+
+    last_seen is written back at most once per `touch_interval` seconds, and idle sessions
+    are purged in bulk every `purge_interval` seconds.
+    """
+
+    def __init__(self, store, touch_interval=60, purge_interval=60):
+        self.store = store
+        self.touch_interval = touch_interval
+        self.purge_interval = purge_interval
+        self._next_purge = time.monotonic() + purge_interval
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "loads": 0, "saves": 0, "purged": 0,
+                       "cookie_bytes_in": 0, "cookie_bytes_out": 0, "load_seconds": 0.0, "save_seconds": 0.0}
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        self._count(requests=1, cookie_bytes_in=len(request.headers.get("Cookie", "")))
+        return ServerSideSession(self.store, sid)
+
+    def save_session(self, app, session, response):
+        if session.accessed:
+            response.vary.add("Cookie")
+        if session.loaded:
+            self._count(loads=1, load_seconds=session.load_seconds)
+
+        name = self.get_cookie_name(app)
+        domain, path = self.get_cookie_domain(app), self.get_cookie_path(app)
+        start = time.perf_counter()
+        if session.modified:
+            if not session:
+                if session.sid:
+                    self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            else:
+                if session.sid is None:
+                    session.sid = secrets.token_urlsafe(24)
+                self.store.set(session.sid, dict(session))
+                response.set_cookie(
+                    name, session.sid,
+                    expires=self.get_expiration_time(app, session),
+                    httponly=self.get_cookie_httponly(app),
+                    domain=domain, path=path,
+                    secure=self.get_cookie_secure(app),
+                    samesite=self.get_cookie_samesite(app),
+                )
+                self._count(saves=1)
+        elif session.loaded and session.sid and time.time() - session.last_seen >= self.touch_interval:
+            self.store.touch(session.sid)
+        save_seconds = time.perf_counter() - start
+
+        cookies_out = sum(len(v) for v in response.headers.getlist("Set-Cookie"))
+        self._count(cookie_bytes_out=cookies_out, save_seconds=save_seconds)
+        self._maybe_purge()
+
+    def _maybe_purge(self):
+        now = time.monotonic()
+        if now < self._next_purge:
+            return
+        with self._stats_lock:
+            if now < self._next_purge:
+                return
+            self._next_purge = now + self.purge_interval
+        self._count(purged=self.store.purge_expired())
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for k, v in deltas.items():
+                self._stats[k] += v
+
+    def stats(self):
+        with self._stats_lock:
+            s = dict(self._stats)
+        requests = s["requests"] or 1
+        return {
+            "backend": type(self.store).__name__,
+            "sessions": len(self.store),
+            "requests": s["requests"],
+            "store_loads": s["loads"],
+            "store_saves": s["saves"],
+            "purged": s["purged"],
+            "avg_cookie_bytes_in": round(s["cookie_bytes_in"] / requests, 1),
+            "avg_cookie_bytes_out": round(s["cookie_bytes_out"] / requests, 1),
+            "avg_load_ms": round(s["load_seconds"] * 1000 / (s["loads"] or 1), 3),
+            "avg_overhead_ms": round((s["load_seconds"] + s["save_seconds"]) * 1000 / requests, 3),
+        }
+
+
+def make_session_interface():
+    """Build the session interface from SESSION_BACKEND / SESSION_DB / SESSION_IDLE_SECONDS."""
+    idle_ttl = int(os.getenv("SESSION_IDLE_SECONDS", "1800"))
+    if os.getenv("SESSION_BACKEND", "memory") == "sqlite":
+        store = SQLiteSessionStore(os.getenv("SESSION_DB", "sessions.db"), idle_ttl=idle_ttl)
+    else:
+        store = MemorySessionStore(int(os.getenv("SESSION_MAX", "100000")), idle_ttl=idle_ttl)
+    return ServerSideSessionInterface(store)
@@ -0,0 +1,122 @@
+"""
+Key rotation against the local mock issuer: tokens signed with a retired key are rejected and tokens
+signed with the new key verify once the JWKS has been refetched.
+
+    python -m pytest test_key_rotation.py
+"""
+import base64
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from jose.exceptions import JOSEError
+
+from auth import JWKSCache, TokenVerifier, UnknownKeyError, failure_reason
+from mock_oidc import MockIssuer
+
+
+def _with_header(header, **fields):
+    """Unsigned token whose base64url header is `header` with `fields` replaced."""
+    decoded = json.loads(base64.urlsafe_b64decode(header + "=" * (-len(header) % 4)))
+    decoded.update(fields)
+    encoded = base64.urlsafe_b64encode(json.dumps(decoded).encode()).rstrip(b"=").decode()
+    return f"{encoded}.e30.c2ln"
+
+
+class _JWKSServer:
+    """Serves `body()` as JSON on 127.0.0.1 and counts the requests."""
+
+    def __init__(self, body):
+        self.body = body
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                data = json.dumps(server.body()).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/certs"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class KeyRotationTest(unittest.TestCase):
+    def setUp(self):
+        # keep=1: rotating retires the previous key from the JWKS
+        self.issuer = MockIssuer("http://issuer.test/realms/myrealm", keep=1)
+        self.server = _JWKSServer(self.issuer.jwks)
+        self.addCleanup(self.server.close)
+        self.keys = JWKSCache(jwks_uri=self.server.url, min_refetch_interval=0, timeout=2)
+        self.verifier = TokenVerifier(self.keys, issuer=self.issuer.issuer, audience=[self.issuer.audience])
+
+    def test_rotation(self):
+        self.assertTrue(self.keys.refresh())
+        old_kid = self.issuer.current_kid
+        old_token = self.issuer.mint("alice")
+        self.assertEqual(self.verifier.verify(old_token)["sub"], "alice")
+
+        new_kid = self.issuer.rotate()
+        self.assertNotEqual(new_kid, old_kid)
+        new_token = self.issuer.mint("bob")
+        fetches = self.server.requests
+
+        # The new kid is not cached yet: verifying refetches the JWKS and picks it up
+        self.assertEqual(self.verifier.verify(new_token)["sub"], "bob")
+        self.assertEqual(self.server.requests, fetches + 1)
+        self.assertEqual(list(self.keys._keys), [new_kid])
+
+        with self.assertRaises(UnknownKeyError) as ctx:
+            self.verifier.verify(old_token)
+        self.assertEqual(failure_reason(ctx.exception), "unknown_kid")
+
+    def test_non_object_jwks_keeps_cached_keys(self):
+        self.assertTrue(self.keys.refresh())
+        token = self.issuer.mint()
+        for body in ([], "keys", 42, None, {"keys": {"kid": "x"}}):
+            self.server.body = lambda body=body: body
+            self.assertFalse(self.keys.refresh(), body)
+            self.assertEqual(self.verifier.verify(token)["sub"], "testuser")
+
+    def test_skips_non_object_keys(self):
+        self.server.body = lambda: {"keys": ["junk", 7] + self.issuer.jwks()["keys"]}
+        self.assertTrue(self.keys.refresh())
+        self.assertEqual(list(self.keys._keys), [self.issuer.current_kid])
+
+    def test_failure_reasons(self):
+        self.keys.refresh()
+        header, payload, signature = self.issuer.mint().split(".")
+        forged = MockIssuer(self.issuer.issuer).mint().split(".", 1)[1]
+        cases = {
+            "not-a-jwt": "malformed",
+            f"e30x.{payload}.{signature}": "malformed",
+            f"{header}.{payload}.{signature[::-1]}": "invalid_signature",
+            f"{header}.{forged}": "invalid_signature",
+            self.issuer.mint(ttl=-300): "expired",
+            self.issuer.mint(aud="someone-else"): "invalid_claims",
+            _with_header(header, kid=["x"]): "malformed",
+            _with_header(header, kid={"x": 1}): "malformed",
+            _with_header(header, alg=["RS256"]): "malformed",
+            _with_header(header, kid="retired"): "unknown_kid",
+        }
+        for token, reason in cases.items():
+            with self.assertRaises(JOSEError) as ctx:
+                self.verifier.verify(token)
+            self.assertEqual(failure_reason(ctx.exception), reason, token)
+
+
+if __name__ == "__main__":
+    unittest.main()
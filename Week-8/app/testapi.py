@@ -4,9 +4,10 @@ import os
 load_dotenv()
 
 # --- CONFIGURATION ---
-KEYCLOAK_URL = "http://localhost:8080"
-REALM = "myrealm"
-CLIENT_ID = "flask-client"
+# Override KEYCLOAK_URL to test against the local stand-in issuer (python mock_oidc.py --port 8081)
+KEYCLOAK_URL = os.getenv("KEYCLOAK_URL", "http://localhost:8080")
+REALM = os.getenv("KEYCLOAK_REALM", "myrealm")
+CLIENT_ID = os.getenv("KEYCLOAK_CLIENT_ID", "flask-client")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET")
 USERNAME = "testuser"
 PASSWORD = "password"
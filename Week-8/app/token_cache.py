@@ -0,0 +1,139 @@
+"""
+Bounded LRU cache of verified token claims, so a bearer token reused across many
+requests is only verified once.
+
+Entries are keyed by the SHA-256 of the token (raw tokens are never stored) and live
+until the token's "exp" or `max_ttl` seconds, whichever comes first. Logging out a
+session ("sid") or revoking a token ("jti") drops its entries and keeps it on a
+denylist until the token would have expired anyway, so a later re-verification
+can't bring it back.
+
+The cache is per process and guarded by one lock, which makes it safe for threaded
+WSGI servers; revocations are not shared between worker processes.
+"""
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class TokenCache:
+    def __init__(self, maxsize=10000, max_ttl=300, revocation_ttl=86400, clock=time.time, on_revoked=None):
+        self.maxsize = maxsize
+        self.max_ttl = max_ttl
+        # How long to remember a revoked session when we don't know its tokens' exp
+        self.revocation_ttl = revocation_ttl
+        self.clock = clock
+        # Called whenever a validly signed but revoked token is rejected
+        self.on_revoked = on_revoked
+        self._entries = OrderedDict()  # key -> (claims, expires_at)
+        self._revoked_sids = {}  # sid -> remember until
+        self._revoked_jtis = {}  # jti -> remember until
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revocations = 0
+        self._verifications = 0
+        self._verify_seconds = 0.0
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def _is_revoked(self, claims, now):
+        sid_until = self._revoked_sids.get(claims.get("sid"))
+        jti_until = self._revoked_jtis.get(claims.get("jti"))
+        return (sid_until is not None and sid_until > now) or (jti_until is not None and jti_until > now)
+
+    def get_or_verify(self, token, verify):
+        """
+        Return cached claims for `token`, or call verify(token) and cache the result.
+
+        verify must return the claims dict or None; failures are not cached.
+        """
+        if not token:
+            return None
+        key = self._key(token)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                claims, expires_at = entry
+                if expires_at > now and not self._is_revoked(claims, now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return claims
+                del self._entries[key]
+            self.misses += 1
+
+        # Verify outside the lock so a slow verification doesn't stall cache hits
+        start = time.perf_counter()
+        claims = verify(token)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._verifications += 1
+            self._verify_seconds += elapsed
+            if not claims:
+                return None
+            if self._is_revoked(claims, now):
+                if self.on_revoked:
+                    self.on_revoked()
+                return None
+            expires_at = min(claims.get("exp", now), now + self.max_ttl)
+            if expires_at > now:
+                self._entries[key] = (claims, expires_at)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return claims
+
+    def revoke_token(self, token, claims=None):
+        """Drop one token; with its claims, also denylist its jti until it expires."""
+        with self._lock:
+            entry = self._entries.pop(self._key(token), None)
+            claims = claims or (entry[0] if entry else None)
+            if claims and claims.get("jti"):
+                self._revoked_jtis[claims["jti"]] = claims.get("exp", self.clock() + self.revocation_ttl)
+            self.revocations += 1
+            self._prune(self.clock())
+
+    def revoke_session(self, sid, until=None):
+        """Drop every cached token of a logged-out session and denylist the sid."""
+        now = self.clock()
+        with self._lock:
+            self._revoked_sids[sid] = until or now + self.revocation_ttl
+            stale = [k for k, (claims, _) in self._entries.items() if claims.get("sid") == sid]
+            for k in stale:
+                del self._entries[k]
+            self.revocations += 1
+            self._prune(now)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _prune(self, now):
+        for denylist in (self._revoked_sids, self._revoked_jtis):
+            for k in [k for k, until in denylist.items() if until <= now]:
+                del denylist[k]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            avg_verify = self._verify_seconds / self._verifications if self._verifications else 0.0
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "revocations": self.revocations,
+                "avg_verify_ms": round(avg_verify * 1000, 3),
+                # Each hit skipped one verification of average cost
+                "verify_time_saved_ms": round(self.hits * avg_verify * 1000, 3),
+            }
@@ -15,6 +15,7 @@ import pandas as pd
 import h2o
 from h2o.automl import H2OAutoML
 
+from utils import tracing
 from utils.features import compute_features, feature_names
 
 SUPPORTED_SHAP_ALGOS = {"GBM", "XGBoost", "DRF"}
@@ -73,13 +74,26 @@ def main():
     ap.add_argument("--rich_features", action="store_true", help="Use extended feature set (default True)", default=True)
     ap.add_argument("--max_runtime_secs", type=int, default=180, help="AutoML wall clock limit")
     ap.add_argument("--outdir", type=str, default="model", help="Directory to save MOJO/BIN and metadata")
+    ap.add_argument("--profile", type=str, default=None, metavar="TRACE_JSON",
+                    help="Record stage timings; write a Chrome trace here and print percentiles")
     args = ap.parse_args()
+    if args.profile:
+        tracing.enable()
+    try:
+        train(args)
+    finally:
+        tracing.finish(args.profile)
 
+
+def train(args) -> None:
+    """Train AutoML on args.csv and export the best SHAP-capable model."""
     outdir = Path(args.outdir)
     outdir.mkdir(parents=True, exist_ok=True)
 
     # 1) Load CSV with pandas first so we can compute features identically
-    raw = pd.read_csv(args.csv)
+    with tracing.span("load_csv", path=args.csv) as sp:
+        raw = pd.read_csv(args.csv)
+        sp.set(rows=len(raw))
     if args.label_col:
         label_col = args.label_col
     else:
@@ -88,40 +102,47 @@ def main():
     if args.domain_col not in raw.columns:
         raise ValueError(f"Domain column '{args.domain_col}' not found. Available: {list(raw.columns)}")
 
-    raw = _ensure_binary(raw, label_col)
+    with tracing.span("prepare_labels"):
+        raw = _ensure_binary(raw, label_col)
 
     # 2) Compute features
     feats = compute_features(raw[args.domain_col].tolist(), rich=args.rich_features)
     feats[label_col] = raw[label_col].values
 
     # 3) Spin up H2O and prepare frames
-    h2o.init()
-    hf = h2o.H2OFrame(feats)
-    hf[label_col] = hf[label_col].asfactor()
+    with tracing.span("h2o_init"):
+        h2o.init()
+    with tracing.span("h2o_frame", rows=len(feats)):
+        hf = h2o.H2OFrame(feats)
+        hf[label_col] = hf[label_col].asfactor()
     x = feature_names(args.rich_features)
     y = label_col
 
     # 4) Train AutoML, restrict to SHAP-capable algos to guarantee predict_contributions support
-    aml = H2OAutoML(
-        max_runtime_secs=args.max_runtime_secs,
-        seed=42,
-        include_algos=list(SUPPORTED_SHAP_ALGOS),
-        sort_metric="AUC"
-    )
-    aml.train(x=x, y=y, training_frame=hf)
-
-    leader_id = pick_best_shap_model(aml)
-    model = h2o.get_model(leader_id)
+    with tracing.span("automl_train", max_runtime_secs=args.max_runtime_secs):
+        aml = H2OAutoML(
+            max_runtime_secs=args.max_runtime_secs,
+            seed=42,
+            include_algos=list(SUPPORTED_SHAP_ALGOS),
+            sort_metric="AUC"
+        )
+        aml.train(x=x, y=y, training_frame=hf)
+
+    with tracing.span("select_model") as sp:
+        leader_id = pick_best_shap_model(aml)
+        model = h2o.get_model(leader_id)
+        sp.set(model=leader_id)
 
     # 5) Save leaderboard and model artifacts
-    lb_path = outdir / "leaderboard.csv"
-    aml.leaderboard.as_data_frame().to_csv(lb_path, index=False)
+    with tracing.span("save_artifacts"):
+        lb_path = outdir / "leaderboard.csv"
+        aml.leaderboard.as_data_frame().to_csv(lb_path, index=False)
 
-    # BIN model (fallback for local explanations if MOJO import isn't available)
-    bin_path = h2o.save_model(model=model, path=str(outdir), force=True)
+        # BIN model (fallback for local explanations if MOJO import isn't available)
+        bin_path = h2o.save_model(model=model, path=str(outdir), force=True)
 
-    # MOJO
-    mojo_zip = model.download_mojo(path=str(outdir), get_genmodel_jar=False)
+        # MOJO
+        mojo_zip = model.download_mojo(path=str(outdir), get_genmodel_jar=False)
 
     # 6) Save metadata for inference
     meta = {
@@ -0,0 +1,180 @@
+"""
+pivot_domains.py
+Build and query the related-domain index (utils/similarity.py).
+
+    python pivot_domains.py add --index domain_index data/observed.csv
+    python pivot_domains.py query --index domain_index paypa1-login.com
+    python pivot_domains.py bench --domains 2000000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import shutil
+import string
+import sys
+import tempfile
+import time
+from typing import Iterator, List
+
+import pandas as pd
+
+from utils import tracing
+from utils.similarity import DomainIndex
+
+BATCH_SIZE = 500_000
+
+
+def read_domains(path: str, domain_col: str) -> Iterator[List[str]]:
+    """Domains in batches from a CSV (`domain_col`) or a one-per-line file."""
+    if path.endswith(".csv"):
+        for chunk in pd.read_csv(path, usecols=[domain_col],
+                                 chunksize=BATCH_SIZE):
+            yield chunk[domain_col].dropna().astype(str).tolist()
+        return
+    src = sys.stdin if path == "-" else open(path)
+    try:
+        batch = []
+        for line in src:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                batch.append(line)
+            if len(batch) >= BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        if src is not sys.stdin:
+            src.close()
+
+
+def add(args) -> None:
+    index = DomainIndex.open(args.index)
+    for path in args.inputs:
+        for batch in read_domains(path, args.domain_col):
+            new = index.add(batch)
+            print(f"{path}: +{new} new of {len(batch)}", file=sys.stderr)
+    with tracing.span("save_index"):
+        index.save(args.index)
+    print(f"Index {args.index}: {len(index)} domains in "
+          f"{len(index.segments)} segments")
+
+
+def query(args) -> None:
+    index = DomainIndex.open(args.index)
+    for domain in args.domains:
+        result = index.query(domain, k=args.k)
+        if args.json:
+            print(json.dumps({"domain": domain, **result}))
+            continue
+        print(f"{domain}")
+        for name, score in result["lexical"]:
+            print(f"  lexical   {score:6.3f}  {name}")
+        for name, dist in result["features"]:
+            print(f"  features  {dist:6.3f}  {name}")
+
+
+def _synthetic(n: int, rng: random.Random) -> List[str]:
+    words = ["secure", "login", "account", "update", "verify", "mail",
+             "bank", "cloud", "shop", "support", "paypal", "apple"]
+    chars = string.ascii_lowercase + string.digits
+    tlds = [".com", ".net", ".org", ".ru", ".info"]
+    out = []
+    for i in range(n):
+        if i % 2:
+            label = "".join(rng.choices(chars, k=rng.randint(8, 24)))
+        else:
+            label = "-".join(rng.sample(words, rng.randint(1, 3)))
+            label += str(rng.randint(0, 9999))
+        out.append(label + rng.choice(tlds))
+    return out
+
+
+def bench(args) -> None:
+    """Build an index over synthetic domains, reopen it and time queries.
+
+    Without --index it is built in a temp directory, removed afterwards."""
+    path = args.index or tempfile.mkdtemp(prefix="domain-index-")
+    try:
+        _bench(args, path)
+    finally:
+        if not args.index:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _bench(args, path: str) -> None:
+    rng = random.Random(42)
+    index = DomainIndex()
+    start = time.perf_counter()
+    left = args.domains
+    while left:
+        n = min(BATCH_SIZE, left)
+        index.add(_synthetic(n, rng))
+        left -= n
+    index.save(path)
+    build = time.perf_counter() - start
+    print(f"built {len(index)} domains in {build:.1f}s "
+          f"({len(index) / build:,.0f}/s), {len(index.segments)} segments")
+
+    start = time.perf_counter()
+    index = DomainIndex.open(path)
+    print(f"opened {path} in {(time.perf_counter() - start) * 1e3:.0f} ms")
+
+    probes = _synthetic(args.queries, random.Random(7))
+    profiling = tracing.is_enabled()
+    if not profiling:
+        tracing.enable()
+    timed = tracing.wrap(index.query, "query")
+    for domain in probes:
+        timed(domain, k=args.k)
+    stats = tracing.summary()["query"]
+    print(f"{stats['count']} queries (k={args.k}): p50 {stats['p50_ms']:.2f}"
+          f" ms, p90 {stats['p90_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms")
+    if not profiling:
+        tracing.disable()
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Find domains related to a suspicious one")
+    ap.add_argument("--profile", type=str, default=None, metavar="TRACE_JSON",
+                    help="Write a Chrome trace here and print percentiles")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("add", help="Add observed domains to the index")
+    p.add_argument("inputs", nargs="+",
+                   help="CSV files, one-domain-per-line files or '-'")
+    p.add_argument("--index", type=str, default="domain_index")
+    p.add_argument("--domain_col", type=str, default="domain",
+                   help="Column with domain strings in CSV inputs")
+    p.set_defaults(run=add)
+
+    p = sub.add_parser("query", help="Top-k related domains")
+    p.add_argument("domains", nargs="+")
+    p.add_argument("--index", type=str, default="domain_index")
+    p.add_argument("-k", type=int, default=10)
+    p.add_argument("--json", action="store_true",
+                   help="One JSON object per queried domain")
+    p.set_defaults(run=query)
+
+    p = sub.add_parser("bench", help="Build and query a synthetic index")
+    p.add_argument("--domains", type=int, default=1_000_000)
+    p.add_argument("--queries", type=int, default=1000)
+    p.add_argument("--index", type=str, default=None,
+                   help="Where to build it (default: a temp directory)")
+    p.add_argument("-k", type=int, default=10)
+    p.set_defaults(run=bench)
+
+    args = ap.parse_args()
+    if args.profile:
+        tracing.enable()
+    try:
+        args.run(args)
+    finally:
+        tracing.finish(args.profile)
+
+
+if __name__ == "__main__":
+    main()
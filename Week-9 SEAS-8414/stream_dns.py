@@ -0,0 +1,334 @@
+"""
+stream_dns.py
+Continuous DGA detection on resolver query logs.
+
+Follows growing logs (through rotation), extracts query names, drops names
+already seen within a sliding window, scores the rest in batches with the
+exported model and writes alerts as JSONL. Read offsets are checkpointed
+after every scored batch, so a restart resumes where the last batch ended.
+Metrics (throughput, ingestion lag, unread backlog) are written as JSONL
+every --metrics_interval seconds.
+
+    python stream_dns.py /var/log/named/query.log --model_dir model \\
+        --alerts alerts.jsonl --checkpoint stream.ckpt
+
+Supported lines: BIND query logs, dnsmasq, unbound (log-queries) and JSON
+lines from Zeek (query), Suricata eve (dns.rrname) or anything with a
+query/qname field.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import signal
+import sys
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils import tracing
+from utils.features import RICH_FEATURES, compute_features
+from utils.logtail import Follower
+
+BIND_RE = re.compile(
+    r"^(\d{2}-\w{3}-\d{4} \d{2}:\d{2}:\d{2})\.(\d{3}) .*?query: (\S+) IN ")
+DNSMASQ_RE = re.compile(
+    r"^(\w{3} +\d+ \d{2}:\d{2}:\d{2}) .*?query\[\w+\] (\S+) from ")
+UNBOUND_RE = re.compile(r"^\[(\d+)\] .*?info: \S+ (\S+) \w+ IN\b")
+SKIP_SUFFIXES = (".arpa", ".local")
+
+
+# Stamps repeat within a second, and strptime dominates parsing otherwise
+@lru_cache(maxsize=4096)
+def _bind_time(text: str) -> float:
+    return datetime.strptime(text, "%d-%b-%Y %H:%M:%S").timestamp()
+
+
+@lru_cache(maxsize=4096)
+def _syslog_time(text: str) -> float:
+    # Syslog stamps have no year: a date well ahead of now is last year's
+    now = datetime.now()
+    t = datetime.strptime(f"{now.year} {text}", "%Y %b %d %H:%M:%S")
+    if t > now + timedelta(days=1):
+        t = t.replace(year=now.year - 1)
+    return t.timestamp()
+
+
+def _json_time(value) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")) \
+                .timestamp()
+        except ValueError:
+            return None
+    return None
+
+
+def parse_line(line: str) -> Optional[Tuple[str, Optional[float]]]:
+    """(query name, event time or None) from one log line."""
+    if line.startswith("{"):
+        try:
+            event = json.loads(line)
+        except ValueError:
+            return None
+        dns = event.get("dns")
+        if isinstance(dns, dict):
+            if dns.get("type", "query") != "query":
+                return None  # eve answer records repeat the query name
+            name = dns.get("rrname")
+        else:
+            name = event.get("query") or event.get("qname")
+        if not isinstance(name, str):
+            return None
+        stamp = event.get("timestamp", event.get("ts", event.get("time")))
+        return name, _json_time(stamp)
+    m = BIND_RE.match(line)
+    if m:
+        return m.group(3), _bind_time(m.group(1)) + int(m.group(2)) / 1000
+    m = DNSMASQ_RE.match(line)
+    if m:
+        return m.group(2), _syslog_time(m.group(1))
+    m = UNBOUND_RE.match(line)
+    if m:
+        return m.group(2), float(m.group(1))
+    return None
+
+
+def normalize(name: str) -> Optional[str]:
+    """Lower-case name without the root dot; None for names not worth
+    scoring (reverse lookups, mDNS, single labels)."""
+    name = name.strip().lower().rstrip(".")
+    if "." not in name or name.endswith(SKIP_SUFFIXES):
+        return None
+    return name
+
+
+class SlidingWindow:
+    """Names seen in the last `seconds`; each sighting restarts the clock."""
+
+    def __init__(self, seconds: float, max_names: int = 2_000_000):
+        self.seconds = seconds
+        self.max_names = max_names
+        self._last: "OrderedDict[str, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._last)
+
+    def seen(self, name: str, t: float) -> bool:
+        """Record a sighting; True if `name` was already in the window."""
+        last = self._last.get(name)
+        self._last[name] = max(t, last or t)
+        self._last.move_to_end(name)
+        while self._last:
+            oldest = next(iter(self._last))
+            if (self._last[oldest] >= t - self.seconds and
+                    len(self._last) <= self.max_names):
+                break
+            self._last.popitem(last=False)
+        return last is not None and last >= t - self.seconds
+
+
+class MojoScorer:
+    """DGA probability from the MOJO exported by 1_train_and_export.py."""
+
+    def __init__(self, model_dir: str):
+        with open(os.path.join(model_dir, "model_meta.json")) as f:
+            meta = json.load(f)
+        import h2o
+        self.h2o = h2o
+        h2o.init()
+        mojo = os.path.abspath(os.path.join(model_dir, meta["mojo_path"]))
+        self.model = h2o.import_mojo(mojo)
+        self.features = meta["features"]
+        self.column = f"p{meta['positive_class']}"
+
+    def score(self, feats: pd.DataFrame) -> np.ndarray:
+        frame = self.h2o.H2OFrame(feats[self.features])
+        pred = self.model.predict(frame).as_data_frame()
+        self.h2o.remove(frame)
+        return pred[self.column].to_numpy(dtype=float)
+
+
+def _iso(t: Optional[float]) -> Optional[str]:
+    if t is None:
+        return None
+    return datetime.fromtimestamp(t, timezone.utc).isoformat(
+        timespec="milliseconds")
+
+
+class Stream:
+    """Glue between the follower, the dedupe window and the scorer."""
+
+    def __init__(self, follower: Follower, scorer, args):
+        self.follower = follower
+        self.scorer = scorer
+        self.args = args
+        self.window = SlidingWindow(args.window)
+        self.pending: List[Tuple[str, Optional[float], str]] = []
+        self.alerts = sys.stdout if args.alerts == "-" else \
+            open(args.alerts, "a", buffering=1)
+        self.metrics = sys.stderr if args.metrics == "-" else \
+            open(args.metrics, "a", buffering=1)
+        self.stopping = False
+        self._reset_counters()
+        self.last_flush = self.last_metrics = time.monotonic()
+        self.lag: Optional[float] = None
+
+    def _reset_counters(self) -> None:
+        self.counts = dict.fromkeys(
+            ("lines", "names", "new_names", "scored", "alerts"), 0)
+        self.max_lag: Optional[float] = None
+
+    def ingest(self, path: str, data: bytes) -> None:
+        now = time.time()
+        lines = data.decode("utf-8", "replace").splitlines()
+        self.counts["lines"] += len(lines)
+        for line in lines:
+            parsed = parse_line(line)
+            if parsed is None:
+                continue
+            name, t = normalize(parsed[0]), parsed[1]
+            if name is None:
+                continue
+            self.counts["names"] += 1
+            if t is not None:
+                # Ingestion lag: from being logged to being read here
+                self.lag = now - t
+                if self.max_lag is None or self.lag > self.max_lag:
+                    self.max_lag = self.lag
+            if not self.window.seen(name, t if t is not None else now):
+                self.counts["new_names"] += 1
+                self.pending.append((name, t, path))
+
+    def flush(self) -> None:
+        """Score pending names, write alerts, then checkpoint offsets."""
+        if self.pending:
+            batch, self.pending = self.pending, []
+            with tracing.span("score_batch", names=len(batch)):
+                names = [name for name, _, _ in batch]
+                feats = compute_features(names, rich=True)
+                scores = self.scorer.score(feats)
+            self.counts["scored"] += len(batch)
+            now = _iso(time.time())
+            rows = feats[RICH_FEATURES].to_dict("records")
+            for (name, t, path), score, row in zip(batch, scores, rows):
+                if score < self.args.threshold:
+                    continue
+                self.counts["alerts"] += 1
+                self.alerts.write(json.dumps({
+                    "time": now,
+                    "event_time": _iso(t),
+                    "domain": name,
+                    "score": round(float(score), 4),
+                    "features": row,
+                    "source": path,
+                }) + "\n")
+            self.alerts.flush()
+            if self.alerts is not sys.stdout:
+                os.fsync(self.alerts.fileno())
+        # Everything read so far has been scored: safe to move offsets on
+        self.follower.save()
+        self.last_flush = time.monotonic()
+
+    def report(self) -> None:
+        now = time.monotonic()
+        elapsed = max(now - self.last_metrics, 1e-9)
+        self.metrics.write(json.dumps({
+            "time": _iso(time.time()),
+            **self.counts,
+            "lines_per_s": round(self.counts["lines"] / elapsed, 1),
+            "lag_s": None if self.lag is None else round(self.lag, 3),
+            "max_lag_s": None if self.max_lag is None
+            else round(self.max_lag, 3),
+            "backlog_bytes": self.follower.backlog(),
+            "window_names": len(self.window),
+            "files": len(self.follower.files),
+        }) + "\n")
+        self.last_metrics = now
+        self._reset_counters()
+
+    def run(self) -> None:
+        args = self.args
+        while not self.stopping:
+            chunks = self.follower.poll()
+            for path, data in chunks:
+                self.ingest(path, data)
+            now = time.monotonic()
+            caught_up = not chunks
+            if (len(self.pending) >= args.batch_size or caught_up or
+                    now - self.last_flush >= args.flush_interval):
+                self.flush()
+            if now - self.last_metrics >= args.metrics_interval:
+                self.report()
+            if caught_up:
+                if args.once:
+                    break
+                time.sleep(args.poll_interval)
+        self.flush()
+        self.report()
+
+    def close(self) -> None:
+        self.follower.close()
+        for f in (self.alerts, self.metrics):
+            if f not in (sys.stdout, sys.stderr):
+                f.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Follow DNS query logs and alert on DGA-like names")
+    ap.add_argument("logs", nargs="+",
+                    help="Log files or globs; rotated copies are followed "
+                         "automatically, do not list them")
+    ap.add_argument("--model_dir", type=str, default="model")
+    ap.add_argument("--threshold", type=float, default=0.5,
+                    help="Alert when the DGA probability is at least this")
+    ap.add_argument("--alerts", type=str, default="-",
+                    help="Alert JSONL output ('-' for stdout)")
+    ap.add_argument("--checkpoint", type=str, default="stream.ckpt",
+                    help="Read offsets, saved after every scored batch")
+    ap.add_argument("--from_end", action="store_true",
+                    help="Without a checkpoint, skip what is already logged")
+    ap.add_argument("--window", type=float, default=3600,
+                    help="Seconds a name stays deduplicated after a sighting")
+    ap.add_argument("--batch_size", type=int, default=1000)
+    ap.add_argument("--flush_interval", type=float, default=2.0,
+                    help="Max seconds a new name waits to be scored")
+    ap.add_argument("--poll_interval", type=float, default=0.5)
+    ap.add_argument("--metrics", type=str, default="-",
+                    help="Metrics JSONL output ('-' for stderr)")
+    ap.add_argument("--metrics_interval", type=float, default=10.0)
+    ap.add_argument("--once", action="store_true",
+                    help="Exit once every file is read to the end")
+    ap.add_argument("--profile", type=str, default=None, metavar="TRACE_JSON",
+                    help="Write a Chrome trace here and print percentiles")
+    args = ap.parse_args()
+    if args.profile:
+        tracing.enable()
+
+    stream = Stream(Follower(args.logs, args.checkpoint, args.from_end),
+                    MojoScorer(args.model_dir), args)
+
+    def stop(signum, frame):
+        stream.stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        stream.run()
+    finally:
+        stream.close()
+        tracing.finish(args.profile)
+
+
+if __name__ == "__main__":
+    main()
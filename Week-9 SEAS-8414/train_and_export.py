@@ -14,6 +14,7 @@ import pandas as pd
 import h2o
 from h2o.automl import H2OAutoML
 
+from utils import tracing
 from utils.features import compute_features, feature_names
 
 SUPPORTED_SHAP_ALGOS = {"GBM", "XGBoost", "DRF"}
@@ -70,17 +71,31 @@ def main():
                     help="AutoML wall clock limit")
     ap.add_argument("--outdir", type=str, default="model",
                     help="Directory to save MOJO/BIN and metadata")
+    ap.add_argument("--profile", type=str, default=None, metavar="TRACE_JSON",
+                    help="Record stage timings; write a Chrome trace here and print percentiles")
     args = ap.parse_args()
+    if args.profile:
+        tracing.enable()
+    try:
+        train(args)
+    finally:
+        tracing.finish(args.profile)
+
 
+def train(args) -> None:
+    """Train AutoML on args.csv and export the best SHAP-capable model."""
     outdir = Path(args.outdir)
     outdir.mkdir(parents=True, exist_ok=True)
 
     # 1) Load CSV
-    raw = pd.read_csv(args.csv)
+    with tracing.span("load_csv", path=args.csv) as sp:
+        raw = pd.read_csv(args.csv)
+        sp.set(rows=len(raw))
 
     # 2) Determine label column and normalize to 0/1
-    label_col = args.label_col or _infer_label_column(raw)
-    raw = _ensure_binary(raw, label_col)
+    with tracing.span("prepare_labels"):
+        label_col = args.label_col or _infer_label_column(raw)
+        raw = _ensure_binary(raw, label_col)
 
     # 3) Determine whether we have raw domains or precomputed features
     has_domain = args.domain_col in raw.columns
@@ -105,38 +120,44 @@ def main():
 
     # 4) Spin up H2O and prepare frames
     import h2o
-    h2o.init(ip="localhost", port=54325, start_h2o=False, strict_version_check=False)
-    hf = h2o.H2OFrame(feats)
-    hf[label_col] = hf[label_col].asfactor()
+    with tracing.span("h2o_init"):
+        h2o.init(ip="localhost", port=54325, start_h2o=False, strict_version_check=False)
+    with tracing.span("h2o_frame", rows=len(feats)):
+        hf = h2o.H2OFrame(feats)
+        hf[label_col] = hf[label_col].asfactor()
 
     # 5) Train AutoML, restrict to SHAP-capable algos
-    aml = H2OAutoML(
-        max_runtime_secs=args.max_runtime_secs,
-        seed=42,
-        include_algos=list(SUPPORTED_SHAP_ALGOS),
-        sort_metric="AUC",
-    )
-    aml.train(x=x, y=y, training_frame=hf)
+    with tracing.span("automl_train", max_runtime_secs=args.max_runtime_secs):
+        aml = H2OAutoML(
+            max_runtime_secs=args.max_runtime_secs,
+            seed=42,
+            include_algos=list(SUPPORTED_SHAP_ALGOS),
+            sort_metric="AUC",
+        )
+        aml.train(x=x, y=y, training_frame=hf)
 
-    leader_id = pick_best_shap_model(aml)
-    model = h2o.get_model(leader_id)
+    with tracing.span("select_model") as sp:
+        leader_id = pick_best_shap_model(aml)
+        model = h2o.get_model(leader_id)
+        sp.set(model=leader_id)
 
     # 6) Save leaderboard and model artifacts
-    lb_path = outdir / "leaderboard.csv"
-    aml.leaderboard.as_data_frame().to_csv(lb_path, index=False)
-
-    # BIN model (fallback for local explanations if MOJO import isn't available)
-    bin_path = h2o.save_model(model=model, path=str(outdir), force=True)
-
-    # MOJO (normalize filename to DGA_Leader.zip for the rubric)
-    mojo_zip = model.download_mojo(path=str(outdir), get_genmodel_jar=False)
-    try:
-        import shutil
-        target_zip = outdir / "DGA_Leader.zip"
-        shutil.copyfile(mojo_zip, target_zip)
-        mojo_zip = str(target_zip)
-    except Exception:
-        pass
+    with tracing.span("save_artifacts"):
+        lb_path = outdir / "leaderboard.csv"
+        aml.leaderboard.as_data_frame().to_csv(lb_path, index=False)
+
+        # BIN model (fallback for local explanations if MOJO import isn't available)
+        bin_path = h2o.save_model(model=model, path=str(outdir), force=True)
+
+        # MOJO (normalize filename to DGA_Leader.zip for the rubric)
+        mojo_zip = model.download_mojo(path=str(outdir), get_genmodel_jar=False)
+        try:
+            import shutil
+            target_zip = outdir / "DGA_Leader.zip"
+            shutil.copyfile(mojo_zip, target_zip)
+            mojo_zip = str(target_zip)
+        except Exception:
+            pass
 
     # 7) Save metadata for inference
     meta = {
@@ -7,6 +7,8 @@ import re
 from typing import Dict, List
 import pandas as pd
 
+from utils import tracing
+
 
 _ALLOWED_CHARS_RE = re.compile(r"[a-z0-9.-]")
 
@@ -61,22 +63,31 @@ def compute_features(domains: List[str], rich: bool = True) -> pd.DataFrame:
     Compute features for a list of domain strings.
     Returns a pandas DataFrame with consistent column order.
     """
-    rows = []
-    for d in domains:
-        cd = _clean_domain(d)
-        base = {
-            "length": domain_length(cd),
-            "entropy": shannon_entropy(cd.replace(".", "")),  # entropy without dots
-        }
-        if rich:
-            base.update({
-                "digit_ratio": digit_ratio(cd),
-                "hyphen_ratio": hyphen_ratio(cd),
-                "vowel_ratio": vowel_ratio(cd),
-            })
-        rows.append(base)
-    cols = RICH_FEATURES if rich else BASIC_FEATURES
-    return pd.DataFrame(rows, columns=cols)
+    with tracing.span("compute_features", domains=len(domains), rich=rich):
+        # Per-domain stages are timed only while tracing is enabled
+        clean = tracing.wrap(_clean_domain, "clean_domain")
+        length = tracing.wrap(domain_length, "length")
+        entropy = tracing.wrap(shannon_entropy, "entropy")
+        digits = tracing.wrap(digit_ratio, "digit_ratio")
+        hyphens = tracing.wrap(hyphen_ratio, "hyphen_ratio")
+        vowels = tracing.wrap(vowel_ratio, "vowel_ratio")
+        rows = []
+        for d in domains:
+            cd = clean(d)
+            base = {
+                "length": length(cd),
+                "entropy": entropy(cd.replace(".", "")),  # entropy without dots
+            }
+            if rich:
+                base.update({
+                    "digit_ratio": digits(cd),
+                    "hyphen_ratio": hyphens(cd),
+                    "vowel_ratio": vowels(cd),
+                })
+            rows.append(base)
+        cols = RICH_FEATURES if rich else BASIC_FEATURES
+        with tracing.span("features_frame", rows=len(rows)):
+            return pd.DataFrame(rows, columns=cols)
 
 def feature_names(rich: bool = True) -> List[str]:
     return RICH_FEATURES if rich else BASIC_FEATURES
\ No newline at end of file
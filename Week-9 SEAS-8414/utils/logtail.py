@@ -0,0 +1,233 @@
+"""
+Follow growing log files across rotation, with checkpointed offsets.
+
+Only complete lines are returned. A file's offset therefore always points
+at the start of a line, and saving the offsets after the returned lines
+are processed means a restart resumes exactly there, without re-reading
+or skipping anything.
+
+Rotation is detected by the path pointing at a new inode. The rotated
+file is drained before the new one is read. After a restart the rotated
+file is found again by inode among its siblings (query.log.1,
+query.log-20251019, ...). A file whose size drops below the offset was
+truncated in place (copytruncate) and is read again from the start.
+Rotated files that were compressed or deleted while the follower was down
+cannot be resumed; that is reported as a warning.
+"""
+from __future__ import annotations
+
+import glob
+import json
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+READ_SIZE = 1 << 20  # bytes read per file per poll
+
+
+class _Reader:
+    """One open file (one inode) and the offset of its next unread line."""
+
+    def __init__(self, path: str, offset: int = 0):
+        self.file = open(path, "rb")
+        st = os.fstat(self.file.fileno())
+        self.dev, self.ino = st.st_dev, st.st_ino
+        self.offset = offset if offset <= st.st_size else 0
+        self.idle = False  # rotated away and found empty on the last poll
+
+    def read(self, size: int) -> bytes:
+        """Complete lines from the offset on, at most `size` bytes."""
+        self.file.seek(self.offset)
+        data = self.file.read(size)
+        end = data.rfind(b"\n") + 1
+        if not end and len(data) == size:
+            end = size  # one line longer than a whole read: pass it on
+        self.offset += end
+        return data[:end]
+
+    def size(self) -> int:
+        return os.fstat(self.file.fileno()).st_size
+
+    def state(self) -> dict:
+        return {"dev": self.dev, "ino": self.ino, "offset": self.offset}
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def _find_by_inode(path: str, dev: int, ino: int) -> Optional[str]:
+    """The file next to `path` (a rotated copy) with the given inode."""
+    for candidate in glob.glob(glob.escape(path) + "*"):
+        try:
+            st = os.stat(candidate)
+        except OSError:
+            continue
+        if (st.st_dev, st.st_ino) == (dev, ino):
+            return candidate
+    return None
+
+
+def _warn(message: str) -> None:
+    print(f"[logtail] {message}", file=sys.stderr)
+
+
+class FollowedFile:
+    """A log path followed through rotations."""
+
+    def __init__(self, path: str, state: Optional[dict] = None,
+                 from_end: bool = False):
+        self.path = path
+        self.current: Optional[_Reader] = None
+        self.rotated: List[_Reader] = []  # drained oldest first
+        if state:
+            self._resume(state)
+        elif os.path.exists(path):
+            self.current = _Reader(path)
+            if from_end:
+                self.current.offset = self.current.size()
+
+    def _reopen(self, path: str, st: dict) -> Optional[_Reader]:
+        """Reader for the inode in `st`, at `path` or a rotated sibling."""
+        try:
+            cur = os.stat(path)
+            if (cur.st_dev, cur.st_ino) == (st["dev"], st["ino"]):
+                return _Reader(path, st["offset"])
+        except OSError:
+            pass
+        found = _find_by_inode(path, st["dev"], st["ino"])
+        if found is None:
+            _warn(f"{path}: rotated file with inode {st['ino']} is gone; "
+                  f"lines after offset {st['offset']} were not read")
+            return None
+        return _Reader(found, st["offset"])
+
+    def _resume(self, state: dict) -> None:
+        for st in state.get("rotated", []):
+            reader = self._reopen(self.path, st)
+            if reader is not None:
+                self.rotated.append(reader)
+        reader = self._reopen(self.path, state) if "ino" in state else None
+        if reader is None or reader.file.name != self.path:
+            # The checkpointed file was rotated away while we were down
+            if reader is not None:
+                self.rotated.append(reader)
+            reader = _Reader(self.path) if os.path.exists(self.path) else None
+        self.current = reader
+
+    def _check_rotation(self) -> bool:
+        """Switch to a new file at `path`; True if there is more to read."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False  # renamed, new file not created yet
+        cur = self.current
+        if cur is None:
+            self.current = _Reader(self.path)
+        elif (st.st_dev, st.st_ino) != (cur.dev, cur.ino):
+            self.rotated.append(cur)
+            self.current = _Reader(self.path)
+        elif st.st_size < cur.offset:
+            _warn(f"{self.path}: truncated, reading from the start")
+            cur.offset = 0
+        else:
+            return False
+        return True
+
+    def read(self, size: int = READ_SIZE) -> bytes:
+        """Next complete lines, rotated files first; b'' when caught up."""
+        for reader in list(self.rotated):
+            data = reader.read(size)
+            if data:
+                reader.idle = False
+                return data
+            if reader.idle:
+                # Still empty a poll after rotation: the writer has moved on
+                self.rotated.remove(reader)
+                reader.close()
+            else:
+                reader.idle = True
+        data = self.current.read(size) if self.current else b""
+        if not data and self._check_rotation():
+            data = self.read(size)
+        return data
+
+    def backlog(self) -> int:
+        """Bytes written but not read yet."""
+        readers = self.rotated + ([self.current] if self.current else [])
+        return sum(max(0, r.size() - r.offset) for r in readers)
+
+    def state(self) -> Optional[dict]:
+        if self.current is None and not self.rotated:
+            return None
+        state = self.current.state() if self.current else {}
+        if self.rotated:
+            state["rotated"] = [r.state() for r in self.rotated]
+        return state
+
+    def close(self) -> None:
+        for reader in self.rotated + ([self.current] if self.current else []):
+            reader.close()
+
+
+class Follower:
+    """
+    Follow every file matching `patterns` (paths or globs, re-expanded on
+    each poll so new files are picked up), resuming from `checkpoint`.
+    """
+
+    def __init__(self, patterns: List[str], checkpoint: Optional[str] = None,
+                 from_end: bool = False):
+        self.patterns = patterns
+        self.checkpoint = checkpoint
+        self.files: Dict[str, FollowedFile] = {}
+        self._saved: Dict[str, dict] = {}
+        self._last_saved: Optional[dict] = None
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                self._saved = json.load(f).get("files", {})
+        self.discover(from_end)
+
+    def discover(self, from_end: bool = False) -> None:
+        """Start following new matches; files created later start at 0."""
+        for pattern in self.patterns:
+            magic = glob.has_magic(pattern)
+            for path in glob.glob(pattern) if magic else [pattern]:
+                if path not in self.files:
+                    self.files[path] = FollowedFile(
+                        path, self._saved.get(path), from_end)
+
+    def poll(self, size: int = READ_SIZE) -> List[Tuple[str, bytes]]:
+        """(path, complete lines) for each file with new data."""
+        self.discover()
+        chunks = []
+        for path, followed in self.files.items():
+            data = followed.read(size)
+            if data:
+                chunks.append((path, data))
+        return chunks
+
+    def backlog(self) -> int:
+        return sum(f.backlog() for f in self.files.values())
+
+    def save(self) -> None:
+        """Atomically write every file's offset to the checkpoint."""
+        if not self.checkpoint:
+            return
+        files = dict(self._saved)
+        for path, followed in self.files.items():
+            state = followed.state()
+            if state is not None:
+                files[path] = state
+        if files == self._last_saved:
+            return
+        tmp = self.checkpoint + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"files": files}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.checkpoint)
+        self._last_saved = files
+
+    def close(self) -> None:
+        for followed in self.files.values():
+            followed.close()
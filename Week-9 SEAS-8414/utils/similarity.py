@@ -0,0 +1,399 @@
+"""
+Similarity index for pivoting from one domain to related ones.
+
+Two views of every observed domain:
+- lexical: MinHash over character 3-grams of the domain without its TLD,
+  bucketed with LSH (banded signatures kept as sorted arrays and searched
+  with binary search), ranked by estimated Jaccard similarity;
+- statistical: the RICH_FEATURES vector, scaled to unit variance, in a
+  KD-tree, so DGA siblings with a similar length/entropy/digit profile
+  surface even when they share no characters. The scales are estimated
+  again on every add until SCALE_SAMPLE domains have been indexed (older
+  trees are rescaled), and are fixed from then on.
+
+The index is a list of immutable segments. `add()` writes new domains to
+a fresh segment and merges it with its predecessor while they are of
+similar size, so there are O(log n) segments. Saved segments are .npy
+files opened memory-mapped plus a pickled KD-tree, so a large index opens
+quickly and a query costs a few binary searches and one tree lookup per
+segment.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from utils import tracing
+from utils.features import RICH_FEATURES, _clean_domain, compute_features
+
+INDEX_VERSION = 1
+ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789.-^$"
+NUM_SYMBOLS = len(ALPHABET)
+NUM_GRAMS = NUM_SYMBOLS ** 3  # < 2**16, so a gram id fits in uint16
+MAX_BUCKET = 256  # candidates taken from one LSH bucket per segment
+SCALE_SAMPLE = 10_000  # domains the feature scales are estimated from
+
+_CODES = np.zeros(256, dtype=np.uint64)
+for _i, _ch in enumerate(ALPHABET):
+    _CODES[ord(_ch)] = _i
+
+
+def shingle_text(domain: str) -> str:
+    """Cleaned domain without its TLD, between ^ and $ markers."""
+    d = _clean_domain(domain)
+    if "." in d:
+        d = d.rsplit(".", 1)[0]
+    return "^" + d + "$" if d else "^$$"
+
+
+def _domain_hash(domain: str) -> int:
+    digest = hashlib.blake2b(domain.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _hashes(domains: List[str]) -> np.ndarray:
+    return np.fromiter((_domain_hash(d) for d in domains),
+                       dtype=np.uint64, count=len(domains))
+
+
+class MinHasher:
+    """
+    MinHash over character 3-grams with a random value per gram and
+    permutation. A signature slot holds the id of the minimising gram, so
+    two slots are equal exactly when the two sets collide.
+    """
+
+    def __init__(self, num_perm: int = 32, seed: int = 7):
+        self.num_perm = num_perm
+        rng = np.random.default_rng(seed)
+        values = rng.integers(0, 2 ** 32, size=(num_perm, NUM_GRAMS),
+                              dtype=np.uint64)
+        # value << 16 | gram: the minimum carries its gram id in the low bits
+        grams = np.arange(NUM_GRAMS, dtype=np.uint64)
+        self.table = (values << np.uint64(16)) | grams
+
+    def signatures(self, texts: List[str]) -> np.ndarray:
+        """(len(texts), num_perm) uint16 signatures; texts are >= 3 chars."""
+        lengths = np.fromiter((len(t) for t in texts), dtype=np.int64,
+                              count=len(texts))
+        raw = np.frombuffer("".join(texts).encode("ascii"), dtype=np.uint8)
+        codes = _CODES[raw]
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        counts = lengths - 2
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        # Character position of every 3-gram that lies inside its own text
+        pos = np.arange(counts.sum()) - np.repeat(starts - offsets, counts)
+        grams = (codes[pos] * NUM_SYMBOLS + codes[pos + 1]) * NUM_SYMBOLS
+        grams += codes[pos + 2]
+        sig = np.empty((len(texts), self.num_perm), dtype=np.uint16)
+        for k in range(self.num_perm):
+            mins = np.minimum.reduceat(self.table[k][grams], starts)
+            sig[:, k] = mins & np.uint64(0xFFFF)
+        return sig
+
+
+def band_keys(sig: np.ndarray, bands: int) -> np.ndarray:
+    """(bands, n) uint64 LSH keys: each band's slots packed together."""
+    rows = sig.shape[1] // bands
+    keys = np.zeros((bands, sig.shape[0]), dtype=np.uint64)
+    for b in range(bands):
+        for j in range(rows):
+            slot = sig[:, b * rows + j].astype(np.uint64)
+            keys[b] |= slot << np.uint64(16 * j)
+    return keys
+
+
+class Segment:
+    """Immutable slice of the index; arrays may be memory-mapped."""
+
+    ARRAYS = ("offsets", "sig", "keys", "key_ids", "hashes")
+
+    def __init__(self, blob, offsets, sig, keys, key_ids, hashes,
+                 tree: cKDTree, path: Optional[str] = None):
+        self.blob = blob
+        self.offsets = offsets
+        self.sig = sig
+        self.keys = keys
+        self.key_ids = key_ids
+        self.hashes = hashes
+        self.tree = tree  # over the scaled feature vectors, in id order
+        self.path = path
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def domain(self, i: int) -> str:
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        return bytes(self.blob[lo:hi]).decode()
+
+    @classmethod
+    def _assemble(cls, blob, offsets, sig, feats, hashes,
+                  bands: int) -> "Segment":
+        keys = band_keys(sig, bands)
+        order = np.argsort(keys, axis=1, kind="stable")
+        keys = np.take_along_axis(keys, order, axis=1)
+        return cls(blob, offsets, sig, keys, order.astype(np.uint32),
+                   np.sort(hashes), cKDTree(feats))
+
+    @classmethod
+    def build(cls, domains: List[str], sig: np.ndarray, feats: np.ndarray,
+              bands: int) -> "Segment":
+        encoded = [d.encode() for d in domains]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(e) for e in encoded])
+        return cls._assemble(b"".join(encoded), offsets, sig, feats,
+                             _hashes(domains), bands)
+
+    @classmethod
+    def merge(cls, segments: List["Segment"], bands: int) -> "Segment":
+        """One segment holding all of `segments`, in order."""
+        blob = b"".join(bytes(s.blob) for s in segments)
+        offsets, base = [np.zeros(1, dtype=np.int64)], 0
+        for s in segments:
+            offsets.append(np.asarray(s.offsets[1:]) + base)
+            base += int(s.offsets[-1])
+        return cls._assemble(
+            blob, np.concatenate(offsets),
+            np.concatenate([np.asarray(s.sig) for s in segments]),
+            np.concatenate([s.tree.data for s in segments]),
+            np.concatenate([np.asarray(s.hashes) for s in segments]),
+            bands)
+
+    def rescaled(self, factor: np.ndarray) -> "Segment":
+        """Copy whose feature vectors are multiplied by `factor` per axis."""
+        return Segment(self.blob, self.offsets, self.sig, self.keys,
+                       self.key_ids, self.hashes,
+                       cKDTree(self.tree.data * factor))
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        pos = np.searchsorted(self.hashes, hashes)
+        pos[pos == len(self.hashes)] = 0
+        return self.hashes[pos] == hashes
+
+    def lexical_candidates(self, qkeys: np.ndarray) -> np.ndarray:
+        """Ids sharing at least one LSH band with the query."""
+        found = []
+        for b, key in enumerate(qkeys):
+            lo, hi = np.searchsorted(self.keys[b], [key, key + np.uint64(1)])
+            if hi > lo:
+                found.append(self.key_ids[b][lo:min(hi, lo + MAX_BUCKET)])
+        if not found:
+            return np.empty(0, dtype=np.uint32)
+        return np.unique(np.concatenate(found))
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "domains.bin"), "wb") as f:
+            f.write(bytes(self.blob))
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, name + ".npy"),
+                    np.asarray(getattr(self, name)))
+        with open(os.path.join(path, "tree.pkl"), "wb") as f:
+            pickle.dump(self.tree, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.path = path
+
+    @classmethod
+    def load(cls, path: str) -> "Segment":
+        arrays = {
+            name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+            for name in cls.ARRAYS
+        }
+        blob_path = os.path.join(path, "domains.bin")
+        blob = b""
+        if os.path.getsize(blob_path):
+            blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+        with open(os.path.join(path, "tree.pkl"), "rb") as f:
+            tree = pickle.load(f)
+        return cls(blob, tree=tree, path=path, **arrays)
+
+
+class DomainIndex:
+    """
+    Incremental lexical + feature-space neighbour index over domains.
+
+        index = DomainIndex.open("domain_index")
+        index.add(domains)
+        index.save()
+        index.query("paypa1-secure-login.com", k=10)
+    """
+
+    def __init__(self, num_perm: int = 32, bands: int = 16, seed: int = 7,
+                 scales: Optional[List[float]] = None):
+        if num_perm % bands or num_perm // bands > 4:
+            raise ValueError(
+                "num_perm must be bands * rows with at most 4 rows per band")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.seed = seed
+        self.scales = scales
+        # Domains the scales were estimated from; given scales are final
+        self.scale_sample = 0 if scales is None else SCALE_SAMPLE
+        self.hasher = MinHasher(num_perm, seed)
+        self.segments: List[Segment] = []
+        self.path: Optional[str] = None
+
+    def __len__(self) -> int:
+        return sum(len(s) for s in self.segments)
+
+    @classmethod
+    def open(cls, path: str) -> "DomainIndex":
+        """Open a saved index; an empty one if `path` has none yet."""
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            index = cls()
+            index.path = path
+            return index
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta["version"] != INDEX_VERSION:
+            raise ValueError(
+                f"Index version {meta['version']} is not supported")
+        index = cls(meta["num_perm"], meta["bands"], meta["seed"],
+                    meta["scales"])
+        index.scale_sample = meta.get("scale_sample", meta["domains"])
+        index.segments = [Segment.load(os.path.join(path, name))
+                          for name in meta["segments"]]
+        index.path = path
+        return index
+
+    @staticmethod
+    def _features(domains: List[str]) -> np.ndarray:
+        frame = compute_features(domains, rich=True)[RICH_FEATURES]
+        return frame.to_numpy(dtype=np.float64)
+
+    def _update_scales(self, feats: np.ndarray) -> None:
+        """
+        Re-estimate the scales from every domain indexed so far plus
+        `feats` (unscaled), until SCALE_SAMPLE domains have been seen, and
+        rescale the existing segments so all of them share one metric.
+        """
+        if self.scale_sample >= SCALE_SAMPLE:
+            return
+        old = None if self.scales is None else np.asarray(self.scales)
+        sample = np.concatenate(
+            [s.tree.data * old for s in self.segments] + [feats])
+        self.scales = [float(s) if s > 0 else 1.0
+                       for s in sample.std(axis=0)]
+        self.scale_sample = len(sample)
+        if self.segments:
+            factor = old / np.asarray(self.scales)
+            self.segments = [s.rescaled(factor) for s in self.segments]
+
+    def add(self, domains: Iterable[str]) -> int:
+        """Index the domains not seen before; returns how many were new."""
+        with tracing.span("index_add") as sp:
+            cleaned = dict.fromkeys(_clean_domain(d) for d in domains)
+            new = [d for d in cleaned if d]
+            if new and self.segments:
+                hashes = _hashes(new)
+                seen = np.zeros(len(new), dtype=bool)
+                for segment in self.segments:
+                    seen |= segment.contains(hashes)
+                new = [d for d, s in zip(new, seen) if not s]
+            sp.set(new=len(new))
+            if not new:
+                return 0
+            with tracing.span("minhash", domains=len(new)):
+                sig = self.hasher.signatures([shingle_text(d) for d in new])
+            feats = self._features(new)
+            self._update_scales(feats)
+            vectors = feats / np.asarray(self.scales)
+            with tracing.span("build_segment", domains=len(new)):
+                segment = Segment.build(new, sig, vectors, self.bands)
+            self.segments.append(segment)
+            self._compact()
+        return len(new)
+
+    def _compact(self) -> None:
+        while (len(self.segments) >= 2 and
+               2 * len(self.segments[-1]) >= len(self.segments[-2])):
+            with tracing.span("merge_segments"):
+                merged = Segment.merge(self.segments[-2:], self.bands)
+            self.segments[-2:] = [merged]
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Write new segments, then meta.json; drop merged-away segments."""
+        path = path or self.path
+        if not path:
+            raise ValueError("No index path given")
+        path = os.path.abspath(path)
+        os.makedirs(path, exist_ok=True)
+        names = []
+        for segment in self.segments:
+            if segment.path is None or os.path.dirname(segment.path) != path:
+                name = "seg-" + os.urandom(6).hex()
+                segment.save(os.path.join(path, name))
+            names.append(os.path.basename(segment.path))
+        meta = {
+            "version": INDEX_VERSION,
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+            "seed": self.seed,
+            "scales": self.scales,
+            "scale_sample": self.scale_sample,
+            "segments": names,
+            "domains": len(self),
+        }
+        tmp = os.path.join(path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+        for entry in os.listdir(path):
+            if entry.startswith("seg-") and entry not in names:
+                shutil.rmtree(os.path.join(path, entry), ignore_errors=True)
+        self.path = path
+
+    def query(self, domain: str,
+              k: int = 10) -> Dict[str, List[Tuple[str, float]]]:
+        """
+        Top-k neighbours of `domain`, excluding itself:
+        - lexical: (domain, estimated 3-gram Jaccard similarity)
+        - features: (domain, scaled RICH_FEATURES distance)
+        - related: both lists merged by reciprocal rank
+        """
+        target = _clean_domain(domain)
+        with tracing.span("query_lexical"):
+            qsig = self.hasher.signatures([shingle_text(target)])
+            qkeys = band_keys(qsig, self.bands)[:, 0]
+            lexical = []
+            for segment in self.segments:
+                ids = segment.lexical_candidates(qkeys)
+                if not len(ids):
+                    continue
+                scores = (segment.sig[ids] == qsig[0]).mean(axis=1)
+                if len(ids) > k + 1:
+                    # Decode only the best k + 1 (one may be the query)
+                    best = np.argpartition(-scores, k)[:k + 1]
+                    ids, scores = ids[best], scores[best]
+                lexical.extend((segment.domain(i), float(s))
+                               for i, s in zip(ids.tolist(), scores))
+            lexical = [h for h in lexical if h[0] != target]
+            lexical = sorted(lexical, key=lambda h: (-h[1], h[0]))[:k]
+
+        with tracing.span("query_features"):
+            features = []
+            if self.segments:
+                qvec = self._features([target])[0] / np.asarray(self.scales)
+            for segment in self.segments:
+                n = min(k + 1, len(segment))
+                dist, ids = segment.tree.query(qvec, k=n)
+                features.extend(
+                    (segment.domain(i), float(d))
+                    for i, d in zip(np.atleast_1d(ids).tolist(),
+                                    np.atleast_1d(dist)))
+            features = [h for h in features if h[0] != target]
+            features = sorted(features, key=lambda h: (h[1], h[0]))[:k]
+
+        fused: Dict[str, float] = {}
+        for hits in (lexical, features):
+            for rank, (name, _) in enumerate(hits):
+                fused[name] = fused.get(name, 0.0) + 1.0 / (60 + rank)
+        related = sorted(fused.items(), key=lambda h: (-h[1], h[0]))[:k]
+        return {"lexical": lexical, "features": features, "related": related}
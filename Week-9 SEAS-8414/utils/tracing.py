@@ -0,0 +1,204 @@
+"""
+Stage-level tracing for the DGA pipeline.
+
+Tracing is off by default. While it is off, `span()` returns one shared
+no-op context manager and `wrap()` returns the function unchanged, so
+instrumented code costs a flag check per stage and nothing per domain.
+
+    from utils import tracing
+    tracing.enable()
+    with tracing.span("score", batch=len(domains)):
+        ...
+    tracing.write_chrome_trace("trace.json")   # chrome://tracing, Perfetto
+    tracing.print_summary()                    # count / p50 / p90 / p99
+
+Spans become events in the Chrome trace. Per-domain calls made through
+`wrap()` are only aggregated into the percentile summary, so profiling a
+large batch does not produce millions of trace events.
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, TextIO
+
+_enabled = False
+_origin = time.perf_counter_ns()
+_spans: List["Span"] = []
+_samples: Dict[str, List[int]] = {}
+
+
+class _NoopSpan:
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+    def set(self, **attrs) -> None:
+        return None
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    """One timed stage; durations are in nanoseconds."""
+
+    __slots__ = ("name", "attrs", "start", "end", "tid")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.start = self.end = 0
+        self.tid = threading.get_ident()
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        _spans.append(self)  # list.append is atomic, no lock needed
+
+    def set(self, **attrs) -> None:
+        """Attach attributes (batch size, model id, ...) to the span."""
+        self.attrs.update(attrs)
+
+    @property
+    def duration(self) -> int:
+        return self.end - self.start
+
+
+def enable() -> None:
+    """Start recording, discarding anything recorded before."""
+    global _enabled, _origin
+    reset()
+    _origin = time.perf_counter_ns()
+    _enabled = True
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    _spans.clear()
+    _samples.clear()
+
+
+def span(name: str, **attrs):
+    """Context manager timing one stage; a shared no-op while disabled."""
+    if not _enabled:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def wrap(fn: Callable, name: Optional[str] = None) -> Callable:
+    """
+    Return `fn` itself while disabled, else a wrapper that adds each call's
+    duration to the summary for `name`. Call once per batch, outside the
+    per-domain loop.
+    """
+    if not _enabled:
+        return fn
+    durations = _samples.setdefault(name or fn.__name__, [])
+    clock = time.perf_counter_ns
+
+    def timed(*args, **kwargs):
+        start = clock()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            durations.append(clock() - start)
+
+    return timed
+
+
+def _percentile(sorted_values: List[int], pct: float) -> int:
+    """Nearest-rank percentile of an already sorted list."""
+    # Smallest value with at least pct% of the data at or below it
+    rank = math.ceil(pct / 100 * len(sorted_values)) - 1
+    return sorted_values[max(0, min(len(sorted_values) - 1, rank))]
+
+
+def summary() -> Dict[str, dict]:
+    """Per stage: count, total and mean/p50/p90/p99/max latency in ms."""
+    durations: Dict[str, List[int]] = {}
+    for s in list(_spans):
+        durations.setdefault(s.name, []).append(s.duration)
+    for name, values in list(_samples.items()):
+        durations.setdefault(name, []).extend(values)
+
+    result = {}
+    for name, values in durations.items():
+        if not values:
+            continue
+        values.sort()
+        result[name] = {
+            "count": len(values),
+            "total_ms": round(sum(values) / 1e6, 3),
+            "mean_ms": round(sum(values) / len(values) / 1e6, 6),
+            "p50_ms": round(_percentile(values, 50) / 1e6, 6),
+            "p90_ms": round(_percentile(values, 90) / 1e6, 6),
+            "p99_ms": round(_percentile(values, 99) / 1e6, 6),
+            "max_ms": round(values[-1] / 1e6, 6),
+        }
+    return result
+
+
+def chrome_trace() -> dict:
+    """Recorded spans in the Chrome trace event format (complete events)."""
+    pid = os.getpid()
+    events = []
+    for s in sorted(_spans, key=lambda s: s.start):
+        events.append({
+            "name": s.name,
+            "cat": "stage",
+            "ph": "X",
+            "ts": (s.start - _origin) / 1e3,
+            "dur": s.duration / 1e3,
+            "pid": pid,
+            "tid": s.tid,
+            "args": s.attrs,
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_chrome_trace(path: str) -> None:
+    """Write the Chrome trace to `path`, with the summary in otherData."""
+    trace = chrome_trace()
+    trace["otherData"] = {"summary": summary()}
+    with open(path, "w") as f:
+        json.dump(trace, f, default=str)
+
+
+def print_summary(file: TextIO = sys.stderr) -> None:
+    rows = sorted(summary().items(), key=lambda kv: -kv[1]["total_ms"])
+    print(f"{'stage':<24}{'count':>9}{'total ms':>12}"
+          f"{'p50 ms':>11}{'p90 ms':>11}{'p99 ms':>11}", file=file)
+    for name, s in rows:
+        print(f"{name:<24}{s['count']:>9}{s['total_ms']:>12.1f}"
+              f"{s['p50_ms']:>11.4f}{s['p90_ms']:>11.4f}{s['p99_ms']:>11.4f}",
+              file=file)
+
+
+def finish(path: Optional[str]) -> None:
+    """--profile helper: write the trace and print the summary."""
+    if not path or not _enabled:
+        return
+    write_chrome_trace(path)
+    print_summary()
+    print(f"Trace written to {path} (open in chrome://tracing or Perfetto)",
+          file=sys.stderr)
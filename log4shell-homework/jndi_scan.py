@@ -0,0 +1,280 @@
+"""
+Scan application logs for Log4Shell (CVE-2021-44228) JNDI lookup payloads.
+
+Every `${` (also URL-encoded as `%24%7B`, `$%7B`, `%24{`) that could open a JNDI lookup is a
+candidate (see TRIGGER_RE). The candidate's balanced `${...}` is cut out, percent-decoded, and
+its nested lookups are resolved innermost first the way Log4j would (`${lower:J}`, `${upper:n}`,
+`${::-d}`, `${env:X:-i}`, `${date:'l'}`), so obfuscated payloads collapse to a plain
+`${jndi:proto://...}`. Plain files are read through mmap and split into line-aligned ranges;
+gzip files (rotated logs, detected by their magic bytes) are decompressed in chunks. Both fan
+out across worker processes.
+
+    python jndi_scan.py /var/log/app -o hits.jsonl
+    docker-compose logs app | python jndi_scan.py -
+
+Hits are written as JSON lines: file, offset (byte offset in the uncompressed file), length,
+payload (normalized), protocol, obfuscated, encoded and raw.
+"""
+import os
+import re
+import sys
+import gzip
+import json
+import mmap
+import time
+import heapq
+import argparse
+from urllib.parse import unquote
+from concurrent.futures import ProcessPoolExecutor
+
+# Candidate openers. A lookup can only resolve to `jndi` if its name starts with j, a nested
+# lookup or a %-escape, so benign placeholders like ${spring.profile} never leave the regex
+# engine. Each pattern starts with a literal, which re searches for at memchr-like speed;
+# URL-encoded openers ($%7B, %24{, %24%7B) get their own pass.
+TRIGGER_RE = re.compile(rb'\$\{[jJ$%]')
+ENCODED_RE = re.compile(rb'%(?:24(?:\{|%7[bB])|7[bB])[jJ$%]')
+BRACE_RE = re.compile(rb'\{|\}|%7[bBdD]')
+# A lookup with no lookup nested inside it
+LOOKUP_RE = re.compile(r'\$\{([^${}]*)\}')
+JNDI_RE = re.compile(r'\$\{jndi:([^}]*)\}', re.I)
+
+MAX_PAYLOAD = 4096  # bytes of a line examined per candidate
+MAX_DEPTH = 32  # rounds of lookup resolution
+RAW_PREVIEW = 512
+RANGE_SIZE = 64 << 20  # plain files are split into ranges of about this many bytes
+GZIP_CHUNK = 16 << 20
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def _resolve(match):
+    body = match.group(1)
+    name, sep, rest = body.partition(':')
+    key = name.lower()
+    if key == 'jndi':
+        # Canonical form, wrapped so outer lookups don't resolve it again
+        return '\x00' + 'jndi:' + rest + '\x01'
+    if sep and key in ('lower', 'upper'):
+        rest = rest.split(':-', 1)[0]
+        return rest.lower() if key == 'lower' else rest.upper()
+    if ':-' in body:
+        return body.split(':-', 1)[1]
+    if sep and key == 'date':
+        return rest.strip("'")
+    # Unknown lookups (env, sys, hostName, ...) keep their name, minus the ${ } syntax
+    return '<' + body + '>'
+
+
+def normalize(text):
+    """Resolve nested ${...} lookups innermost first; returns the text with `${jndi:...}` restored."""
+    for _ in range(MAX_DEPTH):
+        resolved = LOOKUP_RE.sub(_resolve, text)
+        if resolved == text:
+            break
+        text = resolved
+    return text.replace('\x00', '${').replace('\x01', '}')
+
+
+def _balanced_end(buf, start, stop):
+    """Index just past the `}` that closes the brace opened right after `start`, or None."""
+    depth = 0
+    for m in BRACE_RE.finditer(buf, start, stop):
+        token = m.group()
+        if token == b'{' or token[-1:] in b'bB':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return m.end()
+    return None
+
+
+def inspect(buf, pos, limit):
+    """Payload hits for the candidate at `pos`; returns (hits, length of the candidate)."""
+    stop = buf.find(b'\n', pos, min(limit, pos + MAX_PAYLOAD))
+    if stop == -1:
+        stop = min(limit, pos + MAX_PAYLOAD)
+    end = _balanced_end(buf, pos, stop) or stop
+    raw = buf[pos:end].decode('latin-1')
+    text = unquote(raw, encoding='latin-1') if '%' in raw else raw
+    hits = []
+    for m in JNDI_RE.finditer(normalize(text)):
+        payload = m.group(0)
+        scheme, sep, _ = m.group(1).partition(':')
+        hits.append({
+            'offset': pos,
+            'length': end - pos,
+            'payload': payload,
+            'protocol': scheme.lower() if sep else None,
+            'obfuscated': payload.lower() not in text.lower(),
+            'encoded': text != raw,
+            'raw': raw[:RAW_PREVIEW],
+        })
+    return hits, end - pos
+
+
+def _candidates(buf, lo, hi):
+    """Offsets of candidate openers in buf[lo:hi], in order."""
+    encoded = []
+    for m in ENCODED_RE.finditer(buf, lo, hi):
+        pos = m.start()
+        if buf[pos + 1:pos + 2] == b'7':
+            # %7B only opens a lookup right after a literal $
+            if buf[pos - 1:pos] != b'$':
+                continue
+            pos -= 1
+        encoded.append(pos)
+    plain = (m.start() for m in TRIGGER_RE.finditer(buf, lo, hi))
+    return heapq.merge(plain, encoded) if encoded else plain
+
+
+def scan_buffer(buf, lo, hi, base=0, skip_until=0, limit=None):
+    """
+    Hits for candidates starting in buf[lo:hi]; offsets are reported as base + index.
+
+    Candidates nested inside an earlier payload (up to absolute offset `skip_until`) are skipped.
+    Payloads may extend past `hi`, up to `limit`. Returns (hits, new skip_until).
+    """
+    limit = len(buf) if limit is None else limit
+    hits = []
+    for pos in _candidates(buf, lo, hi):
+        if base + pos < skip_until:
+            continue
+        found, length = inspect(buf, pos, limit)
+        if found:
+            for hit in found:
+                hit['offset'] += base
+            hits.extend(found)
+            skip_until = base + pos + length
+    return hits, skip_until
+
+
+def _align(buf, offset):
+    """Start of the first line at or after `offset`."""
+    if offset <= 0:
+        return 0
+    newline = buf.find(b'\n', offset - 1)
+    return len(buf) if newline == -1 else newline + 1
+
+
+def scan_range(path, start, stop):
+    """Scan the lines of a plain file that begin in [start, stop); returns (hits, bytes)."""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        lo, hi = _align(buf, start), _align(buf, stop)
+        hits, _ = scan_buffer(buf, lo, hi)
+    return hits, hi - lo
+
+
+def scan_stream(f, chunk=GZIP_CHUNK):
+    """Scan a file object chunk by chunk, cutting chunks at line ends; returns (hits, bytes)."""
+    hits, base, skip_until, carry = [], 0, 0, b''
+    while True:
+        data = f.read(chunk)
+        buf = carry + data
+        if not buf:
+            break
+        if data:
+            cut = buf.rfind(b'\n') + 1 or max(0, len(buf) - MAX_PAYLOAD)
+        else:
+            cut = len(buf)
+        found, skip_until = scan_buffer(buf, 0, cut, base, skip_until)
+        hits.extend(found)
+        base += cut
+        carry = buf[cut:]
+        if not data:
+            break
+    return hits, base
+
+
+def scan_gzip(path):
+    with gzip.open(path, 'rb') as f:
+        return scan_stream(f)
+
+
+def _run(unit):
+    kind, path, start, stop = unit
+    if kind == 'gzip':
+        hits, size = scan_gzip(path)
+    else:
+        hits, size = scan_range(path, start, stop)
+    for hit in hits:
+        hit['file'] = path
+    return hits, size
+
+
+def find_logs(paths):
+    """Files named on the command line, plus every regular file under named directories."""
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    yield os.path.join(dirpath, name)
+        else:
+            yield path
+
+
+def plan(paths, range_size=RANGE_SIZE):
+    """Work units: a gzip file is one unit, a plain file one per `range_size` bytes."""
+    units = []
+    for path in find_logs(paths):
+        with open(path, 'rb') as f:
+            magic = f.read(2)
+        size = os.path.getsize(path)
+        if magic == GZIP_MAGIC:
+            units.append(('gzip', path, 0, 0))
+        elif size:
+            units.extend(('plain', path, start, min(size, start + range_size))
+                         for start in range(0, size, range_size))
+    return units
+
+
+def scan_paths(paths, workers=None, range_size=RANGE_SIZE, out=None):
+    """Scan logs in a process pool, writing hits to `out` in file/offset order; returns stats."""
+    start = time.perf_counter()
+    units = plan(paths, range_size)
+    total_hits = total_bytes = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for hits, size in pool.map(_run, units):
+            total_bytes += size
+            total_hits += len(hits)
+            if out is not None:
+                for hit in hits:
+                    out.write(json.dumps(hit) + '\n')
+    seconds = time.perf_counter() - start
+    return {
+        'files': len({unit[1] for unit in units}),
+        'bytes': total_bytes,
+        'hits': total_hits,
+        'seconds': round(seconds, 4),
+        'gb_per_s': round(total_bytes / seconds / 1e9, 3) if seconds else 0.0,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Scan logs for Log4Shell JNDI payloads')
+    ap.add_argument('paths', nargs='+', help="Log files or directories ('-' reads stdin)")
+    ap.add_argument('-o', '--output', default=None, help='Write JSONL hits here instead of stdout')
+    ap.add_argument('--workers', type=int, default=None)
+    ap.add_argument('--range-mb', type=int, default=RANGE_SIZE >> 20, help='Split plain files into ranges of this size')
+    args = ap.parse_args()
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        if args.paths == ['-']:
+            t0 = time.perf_counter()
+            hits, size = scan_stream(sys.stdin.buffer)
+            for hit in hits:
+                out.write(json.dumps(dict(hit, file='-')) + '\n')
+            seconds = time.perf_counter() - t0
+            stats = {'files': 1, 'bytes': size, 'hits': len(hits), 'seconds': round(seconds, 4),
+                     'gb_per_s': round(size / seconds / 1e9, 3) if seconds else 0.0}
+        else:
+            stats = scan_paths(args.paths, args.workers, max(1, args.range_mb) << 20, out)
+    finally:
+        if args.output:
+            out.close()
+    print(json.dumps(stats), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,240 @@
-from ldap3 import Server, Connection, ALL
-from http.server import SimpleHTTPRequestHandler, HTTPServer
-import threading
-
-print("LDAP server placeholder — this won't serve a real exploit without extra code.")
-server = Server('ldap://0.0.0.0:389', get_info=ALL)
-connection = Connection(server, auto_bind=True)
-print("LDAP server started on port 389.")
-connection.bind()
+"""
+Canary listener for outbound JNDI lookups.
+
+Point scan payloads at this host, e.g. ${jndi:ldap://canary:1389/<token>} or
+${jndi:http://canary:8000/<token>}. Any service that still resolves JNDI lookups connects
+back, and the callback is written as one JSON line (time, protocol, source, token, DN or
+path) to the callback log. Every port speaks both protocols, sniffed from the first byte, so
+a payload aimed at the wrong port is still recorded.
+
+Responses are benign only: LDAP binds succeed and searches return no entries (so there is
+never a javaCodeBase or reference to follow), and HTTP requests get an empty 404.
+
+    python ldap_server.py --ports 1389 8000 --log callbacks.jsonl
+"""
+import sys
+import json
+import asyncio
+import argparse
+from datetime import datetime, timezone
+from urllib.parse import unquote
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+MAX_MESSAGE = 64 * 1024  # largest LDAP message or HTTP header block accepted
+IDLE_TIMEOUT = 10.0  # seconds a connection may sit without sending a full request
+
+LDAP_SEQUENCE = 0x30
+BIND_REQUEST, SEARCH_REQUEST = 0x60, 0x63
+BIND_RESPONSE, SEARCH_DONE = 0x61, 0x65
+HTTP_RESPONSE = b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n'
+
+
+def _tlv(tag, value):
+    """BER-encode one element."""
+    n = len(value)
+    if n < 0x80:
+        length = bytes([n])
+    else:
+        raw = n.to_bytes((n.bit_length() + 7) // 8, 'big')
+        length = bytes([0x80 | len(raw)]) + raw
+    return bytes([tag]) + length + value
+
+
+def _read_tlv(data, pos):
+    """Decode the element at data[pos]; returns (tag, value, next position)."""
+    tag, first = data[pos], data[pos + 1]
+    pos += 2
+    if first & 0x80:
+        size = first & 0x7f
+        length = int.from_bytes(data[pos:pos + size], 'big')
+        pos += size
+    else:
+        length = first
+    if pos + length > len(data):
+        raise ValueError('truncated BER element')
+    return tag, data[pos:pos + length], pos + length
+
+
+def _ldap_result(message_id, op):
+    # resultCode success, empty matchedDN and diagnosticMessage
+    return _tlv(LDAP_SEQUENCE, message_id + _tlv(op, b'\x0a\x01\x00\x04\x00\x04\x00'))
+
+
+def token_of(name):
+    """Canary token from a DN or URL path: its first segment, without an `attr=` prefix."""
+    first = name.strip('/').split('/', 1)[0].split(',', 1)[0].strip()
+    return first.split('=', 1)[1] if '=' in first else first
+
+
+class CallbackLog:
+    """Append-only JSONL record of callbacks, with running counts."""
+
+    def __init__(self, path, echo=True):
+        self.file = open(path, 'a', buffering=1) if path != '-' else sys.stdout
+        self.echo = echo and path != '-'
+        self.counts = {}
+
+    def record(self, proto, peer, port, **fields):
+        entry = {
+            'time': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'proto': proto,
+            'src': peer[0] if peer else None,
+            'src_port': peer[1] if peer else None,
+            'port': port,
+            **fields,
+        }
+        self.counts[proto] = self.counts.get(proto, 0) + 1
+        self.file.write(json.dumps(entry) + '\n')
+        if self.echo:
+            print(f"{entry['time']} {proto} {entry['src']} token={fields.get('token')!r}", file=sys.stderr)
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class CanaryServer:
+    def __init__(self, log, idle_timeout=IDLE_TIMEOUT):
+        self.log = log
+        self.idle_timeout = idle_timeout
+        self.active = 0
+        self.peak = 0
+
+    async def start(self, host, ports, backlog=4096):
+        """Listen on every port; returns the asyncio servers."""
+        servers = []
+        for port in ports:
+            servers.append(await asyncio.start_server(self.handle, host, port, backlog=backlog, limit=MAX_MESSAGE))
+        return servers
+
+    async def handle(self, reader, writer):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        peer = writer.get_extra_info('peername')
+        port = writer.get_extra_info('sockname')[1]
+        try:
+            first = await asyncio.wait_for(reader.readexactly(1), self.idle_timeout)
+            if first[0] == LDAP_SEQUENCE:
+                await self._ldap(first, reader, writer, peer, port)
+            else:
+                await self._http(first, reader, writer, peer, port)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError, ValueError, IndexError):
+            pass
+        finally:
+            self.active -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_ldap_message(self, first, reader):
+        head = first + await asyncio.wait_for(reader.readexactly(1), self.idle_timeout)
+        if head[1] & 0x80:
+            size = head[1] & 0x7f
+            if not 0 < size <= 4:
+                raise ValueError('bad BER length')
+            extra = await asyncio.wait_for(reader.readexactly(size), self.idle_timeout)
+            length = int.from_bytes(extra, 'big')
+        else:
+            length = head[1]
+        if length > MAX_MESSAGE:
+            raise ValueError('LDAP message too large')
+        return await asyncio.wait_for(reader.readexactly(length), self.idle_timeout)
+
+    async def _ldap(self, first, reader, writer, peer, port):
+        bind_dn = None
+        recorded = False
+        try:
+            while True:
+                body = await self._read_ldap_message(first, reader)
+                _, _, pos = _read_tlv(body, 0)
+                message_id = body[:pos]  # echoed back as-is
+                op, value, _ = _read_tlv(body, pos)
+                if op == BIND_REQUEST:
+                    _, _, p = _read_tlv(value, 0)  # version
+                    _, name, _ = _read_tlv(value, p)
+                    bind_dn = name.decode('utf-8', 'replace')
+                    writer.write(_ldap_result(message_id, BIND_RESPONSE))
+                elif op == SEARCH_REQUEST:
+                    _, base, _ = _read_tlv(value, 0)
+                    dn = base.decode('utf-8', 'replace')
+                    self.log.record('ldap', peer, port, op='search', token=token_of(dn) or None, dn=dn, bind_dn=bind_dn)
+                    recorded = True
+                    writer.write(_ldap_result(message_id, SEARCH_DONE))
+                else:
+                    # Unbind, or an operation a JNDI lookup never needs: hang up
+                    break
+                await writer.drain()
+                first = await asyncio.wait_for(reader.readexactly(1), self.idle_timeout)
+                if first[0] != LDAP_SEQUENCE:
+                    break
+        finally:
+            # Connections that never searched are still callbacks worth knowing about
+            if not recorded:
+                self.log.record('ldap', peer, port, op='bind' if bind_dn is not None else 'connect', token=None,
+                                bind_dn=bind_dn)
+
+    async def _http(self, first, reader, writer, peer, port):
+        head = first + await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.idle_timeout)
+        lines = head.decode('latin-1').split('\r\n')
+        method, _, rest = lines[0].partition(' ')
+        target = rest.rsplit(' ', 1)[0] if ' ' in rest else rest
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(':')
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        path = unquote(target.split('?', 1)[0])
+        self.log.record('http', peer, port, op=method, token=token_of(path) or None, path=path,
+                        host=headers.get('host'), user_agent=headers.get('user-agent'))
+        writer.write(HTTP_RESPONSE)
+        await writer.drain()
+
+
+def raise_fd_limit():
+    """Raise the open-file soft limit to the hard limit so thousands of sockets can stay open."""
+    if resource is None:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+async def serve(args):
+    limit = raise_fd_limit()
+    log = CallbackLog(args.log, echo=not args.quiet)
+    server = CanaryServer(log, args.idle_timeout)
+    servers = await server.start(args.host, args.ports, args.backlog)
+    print(f"Canary listening on {args.host} ports {', '.join(map(str, args.ports))} "
+          f"(fd limit {limit}), logging to {args.log}", file=sys.stderr)
+    try:
+        await asyncio.gather(*(s.serve_forever() for s in servers))
+    finally:
+        print(f"callbacks: {log.counts}, peak connections: {server.peak}", file=sys.stderr)
+        log.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Canary LDAP/HTTP callback listener for JNDI lookups')
+    ap.add_argument('--host', default='0.0.0.0')
+    ap.add_argument('--ports', type=int, nargs='+', default=[1389, 8000], help='Each port accepts LDAP and HTTP')
+    ap.add_argument('--log', default='callbacks.jsonl', help="Callback log (JSONL); '-' for stdout")
+    ap.add_argument('--backlog', type=int, default=4096)
+    ap.add_argument('--idle-timeout', type=float, default=IDLE_TIMEOUT)
+    ap.add_argument('--quiet', action='store_true', help='Do not echo callbacks to stderr')
+    args = ap.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,41 +1,177 @@
+import os
+import re
+import csv
 import sys
-from bs4 import BeautifulSoup
+import glob
+import json
+import hashlib
+import argparse
+import xml.etree.ElementTree as ET
+from operator import attrgetter
+from collections import namedtuple
+from urllib.parse import urlsplit
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
 
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
 
-def parse_report(file_path):
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+REPORT_FORMATS = {'.html': 'html', '.htm': 'html', '.json': 'json', '.xml': 'xml'}
+# Bump when parse_report's output changes, so cached results are re-parsed
+CACHE_VERSION = 1
+# One finding: an alert at a URL/method/parameter, as listed in the report's detail sections
+Instance = namedtuple('Instance', ['alert_id', 'alert', 'severity', 'url', 'method', 'param', 'attack', 'evidence'])
+# Fields identifying "the same finding" across two scans; 'path' is the URL without scheme and host
+INSTANCE_KEY_FIELDS = ('alert_id', 'alert', 'url', 'method', 'param', 'evidence')
+_DETAIL_FIELDS = {'URL': 'url', 'Method': 'method', 'Parameter': 'param', 'Attack': 'attack', 'Evidence': 'evidence'}
+# "Generated on Tue, 27 May 2025 02:14:36" (HTML), "@generated" (JSON) or generated="..." (XML)
+GENERATED_RE = re.compile(rb'(?:Generated on\s+|"@generated"\s*:\s*"|generated=")'
+                          rb'([A-Z][a-z]{2}, \d{1,2} [A-Z][a-z]{2} \d{4} \d{2}:\d{2}:\d{2})')
+
+
+def detect_format(file_path):
+    """Guess a ZAP report's format ('html', 'json' or 'xml') from its extension or first bytes."""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in REPORT_FORMATS:
+        return REPORT_FORMATS[ext]
+    with open(file_path, 'rb') as file:
+        head = file.read(512).lstrip()
+    if head.startswith(b'{'):
+        return 'json'
+    if head.startswith(b'<?xml') or head.startswith(b'<OWASPZAPReport'):
+        return 'xml'
+    return 'html'
+
+
+def parse_report(file_path, backend='auto'):
     """
-    Parse a ZAP HTML report and extract detailed alert information from the 'alerts' table.
+    Parse a ZAP report (HTML, JSON or XML) into per-severity alert counts.
+
+    HTML reports are read with a streaming lxml pass that stops at the end of the 'alerts'
+    table; backend='bs4' (or a missing lxml) falls back to BeautifulSoup's html.parser.
 
     Args:
-        file_path (str): Path to the ZAP HTML report file.
+        file_path (str): Path to the ZAP report file.
+        backend (str): 'auto', 'lxml' or 'bs4' (HTML reports only).
 
     Returns:
         dict: A dictionary with risk levels as keys and lists of (alert_name, instance_count) tuples as values.
     """
-    alert_summary = {}
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            soup = BeautifulSoup(file, 'html.parser')
-            # Find the 'alerts' table, which contains detailed alert information
-            alert_table = soup.find('table', class_='alerts')
-            if not alert_table:
-                print(f"Warning: No 'alerts' table found in {file_path}")
-                return {}
-
-            # Skip the header row and iterate through the data rows
-            rows = alert_table.find_all('tr')[1:]
-            for row in rows:
-                cols = row.find_all('td')
-                if len(cols) >= 3:
-                    # Extract alert name, risk level, and instance count
-                    description = cols[0].text.strip()  # Alert name
-                    severity = cols[1].text.strip()  # Risk level (e.g., Medium, Low)
-                    count = int(cols[2].text.strip())  # Number of instances
-                    if severity not in alert_summary:
-                        alert_summary[severity] = []
-                    alert_summary[severity].append((description, count))
+        return _parse_report_strict(file_path, backend)
     except Exception as e:
         print(f"Error parsing {file_path}: {e}")
+        return {}
+
+
+def _parse_report_strict(file_path, backend='auto'):
+    """parse_report, but raising on unreadable or malformed reports instead of returning {}."""
+    report_format = detect_format(file_path)
+    if report_format == 'json':
+        return _parse_json(file_path)
+    if report_format == 'xml':
+        return _parse_xml(file_path)
+    if backend == 'bs4' or (backend == 'auto' and lxml_etree is None):
+        return _parse_html_bs4(file_path)
+    return _parse_html_stream(file_path)
+
+
+def _parse_html_stream(file_path):
+    """Read the 'alerts' table with lxml's incremental HTML parser, stopping right after it."""
+    alert_summary = {}
+    found = False
+    with open(file_path, 'rb') as file:
+        for event, element in lxml_etree.iterparse(file, events=('start', 'end'), html=True):
+            if element.tag != 'table' and not found:
+                continue
+            if element.tag == 'table':
+                if event == 'start' and 'alerts' in (element.get('class') or '').split():
+                    found = True
+                elif event == 'end' and found:
+                    break
+            elif event == 'end' and element.tag == 'tr':
+                cols = [''.join(td.itertext()).strip() for td in element if td.tag == 'td']
+                if len(cols) >= 3:
+                    alert_summary.setdefault(cols[1], []).append((cols[0], int(cols[2])))
+                element.clear()
+    if not found:
+        print(f"Warning: No 'alerts' table found in {file_path}")
+    return alert_summary
+
+
+def _severity(riskdesc):
+    # "Medium (High)" -> "Medium"; the part in brackets is ZAP's confidence
+    return riskdesc.split(' (')[0].strip()
+
+
+def _summarize(alerts):
+    """Aggregate (severity, name, count) triples across sites, keeping first-seen order."""
+    counts = {}
+    for severity, name, count in alerts:
+        by_name = counts.setdefault(severity, {})
+        by_name[name] = by_name.get(name, 0) + count
+    return {severity: list(by_name.items()) for severity, by_name in counts.items()}
+
+
+def _parse_json(file_path):
+    """ZAP's traditional JSON report: site[].alerts[] with riskdesc, count and instances."""
+    with open(file_path, 'rb') as file:
+        report = json.load(file)
+    sites = report.get('site', [])
+    if isinstance(sites, dict):
+        sites = [sites]
+    return _summarize(
+        (_severity(alert['riskdesc']), alert.get('name') or alert.get('alert'),
+         int(alert.get('count') or len(alert.get('instances', []))))
+        for site in sites for alert in site.get('alerts', [])
+    )
+
+
+def _parse_xml(file_path):
+    """ZAP's traditional XML report, streamed one <alertitem> at a time."""
+    def alerts():
+        for _, element in ET.iterparse(file_path):
+            if element.tag != 'alertitem':
+                continue
+            count = element.findtext('count')
+            if count is None:
+                count = len(element.findall('instances/instance'))
+            yield (_severity(element.findtext('riskdesc', '')),
+                   element.findtext('name') or element.findtext('alert'), int(count))
+            element.clear()
+    return _summarize(alerts())
+
+
+def _parse_html_bs4(file_path):
+    """The original BeautifulSoup pass over the whole HTML report."""
+    alert_summary = {}
+    with open(file_path, 'r', encoding='utf-8') as file:
+        soup = BeautifulSoup(file, 'html.parser')
+        # Find the 'alerts' table, which contains detailed alert information
+        alert_table = soup.find('table', class_='alerts')
+        if not alert_table:
+            print(f"Warning: No 'alerts' table found in {file_path}")
+            return {}
+
+        # Skip the header row and iterate through the data rows
+        rows = alert_table.find_all('tr')[1:]
+        for row in rows:
+            cols = row.find_all('td')
+            if len(cols) >= 3:
+                # Extract alert name, risk level, and instance count
+                description = cols[0].text.strip()  # Alert name
+                severity = cols[1].text.strip()  # Risk level (e.g., Medium, Low)
+                count = int(cols[2].text.strip())  # Number of instances
+                if severity not in alert_summary:
+                    alert_summary[severity] = []
+                alert_summary[severity].append((description, count))
     return alert_summary
 
 
@@ -77,11 +213,378 @@ def compare_reports(before, after):
                 print(f"  {severity} - {desc}: {change}")
 
 
-if __name__ == "__main__":
-    if len(sys.argv) != 3:
+def parse_instances(file_path):
+    """
+    Extract every alert instance from a ZAP report's detail sections (HTML) or instance lists (JSON/XML).
+
+    Args:
+        file_path (str): Path to the ZAP report file.
+
+    Returns:
+        iterator: Instance tuples, streamed so large reports are never held in memory as a tree.
+    """
+    report_format = detect_format(file_path)
+    if report_format == 'json':
+        return _json_instances(file_path)
+    if report_format == 'xml':
+        return _xml_instances(file_path)
+    if lxml_etree is None:
+        raise RuntimeError("Instance-level analysis of HTML reports needs lxml (pip install lxml)")
+    return _html_instances(file_path)
+
+
+def _html_instances(file_path):
+    alert = None
+    fields = None
+    with open(file_path, 'rb') as file:
+        for event, element in lxml_etree.iterparse(file, events=('start', 'end'), html=True):
+            if element.tag == 'table':
+                in_results = event == 'start' and 'results' in (element.get('class') or '').split()
+                if event == 'end' and fields:
+                    yield Instance(*alert, **fields)
+                    fields = None
+                if event == 'start':
+                    alert = None
+                continue
+            if event != 'end' or element.tag != 'tr' or not in_results:
+                continue
+            cells = [c for c in element if c.tag in ('th', 'td')]
+            if cells and cells[0].tag == 'th' and len(cells) >= 2:
+                anchor = cells[0].find('.//a[@id]')
+                risk = cells[0].find('.//div')
+                alert = (anchor.get('id') if anchor is not None else '',
+                         ''.join(cells[1].itertext()).strip(),
+                         ''.join(risk.itertext()).strip() if risk is not None else '')
+            elif alert and len(cells) == 2:
+                label = ''.join(cells[0].itertext()).strip()
+                value = ''.join(cells[1].itertext()).strip()
+                css = cells[0].get('class')
+                if css == 'indent1' and label == 'URL':
+                    if fields:
+                        yield Instance(*alert, **fields)
+                    fields = dict.fromkeys(_DETAIL_FIELDS.values(), '')
+                    fields['url'] = value
+                elif css == 'indent2' and fields is not None and label in _DETAIL_FIELDS:
+                    fields[_DETAIL_FIELDS[label]] = value
+                elif css is None and fields:
+                    yield Instance(*alert, **fields)
+                    fields = None
+            # Drop processed rows so memory stays flat on huge reports
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+
+def _alert_instances(alert_id, name, severity, instances):
+    for inst in instances:
+        yield Instance(alert_id, name, severity, inst.get('uri') or '', inst.get('method') or '',
+                       inst.get('param') or '', inst.get('attack') or '', inst.get('evidence') or '')
+
+
+def _json_instances(file_path):
+    with open(file_path, 'rb') as file:
+        report = json.load(file)
+    sites = report.get('site', [])
+    if isinstance(sites, dict):
+        sites = [sites]
+    for site in sites:
+        for alert in site.get('alerts', []):
+            yield from _alert_instances(alert.get('pluginid', ''), alert.get('name') or alert.get('alert'),
+                                        _severity(alert['riskdesc']), alert.get('instances', []))
+
+
+def _xml_instances(file_path):
+    for _, element in ET.iterparse(file_path):
+        if element.tag != 'alertitem':
+            continue
+        instances = [{child.tag: child.text for child in inst} for inst in element.findall('instances/instance')]
+        yield from _alert_instances(element.findtext('pluginid', ''),
+                                    element.findtext('name') or element.findtext('alert'),
+                                    _severity(element.findtext('riskdesc', '')), instances)
+        element.clear()
+
+
+def _url_path(url):
+    parts = urlsplit(url)
+    return (parts.path or '/') + ('?' + parts.query if parts.query else '')
+
+
+def key_function(fields=INSTANCE_KEY_FIELDS):
+    """Build instance -> 16-byte BLAKE2b digest of the fields that identify a finding."""
+    blake2b = hashlib.blake2b
+    if 'path' in fields:
+        def values(inst):
+            return [_url_path(inst.url) if f == 'path' else getattr(inst, f) for f in fields]
+    else:
+        values = attrgetter(*fields) if len(fields) > 1 else (lambda inst: [getattr(inst, fields[0])])
+
+    def key(inst):
+        return blake2b('\x1f'.join(values(inst)).encode(), digest_size=16).digest()
+    return key
+
+
+def diff_instances(before, after, fields=INSTANCE_KEY_FIELDS):
+    """
+    Split findings into added, resolved and persisting by hashed instance key, in linear time.
+
+    Args:
+        before (iterable): Instances from the 'before' report.
+        after (iterable): Instances from the 'after' report.
+        fields (tuple): Instance fields that make up the key.
+
+    Returns:
+        dict: 'summary' (totals and per-alert counts) plus 'added', 'resolved' and 'persisting' instance lists.
+    """
+    key_of = key_function(fields)
+    before_index = {}
+    for inst in before:
+        before_index.setdefault(key_of(inst), inst)
+    added, persisting = [], []
+    seen = set()
+    for inst in after:
+        key = key_of(inst)
+        if key in seen:
+            continue
+        seen.add(key)
+        (persisting if key in before_index else added).append(inst)
+    resolved = [inst for key, inst in before_index.items() if key not in seen]
+
+    by_alert = {}
+    for status, instances in (('added', added), ('resolved', resolved), ('persisting', persisting)):
+        for inst in instances:
+            counts = by_alert.setdefault(f"{inst.severity} - {inst.alert}",
+                                         {'added': 0, 'resolved': 0, 'persisting': 0})
+            counts[status] += 1
+    return {
+        'summary': {
+            'key_fields': list(fields),
+            'before': len(before_index),
+            'after': len(seen),
+            'added': len(added),
+            'resolved': len(resolved),
+            'persisting': len(persisting),
+            'by_alert': dict(sorted(by_alert.items())),
+        },
+        'added': [dict(zip(Instance._fields, inst)) for inst in added],
+        'resolved': [dict(zip(Instance._fields, inst)) for inst in resolved],
+        'persisting': [dict(zip(Instance._fields, inst)) for inst in persisting],
+    }
+
+
+def run_instance_diff(before_path, after_path, output=None, fields=INSTANCE_KEY_FIELDS):
+    """Write the instance-level diff of two reports as JSON (stdout or `output`)."""
+    diff = diff_instances(parse_instances(before_path), parse_instances(after_path), fields)
+    if output:
+        with open(output, 'w') as out:
+            json.dump(diff, out, indent=2)
+        s = diff['summary']
+        print(f"{s['added']} added, {s['resolved']} resolved, {s['persisting']} persisting -> {output}")
+    else:
+        json.dump(diff, sys.stdout, indent=2)
+        print()
+
+
+def find_reports(pattern):
+    """Report files under a directory (recursively) or matching a glob pattern."""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, '**', '*')
+    return sorted(path for path in glob.glob(pattern, recursive=True)
+                  if os.path.isfile(path) and os.path.splitext(path)[1].lower() in REPORT_FORMATS)
+
+
+def file_digest(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def report_time(file_path):
+    """When the scan ran: the report's own generation timestamp, or the file's mtime."""
+    with open(file_path, 'rb') as file:
+        match = GENERATED_RE.search(file.read(1 << 16))
+    if match:
+        try:
+            return datetime.strptime(match.group(1).decode(), '%a, %d %b %Y %H:%M:%S').isoformat()
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(os.path.getmtime(file_path), timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def _parse_for_cache(file_path):
+    # A failed parse is returned as an error, never as an empty summary: an empty summary
+    # would mark every alert as resolved in the trend, and would be cached for good
+    try:
+        return {'generated': report_time(file_path), 'summary': _parse_report_strict(file_path)}
+    except Exception as e:
+        return {'error': f'{type(e).__name__}: {e}'}
+
+
+def load_reports(paths, cache_path=None, workers=None):
+    """
+    Parse many reports, reusing cached results for files whose content hash is unchanged.
+
+    New or changed files are parsed in a process pool; the cache (a JSON file keyed by SHA-256)
+    is rewritten afterwards. Reports that fail to parse are left out of the result and the cache.
+    Returns (reports, errors): dicts with path, app, generated and summary, oldest first, and
+    (path, message) pairs for the failures.
+    """
+    cache = {}
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path) as file:
+            cache = json.load(file)
+        if cache.get('version') != CACHE_VERSION:
+            cache = {}
+    entries = cache.setdefault('reports', {})
+    cache['version'] = CACHE_VERSION
+
+    digests = {path: file_digest(path) for path in paths}
+    missing = sorted({digest: path for path, digest in digests.items() if digest not in entries}.items())
+    failed = {}
+    if missing:
+        if workers == 1 or len(missing) == 1:
+            parsed = list(map(_parse_for_cache, [path for _, path in missing]))
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                parsed = list(pool.map(_parse_for_cache, [path for _, path in missing], chunksize=4))
+        for (digest, _), entry in zip(missing, parsed):
+            if 'error' in entry:
+                failed[digest] = entry['error']
+            else:
+                entries[digest] = entry
+        if cache_path:
+            with open(cache_path, 'w') as file:
+                json.dump(cache, file)
+    print(f"{len(paths)} reports: {len(paths) - len(missing)} cached, {len(missing) - len(failed)} parsed, "
+          f"{len(failed)} failed", file=sys.stderr)
+
+    reports = []
+    errors = []
+    for path in paths:
+        if digests[path] in failed:
+            errors.append((path, failed[digests[path]]))
+            continue
+        entry = entries[digests[path]]
+        reports.append({
+            'path': path,
+            'app': os.path.basename(os.path.dirname(os.path.abspath(path))),
+            'generated': entry['generated'],
+            'summary': {severity: [tuple(alert) for alert in alerts]
+                        for severity, alerts in entry['summary'].items()},
+        })
+    reports.sort(key=lambda r: (r['app'], r['generated'], r['path']))
+    return reports, errors
+
+
+def trend_series(reports):
+    """One row per report and alert seen in that app, with a count of 0 when the alert is absent."""
+    seen = {}
+    for report in reports:
+        for severity, alerts in report['summary'].items():
+            for alert, _ in alerts:
+                seen.setdefault(report['app'], {})[(severity, alert)] = None
+    rows = []
+    for report in reports:
+        counts = {}
+        for severity, alerts in report['summary'].items():
+            for alert, count in alerts:
+                counts[(severity, alert)] = counts.get((severity, alert), 0) + count
+        for severity, alert in seen.get(report['app'], {}):
+            rows.append({'app': report['app'], 'generated': report['generated'], 'report': report['path'],
+                         'severity': severity, 'alert': alert, 'count': counts.get((severity, alert), 0)})
+    return rows
+
+
+def write_trend(rows, output_format, out):
+    if output_format == 'csv':
+        writer = csv.DictWriter(out, fieldnames=['app', 'generated', 'report', 'severity', 'alert', 'count'])
+        writer.writeheader()
+        writer.writerows(rows)
+        return
+    series = {}
+    for row in rows:
+        key = f"{row['app']}|{row['severity']}|{row['alert']}"
+        entry = series.setdefault(key, {'app': row['app'], 'severity': row['severity'],
+                                        'alert': row['alert'], 'points': []})
+        entry['points'].append({'generated': row['generated'], 'report': row['report'], 'count': row['count']})
+    json.dump(list(series.values()), out, indent=2)
+    out.write('\n')
+
+
+def run_trend(pattern, output_format='csv', output=None, cache_path=None, workers=None):
+    """
+    Trend mode: time series over every report matching `pattern`, plus a before/after diff of
+    the oldest and newest report of each app.
+    """
+    paths = find_reports(pattern)
+    if not paths:
+        print(f"No reports found for {pattern}")
+        sys.exit(1)
+    reports, errors = load_reports(paths, cache_path, workers)
+    for path, error in errors:
+        print(f"Error parsing {path}: {error} (left out of the trend)", file=sys.stderr)
+    rows = trend_series(reports)
+    if output:
+        with open(output, 'w', newline='') as out:
+            write_trend(rows, output_format, out)
+        print(f"Wrote {len(rows)} data points to {output}")
+    else:
+        write_trend(rows, output_format, sys.stdout)
+
+    # The existing before/after comparison, per app; goes to stderr when the series is on stdout
+    apps = {}
+    for report in reports:
+        apps.setdefault(report['app'], []).append(report)
+    stdout = sys.stdout
+    sys.stdout = sys.stdout if output else sys.stderr
+    try:
+        for app, history in apps.items():
+            if len(history) > 1:
+                print(f"\n=== {app}: {history[0]['path']} -> {history[-1]['path']} ===")
+                compare_reports(history[0]['summary'], history[-1]['summary'])
+    finally:
+        sys.stdout = stdout
+    if errors:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ZAP scan reports")
+    parser.add_argument('reports', nargs='*', metavar='report', help="<before_report> <after_report>")
+    parser.add_argument('--trend', metavar='DIR_OR_GLOB', help="Time series over many reports")
+    parser.add_argument('--format', choices=['csv', 'json'], default='csv', help="Trend output format")
+    parser.add_argument('--output', help="Trend or instance diff output file (default: stdout)")
+    parser.add_argument('--cache', default='.zap-report-cache.json',
+                        help="Parsed-report cache keyed by file hash ('' to disable)")
+    parser.add_argument('--workers', type=int, default=None, help="Parser processes (default: CPU count)")
+    parser.add_argument('--instances', action='store_true',
+                        help="Diff individual findings (alert, URL, method, parameter, evidence) as JSON")
+    parser.add_argument('--ignore-evidence', action='store_true',
+                        help="With --instances, match findings without comparing evidence")
+    parser.add_argument('--ignore-host', action='store_true',
+                        help="With --instances, match URLs by path and query only (e.g. app vs. WAF host)")
+    args = parser.parse_args()
+
+    if args.trend:
+        run_trend(args.trend, args.format, args.output, args.cache or None, args.workers)
+        return
+    if len(args.reports) != 2:
         print("Usage: python analyze_reports.py <before_report> <after_report>")
+        print("       python analyze_reports.py --instances <before_report> <after_report> [--output FILE]")
+        print("       python analyze_reports.py --trend <dir or glob> [--format csv|json] [--output FILE]")
         sys.exit(1)
 
-    before_report = parse_report(sys.argv[1])
-    after_report = parse_report(sys.argv[2])
+    if args.instances:
+        fields = tuple('path' if f == 'url' and args.ignore_host else f for f in INSTANCE_KEY_FIELDS
+                       if not (args.ignore_evidence and f == 'evidence'))
+        run_instance_diff(args.reports[0], args.reports[1], args.output, fields)
+        return
+
+    before_report = parse_report(args.reports[0])
+    after_report = parse_report(args.reports[1])
     compare_reports(before_report, after_report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark analyze_reports.parse_report backends on the bundled ZAP reports scaled up.
+
+The HTML report's alert rows and Alert Detail section are repeated --scale times (copies get a
+" #k" suffix so every alert stays unique), and equivalent ZAP JSON and XML reports are generated
+from it. Every backend must return the same summary.
+
+    python bench_reports.py --scale 100
+"""
+import os
+import re
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import xml.etree.ElementTree as ET
+
+from analyze_reports import parse_report
+
+RISK_CODES = {'Informational': '0', 'Low': '1', 'Medium': '2', 'High': '3'}
+ROW_RE = re.compile(r'<tr>\s*<td><a href="#(\d+)">(.*?)</a></td>.*?</tr>', re.S)
+
+
+def scale_html(source, dest, scale):
+    """Write `source` with its alert rows and detail section repeated `scale` times."""
+    with open(source, encoding='utf-8') as f:
+        html = f.read()
+    table_start = html.index('<table class="alerts">')
+    table_end = html.index('</table>', table_start)
+    rows = list(ROW_RE.finditer(html, table_start, table_end))
+    first_row = rows[0].start()
+
+    copies = []
+    for k in range(scale):
+        suffix = f' #{k}' if k else ''
+        for row in rows:
+            name = row.group(2)
+            copies.append(row.group(0).replace(f'>{name}</a>', f'>{name}{suffix}</a>', 1))
+
+    detail_start = html.index('<h3>Alert Detail</h3>')
+    detail_end = html.rindex('</body>')
+    details = html[detail_start:detail_end] * scale
+    with open(dest, 'w', encoding='utf-8') as f:
+        f.write(html[:first_row] + '\n'.join(copies) + html[table_end:detail_start] + details + html[detail_end:])
+
+
+def _alerts(summary):
+    for severity, alerts in summary.items():
+        for i, (name, count) in enumerate(alerts):
+            yield {
+                'pluginid': str(10000 + i), 'alertRef': str(10000 + i), 'alert': name, 'name': name,
+                'riskcode': RISK_CODES.get(severity, '0'), 'confidence': '2', 'riskdesc': f'{severity} (Medium)',
+                'count': str(count),
+                'instances': [{'uri': f'http://juice:3000/path/{n}', 'method': 'GET', 'param': '',
+                               'attack': '', 'evidence': '', 'otherinfo': ''} for n in range(count)],
+            }
+
+
+def write_json(summary, dest):
+    report = {'@programName': 'ZAP', 'site': [{'@name': 'http://juice:3000', 'alerts': list(_alerts(summary))}]}
+    with open(dest, 'w') as f:
+        json.dump(report, f)
+
+
+def write_xml(summary, dest):
+    root = ET.Element('OWASPZAPReport', programName='ZAP')
+    site = ET.SubElement(root, 'site', name='http://juice:3000')
+    alerts = ET.SubElement(site, 'alerts')
+    for alert in _alerts(summary):
+        item = ET.SubElement(alerts, 'alertitem')
+        for key in ('pluginid', 'alertRef', 'alert', 'name', 'riskcode', 'confidence', 'riskdesc', 'count'):
+            ET.SubElement(item, key).text = alert[key]
+        instances = ET.SubElement(item, 'instances')
+        for inst in alert['instances']:
+            node = ET.SubElement(instances, 'instance')
+            for key, value in inst.items():
+                ET.SubElement(node, key).text = value
+    ET.ElementTree(root).write(dest, encoding='utf-8', xml_declaration=True)
+
+
+def _time(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark ZAP report parsers')
+    ap.add_argument('--scale', type=int, default=100)
+    ap.add_argument('--repeat', type=int, default=3, help='Runs per backend (best time is reported)')
+    ap.add_argument('--reports', nargs='+', default=['reports/zap-before.html', 'reports/zap-after.html'])
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='zap-bench-')
+    try:
+        for source in args.reports:
+            base = os.path.join(tmp, os.path.splitext(os.path.basename(source))[0])
+            scale_html(source, base + '.html', args.scale)
+            reference = parse_report(base + '.html', backend='bs4')
+            write_json(reference, base + '.json')
+            write_xml(reference, base + '.xml')
+
+            runs = [
+                ('html / bs4 html.parser', lambda: parse_report(base + '.html', backend='bs4')),
+                ('html / lxml streaming', lambda: parse_report(base + '.html', backend='lxml')),
+                ('json', lambda: parse_report(base + '.json')),
+                ('xml', lambda: parse_report(base + '.xml')),
+            ]
+            alerts = sum(len(v) for v in reference.values())
+            print(f'\n{os.path.basename(source)} x{args.scale}: {alerts} alerts, '
+                  f'{os.path.getsize(base + ".html") / 1e6:.1f} MB html')
+            print(f"{'backend':<26}{'MB':>8}{'seconds':>10}{'speedup':>9}")
+            baseline = None
+            for (label, fn), ext in zip(runs, ('html', 'html', 'json', 'xml')):
+                seconds, result = _time(fn, args.repeat)
+                if result != reference:
+                    raise AssertionError(f'{label} returned a different summary')
+                baseline = baseline or seconds
+                size = os.path.getsize(f'{base}.{ext}') / 1e6
+                print(f'{label:<26}{size:>8.1f}{seconds:>10.4f}{baseline / seconds:>8.1f}x')
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""
+Benchmarks for blockchain.py mining and chain_store.py validation.
+
+For each difficulty, blocks with different seeds are mined until --seeds blocks or
+--budget seconds, recording hashes/s and the time-to-solution distribution. If the budget
+allows, one extra block per difficulty runs under tracemalloc for peak memory. Chain
+validation throughput is timed on a freshly built store.
+
+    python bench_chain.py --json bench.json
+    python bench_chain.py --baseline bench.json --tolerance 0.1   # exits 1 on a regression
+"""
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import tracemalloc
+
+from blockchain import Block
+from chain_store import build_chain, validate_chain
+
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile: the smallest value with at least pct% of the data at or below it."""
+    rank = math.ceil(pct / 100 * len(sorted_values)) - 1
+    return sorted_values[max(0, min(len(sorted_values) - 1, rank))]
+
+
+def _distribution(values, digits=6):
+    values = sorted(values)
+    return {
+        "mean": round(sum(values) / len(values), digits),
+        "min": round(values[0], digits),
+        "p50": round(_percentile(values, 50), digits),
+        "p90": round(_percentile(values, 90), digits),
+        "p99": round(_percentile(values, 99), digits),
+        "max": round(values[-1], digits),
+    }
+
+
+def _live(difficulty):
+    def report(hashes, seconds):
+        report.called = True
+        print(f"\r  difficulty {difficulty}: {hashes / seconds:,.0f} hash/s", end="", file=sys.stderr, flush=True)
+    report.called = False
+    return report
+
+
+def bench_mining(difficulty, seeds, budget, workers=1, live=False):
+    times, hashes = [], []
+    progress = _live(difficulty) if live else None
+    start = time.perf_counter()
+    for seed in range(seeds):
+        block = Block(f"bench-{difficulty}-{seed}", "0", difficulty, workers, progress=progress)
+        times.append(block.mining_stats["seconds"])
+        hashes.append(block.mining_stats["hashes"])
+        if time.perf_counter() - start > budget:
+            break
+    if progress is not None and progress.called:
+        print(file=sys.stderr)
+
+    # The traced block counts against the budget too; skip it when the budget is spent
+    peak = None
+    if time.perf_counter() - start < budget:
+        tracemalloc.start()
+        Block(f"bench-{difficulty}-mem", "0", difficulty, workers)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    total = sum(times)
+    return {
+        "difficulty": difficulty,
+        "blocks": len(times),
+        "hashes": sum(hashes),
+        "hashrate": round(sum(hashes) / total) if total else 0,
+        "seconds": _distribution(times),
+        "hashes_per_block": _distribution(hashes, 1),
+        "peak_alloc_kb": round(peak / 1024, 1) if peak is not None else None,
+    }
+
+
+def bench_validation(blocks, workers):
+    tmp = tempfile.mkdtemp(prefix="bench-chain-")
+    try:
+        path = os.path.join(tmp, "chain")
+        build_chain(path, blocks, difficulty=1)
+        results = {"blocks": blocks, "bytes": os.path.getsize(path + ".dat")}
+        # Enough chunks to keep every worker busy
+        chunk = max(1000, blocks // (4 * workers))
+        for label, n in (("single", 1), ("parallel", workers)):
+            start = time.perf_counter()
+            ok, height, reason = validate_chain(path, n, chunk)
+            elapsed = time.perf_counter() - start
+            if not ok:
+                raise RuntimeError(f"benchmark chain invalid at {height}: {reason}")
+            results[label] = {"workers": n, "seconds": round(elapsed, 4), "blocks_per_s": round(blocks / elapsed)}
+        return results
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def compare(current, baseline, tolerance):
+    """Regressions of mining hashrate and validation throughput beyond `tolerance`."""
+    regressions = []
+    base_mining = {m["difficulty"]: m for m in baseline.get("mining", [])}
+    for m in current["mining"]:
+        base = base_mining.get(m["difficulty"])
+        if not base:
+            continue
+        ratio = m["hashrate"] / base["hashrate"] if base["hashrate"] else 1.0
+        print(f"difficulty {m['difficulty']}: hashrate {m['hashrate']:,} vs {base['hashrate']:,} ({ratio:.2f}x)")
+        if ratio < 1 - tolerance:
+            regressions.append(f"difficulty {m['difficulty']} hashrate {ratio:.2f}x of baseline")
+    for label in ("single", "parallel"):
+        cur = current.get("validation", {}).get(label)
+        base = baseline.get("validation", {}).get(label)
+        if cur and base:
+            ratio = cur["blocks_per_s"] / base["blocks_per_s"]
+            print(f"validation ({label}): {cur['blocks_per_s']:,} vs {base['blocks_per_s']:,} blocks/s ({ratio:.2f}x)")
+            if ratio < 1 - tolerance:
+                regressions.append(f"{label} validation {ratio:.2f}x of baseline")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Mining and chain validation benchmarks")
+    ap.add_argument("--difficulties", default="1-6", help="Range like 1-6 or a list like 2,4,5")
+    ap.add_argument("--seeds", type=int, default=20, help="Blocks mined per difficulty")
+    ap.add_argument("--budget", type=float, default=30.0, help="Max seconds of mining per difficulty")
+    ap.add_argument("--workers", type=int, default=1, help="Mining processes per block")
+    ap.add_argument("--validate-blocks", type=int, default=200000, help="Chain length for validation (0 to skip)")
+    ap.add_argument("--validate-workers", type=int, default=os.cpu_count())
+    ap.add_argument("--live", action="store_true", help="Print live hashrate while mining")
+    ap.add_argument("--json", default=None, help="Write results to this file")
+    ap.add_argument("--baseline", default=None, help="Compare against a previous --json result")
+    ap.add_argument("--tolerance", type=float, default=0.1, help="Allowed slowdown vs the baseline")
+    args = ap.parse_args()
+
+    if "-" in args.difficulties:
+        lo, hi = map(int, args.difficulties.split("-"))
+        difficulties = range(lo, hi + 1)
+    else:
+        difficulties = [int(d) for d in args.difficulties.split(",")]
+
+    results = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.time(),
+        "mining": [],
+    }
+    print(f"{'diff':>5}{'blocks':>8}{'hash/s':>14}{'p50 s':>10}{'p90 s':>10}{'max s':>10}{'peak KB':>10}")
+    for difficulty in difficulties:
+        m = bench_mining(difficulty, args.seeds, args.budget, args.workers, args.live)
+        results["mining"].append(m)
+        s = m["seconds"]
+        print(f"{difficulty:>5}{m['blocks']:>8}{m['hashrate']:>14,}{s['p50']:>10.4f}{s['p90']:>10.4f}"
+              f"{s['max']:>10.4f}{m['peak_alloc_kb'] if m['peak_alloc_kb'] is not None else '-':>10}")
+
+    if args.validate_blocks:
+        v = results["validation"] = bench_validation(args.validate_blocks, args.validate_workers)
+        print(f"\nvalidation of {v['blocks']} blocks: {v['single']['blocks_per_s']:,} blocks/s single, "
+              f"{v['parallel']['blocks_per_s']:,} blocks/s with {v['parallel']['workers']} workers")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print()
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
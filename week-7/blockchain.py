@@ -1,33 +1,263 @@
+import os
+import time
 import hashlib
+import argparse
+import multiprocessing as mp
+
+from merkle import MerkleTree
+
+try:
+    # CPython's built-in SHA-256: its copy() is much cheaper than OpenSSL's context copy
+    from _sha2 import sha256 as _sha256
+except ImportError:
+    try:
+        from _sha256 import sha256 as _sha256
+    except ImportError:
+        _sha256 = hashlib.sha256
+
+# Nonces per work unit; workers check for cancellation between units
+CHUNK = 1 << 14
+NO_SOLUTION = (1 << 63) - 1
+# Minimum seconds between calls to a mining progress callback
+PROGRESS_INTERVAL = 0.5
+# Last three decimal digits of a nonce, rendered once
+_LOW_DIGITS = tuple(b"%03d" % i for i in range(1000))
+
+
+def target_bytes(difficulty=None, bits=None):
+    """
+    Digest bound for a difficulty in leading hex zeros or in leading zero bits.
+
+    A hash is valid when digest < target; `difficulty` hex zeros is the same as 4 * difficulty bits.
+    """
+    bits = 4 * difficulty if bits is None else bits
+    if bits <= 0:
+        return b"\xff" * 33  # every 32-byte digest compares lower
+    return (1 << (256 - bits)).to_bytes(33, "big")[1:] if bits < 256 else bytes(32)
+
+
+def scan(content, target, start, stop, progress=None):
+    """
+    First nonce in [start, stop) with sha256(content + str(nonce)) < target, or None.
+
+    The hash state after `content` (and after a nonce's leading digits) is computed once and
+    cloned per attempt, and the raw digest is compared instead of a hex string.
+
+    progress(hashes, seconds), if given, is called at most every PROGRESS_INTERVAL seconds; the
+    clock is only read once per 1000 nonces, so it does not slow the loop down.
+    """
+    base = _sha256(content.encode())
+    nonce = start
+    if progress is not None:
+        t0 = time.perf_counter()
+        next_report = t0 + PROGRESS_INTERVAL
+    # Nonces below 1000 have no shared leading digits
+    while nonce < min(stop, 1000):
+        h = base.copy()
+        h.update(b"%d" % nonce)
+        if h.digest() < target:
+            return nonce
+        nonce += 1
+    while nonce < stop:
+        if progress is not None:
+            now = time.perf_counter()
+            if now >= next_report:
+                progress(nonce - start, now - t0)
+                next_report = now + PROGRESS_INTERVAL
+        high, low = divmod(nonce, 1000)
+        mid = base.copy()
+        mid.update(b"%d" % high)
+        copy = mid.copy
+        for digits in _LOW_DIGITS[low:min(1000, low + stop - nonce)]:
+            h = copy()
+            h.update(digits)
+            if h.digest() < target:
+                return high * 1000 + int(digits)
+        nonce = (high + 1) * 1000
+    return None
+
+
+def reference_mine(content, difficulty):
+    """The original per-attempt loop (concat, encode, hexdigest, startswith), kept for comparison."""
+    prefix = "0" * difficulty
+    nonce = 0
+    while not hashlib.sha256((content + str(nonce)).encode()).hexdigest().startswith(prefix):
+        nonce += 1
+    return nonce
+
 
 class Block:
-    def __init__(self, data, prev_hash, difficulty=4):
+    def __init__(self, data, prev_hash, difficulty=4, workers=1, bits=None, progress=None):
         self.data = data
         self.prev_hash = prev_hash
         self.nonce = 0
         self.difficulty = difficulty
-        self.hash = self.mine_block()
+        # Optional finer-grained difficulty in leading zero bits; overrides `difficulty`
+        self.bits = bits
+        # Set by from_transactions, where `data` is the transactions' Merkle root
+        self.merkle = None
+        self.mining_stats = None
+        self.hash = self.mine_block(workers, progress)
+
+    @classmethod
+    def from_transactions(cls, transactions, prev_hash, difficulty=4, workers=1, bits=None, progress=None):
+        """Mine a block whose payload is the Merkle root of `transactions`."""
+        tree = MerkleTree(transactions)
+        block = cls(tree.root.hex(), prev_hash, difficulty, workers, bits, progress)
+        block.merkle = tree
+        return block
+
+    @property
+    def merkle_root(self):
+        return self.merkle.root.hex() if self.merkle else None
+
+    def prove(self, tx):
+        """Inclusion proof of `tx` against this block's Merkle root, or None if absent."""
+        return self.merkle.prove_transaction(tx) if self.merkle else None
+
+    @classmethod
+    def from_fields(cls, data, prev_hash, nonce, difficulty, hash, bits=None):
+        """Rebuild an already mined block (e.g. read from storage) without mining it again."""
+        block = cls.__new__(cls)
+        block.data = data
+        block.prev_hash = prev_hash
+        block.nonce = nonce
+        block.difficulty = difficulty
+        block.bits = bits
+        block.merkle = None
+        block.mining_stats = None
+        block.hash = hash
+        return block
 
     def calculate_hash(self):
         content = self.data + self.prev_hash + str(self.nonce)
         return hashlib.sha256(content.encode()).hexdigest()
 
-    def mine_block(self):
-        prefix = "0" * self.difficulty
-        while True:
-            hash_attempt = self.calculate_hash()
-            if hash_attempt.startswith(prefix):
-                return hash_attempt
-            self.nonce += 1
-
-# linear equation
-# first_block + "Nonce" = "0000"
-
-# Create blockchain with difficulty
-block1 = Block("First Block", "0")
-block2 = Block("Second Block", block1.hash)
-block3 = Block("Third Block", block2.hash)
-
-# Print chain
-for blk in [block1, block2, block3]:
-    print(f"Data: {blk.data}\nNonce: {blk.nonce}\nHash: {blk.hash}\nPrevHash: {blk.prev_hash}\n")
+    def mine_block(self, workers=1, progress=None):
+        """
+        Find the first nonce whose hash meets the difficulty, using `workers` processes.
+
+        progress(hashes, seconds) is an optional live hashrate hook (see scan).
+        """
+        start = time.perf_counter()
+        content = self.data + self.prev_hash
+        target = target_bytes(self.difficulty, self.bits)
+        if workers == 1:
+            first = self.nonce
+            self.nonce = scan(content, target, first, NO_SOLUTION, progress)
+            hashes = self.nonce - first + 1
+        else:
+            self.nonce, hashes = mine_parallel(content, target, workers, progress)
+        hash_attempt = self.calculate_hash()
+        elapsed = time.perf_counter() - start
+        self.mining_stats = {
+            "workers": workers,
+            "hashes": hashes,
+            "seconds": round(elapsed, 4),
+            "hashrate": round(hashes / elapsed) if elapsed else 0,
+        }
+        return hash_attempt
+
+
+def _search(content, target, index, workers, best, hashes):
+    # Worker `index` takes chunks index, index + workers, ... and stops once its next chunk
+    # starts past the best nonce found so far, so the lowest valid nonce always wins
+    chunk = index
+    count = 0
+    while True:
+        start = chunk * CHUNK
+        stop = min(start + CHUNK, best.value)
+        if start >= stop:
+            break
+        nonce = scan(content, target, start, stop)
+        if nonce is not None:
+            count += nonce - start + 1
+            with best.get_lock():
+                if nonce < best.value:
+                    best.value = nonce
+            break
+        count += stop - start
+        hashes[index] = count
+        chunk += workers
+    hashes[index] = count
+
+
+def mine_parallel(content, target, workers=None, progress=None):
+    """
+    Split the nonce space across worker processes; returns (nonce, hashes tried).
+
+    The result is the lowest valid nonce, i.e. the same one the single-process loop finds.
+    Workers publish their hash counts per chunk, which feed progress(hashes, seconds).
+    """
+    workers = workers or os.cpu_count()
+    best = mp.Value("q", NO_SOLUTION)
+    hashes = mp.Array("q", workers)
+    procs = [mp.Process(target=_search, args=(content, target, i, workers, best, hashes), daemon=True)
+             for i in range(workers)]
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    for p in procs:
+        while p.is_alive():
+            p.join(PROGRESS_INTERVAL if progress else None)
+            if progress is not None:
+                progress(sum(hashes), time.perf_counter() - start)
+    return best.value, sum(hashes)
+
+
+def hashrate_report(max_workers, difficulty, data="Benchmark Block"):
+    """Mine the same block with 1..max_workers processes and print hashrate and speedup."""
+    base = None
+    print(f"{'workers':>8}{'nonce':>12}{'seconds':>10}{'hash/s':>14}{'speedup':>9}")
+    for workers in range(1, max_workers + 1):
+        block = Block(data, "0", difficulty, workers)
+        stats = block.mining_stats
+        base = base or stats["hashrate"]
+        print(f"{workers:>8}{block.nonce:>12}{stats['seconds']:>10}{stats['hashrate']:>14,}"
+              f"{stats['hashrate'] / base:>8.2f}x")
+
+
+def compare_engines(difficulty, data="Benchmark Block"):
+    """Time the original loop against the midstate engine on the same block."""
+    content = data + "0"
+    start = time.perf_counter()
+    nonce = reference_mine(content, difficulty)
+    reference = time.perf_counter() - start
+    block = Block(data, "0", difficulty)
+    assert block.nonce == nonce and block.hash == block.calculate_hash()
+    fast = block.mining_stats["seconds"]
+    print(f"nonce {nonce}: reference loop {(nonce + 1) / reference:,.0f} hash/s, "
+          f"midstate engine {block.mining_stats['hashrate']:,} hash/s ({reference / fast:.1f}x)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Toy proof-of-work blockchain")
+    ap.add_argument("--difficulty", type=int, default=4)
+    ap.add_argument("--workers", type=int, default=1, help="Mining processes per block")
+    ap.add_argument("--bits", type=int, default=None, help="Difficulty in leading zero bits (overrides --difficulty)")
+    ap.add_argument("--hashrate", action="store_true", help="Report hashrate for 1..--workers processes")
+    ap.add_argument("--compare", action="store_true", help="Compare the original loop with the midstate engine")
+    args = ap.parse_args()
+
+    if args.hashrate:
+        hashrate_report(args.workers, args.difficulty)
+        return
+    if args.compare:
+        compare_engines(args.difficulty)
+        return
+
+    # linear equation
+    # first_block + "Nonce" = "0000"
+
+    # Create blockchain with difficulty
+    block1 = Block("First Block", "0", args.difficulty, args.workers, args.bits)
+    block2 = Block("Second Block", block1.hash, args.difficulty, args.workers, args.bits)
+    block3 = Block("Third Block", block2.hash, args.difficulty, args.workers, args.bits)
+
+    # Print chain
+    for blk in [block1, block2, block3]:
+        print(f"Data: {blk.data}\nNonce: {blk.nonce}\nHash: {blk.hash}\nPrevHash: {blk.prev_hash}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+"""
+Append-only on-disk store for blockchain.py blocks, with parallel chain validation.
+
+A store at PATH is three files:
+
+    PATH.dat   records: fixed 84-byte header + data section, appended in height order
+    PATH.idx   little-endian uint64 record offsets, one per height (memory-mapped)
+    PATH.hidx  open-addressing hash table: 8-byte hash prefix -> height + 1 (memory-mapped)
+
+Record header: hash (32 raw bytes), prev_hash (32 raw bytes), nonce (u64), difficulty (u16),
+bits (u16, 0xffff = unset), prev_len (u16), reserved (u16), data_len (u32). prev_hash is stored
+raw when it is a 64-char hex digest; anything else (the genesis "0") goes verbatim at the start
+of the data section, with prev_len giving its length.
+
+    python chain_store.py build chain --blocks 1000000 --difficulty 1
+    python chain_store.py validate chain --workers 8
+"""
+import os
+import sys
+import mmap
+import time
+import struct
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from blockchain import Block, target_bytes
+
+HEADER = struct.Struct("<32s32sQHHHHI")
+OFFSET = struct.Struct("<Q")
+SLOT = struct.Struct("<QQ")
+HIDX_HEADER = struct.Struct("<4s4xQ")
+HIDX_MAGIC = b"CHX1"
+NO_BITS = 0xFFFF
+_HEX = set("0123456789abcdef")
+
+
+def _map(path):
+    """Read-only map of a file, or None while it is empty."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _slot_key(raw_hash):
+    return int.from_bytes(raw_hash[:8], "little") or 1  # 0 marks an empty slot
+
+
+def _complete_records(path):
+    """
+    (number of records, end of the last one) for the records that are complete on disk. Read-only.
+
+    A crash between the data and index writes leaves unindexed bytes at the end of .dat, or index
+    entries whose record never fully reached .dat; both tails are ignored here.
+    """
+    count = os.path.getsize(path + ".idx") // OFFSET.size
+    if not count:
+        return 0, 0
+    dat_size = os.path.getsize(path + ".dat")
+    dat, idx = _map(path + ".dat"), _map(path + ".idx")
+    try:
+        while count:
+            offset = OFFSET.unpack_from(idx, (count - 1) * OFFSET.size)[0]
+            if offset + HEADER.size <= dat_size:
+                header = HEADER.unpack_from(dat, offset)
+                end = offset + HEADER.size + header[5] + header[7]  # + prev_len + data_len
+                if end <= dat_size:
+                    return count, end
+            count -= 1
+        return 0, 0
+    finally:
+        for m in (dat, idx):
+            if m is not None:
+                m.close()
+
+
+def pack_block(block):
+    """Serialize a Block into one record."""
+    prev = block.prev_hash
+    data = block.data.encode()
+    if len(prev) == 64 and set(prev) <= _HEX:
+        prev_raw, literal = bytes.fromhex(prev), b""
+    else:
+        prev_raw, literal = bytes(32), prev.encode()
+    bits = NO_BITS if block.bits is None else block.bits
+    header = HEADER.pack(bytes.fromhex(block.hash), prev_raw, block.nonce, block.difficulty, bits,
+                         len(literal), 0, len(data))
+    return header + literal + data
+
+
+def unpack_block(buf, offset):
+    """Parse the record at `offset`; returns (Block, offset of the next record)."""
+    raw_hash, prev_raw, nonce, difficulty, bits, prev_len, _, data_len = HEADER.unpack_from(buf, offset)
+    start = offset + HEADER.size
+    prev = bytes(buf[start:start + prev_len]).decode() if prev_len else prev_raw.hex()
+    data = bytes(buf[start + prev_len:start + prev_len + data_len]).decode()
+    block = Block.from_fields(data, prev, nonce, difficulty, raw_hash.hex(), None if bits == NO_BITS else bits)
+    return block, start + prev_len + data_len
+
+
+class ChainStore:
+    """
+    Append-only chain on disk with O(1) lookup by height (offset index) or by hash (hash table).
+
+    Appends go through buffered files; reads use memory maps that are refreshed after appends.
+    """
+
+    def __init__(self, path, min_slots=1024):
+        self.path = path
+        self.min_slots = min_slots
+        for suffix in (".dat", ".idx"):
+            open(path + suffix, "ab").close()
+        self._dat = open(path + ".dat", "ab")
+        self._idx = open(path + ".idx", "ab")
+        self._dat_map = self._idx_map = None
+        self._recover()
+        self._tip = self.get(len(self) - 1).hash if len(self) else None
+        self._open_hidx()
+
+    # --- files and maps -------------------------------------------------------------
+
+    def _recover(self):
+        # Cut both files back to the last complete record
+        self._count, end = _complete_records(self.path)
+        for suffix, size in ((".idx", self._count * OFFSET.size), (".dat", end)):
+            if os.path.getsize(self.path + suffix) != size:
+                os.truncate(self.path + suffix, size)
+        self._end = end
+
+    def _maps(self):
+        if self._dat_map is None:
+            self._dat.flush()
+            self._idx.flush()
+            self._dat_map = _map(self.path + ".dat")
+            self._idx_map = _map(self.path + ".idx")
+        return self._dat_map, self._idx_map
+
+    def _open_hidx(self):
+        path = self.path + ".hidx"
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                magic, entries = HIDX_HEADER.unpack(f.read(HIDX_HEADER.size).ljust(HIDX_HEADER.size, b"\0"))
+            if magic == HIDX_MAGIC and entries == len(self):
+                self._hidx_file = open(path, "r+b")
+                self._hidx = mmap.mmap(self._hidx_file.fileno(), 0)
+                self._slots = (len(self._hidx) - HIDX_HEADER.size) // SLOT.size
+                return
+        self._rebuild_hidx(max(self.min_slots, 4 * len(self)))
+
+    def _rebuild_hidx(self, slots):
+        slots = 1 << (slots - 1).bit_length()
+        tmp = self.path + ".hidx.tmp"
+        with open(tmp, "wb") as f:
+            f.truncate(HIDX_HEADER.size + slots * SLOT.size)
+        with open(tmp, "r+b") as f:
+            table = mmap.mmap(f.fileno(), 0)
+            dat, idx = self._maps() if len(self) else (None, None)
+            for height in range(len(self)):
+                offset = OFFSET.unpack_from(idx, height * OFFSET.size)[0]
+                self._insert(table, slots, dat[offset:offset + 32], height)
+            HIDX_HEADER.pack_into(table, 0, HIDX_MAGIC, len(self))
+            table.flush()
+            table.close()
+        if getattr(self, "_hidx", None) is not None:
+            self._hidx.close()
+            self._hidx_file.close()
+        os.replace(tmp, self.path + ".hidx")
+        self._hidx_file = open(self.path + ".hidx", "r+b")
+        self._hidx = mmap.mmap(self._hidx_file.fileno(), 0)
+        self._slots = slots
+
+    @staticmethod
+    def _insert(table, slots, raw_hash, height):
+        key = _slot_key(raw_hash)
+        i = key & (slots - 1)
+        while SLOT.unpack_from(table, HIDX_HEADER.size + i * SLOT.size)[1]:
+            i = (i + 1) & (slots - 1)
+        SLOT.pack_into(table, HIDX_HEADER.size + i * SLOT.size, key, height + 1)
+
+    # --- public API -----------------------------------------------------------------
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def tip(self):
+        return self._tip
+
+    def append(self, block):
+        """Append a block whose prev_hash is the current tip (any prev_hash for the first block)."""
+        if self._tip is not None and block.prev_hash != self._tip:
+            raise ValueError(f"prev_hash {block.prev_hash!r} does not match the chain tip {self._tip!r}")
+        record = pack_block(block)
+        self._dat.write(record)
+        self._idx.write(OFFSET.pack(self._end))
+        self._end += len(record)
+        height = self._count
+        self._count += 1
+        self._tip = block.hash
+        self._dat_map = self._idx_map = None
+
+        if 2 * self._count > self._slots:
+            self._rebuild_hidx(4 * self._count)
+        else:
+            self._insert(self._hidx, self._slots, record[:32], height)
+            HIDX_HEADER.pack_into(self._hidx, 0, HIDX_MAGIC, self._count)
+        return height
+
+    def extend(self, blocks):
+        for block in blocks:
+            self.append(block)
+
+    def offset(self, height):
+        if not 0 <= height < len(self):
+            raise IndexError(height)
+        return OFFSET.unpack_from(self._maps()[1], height * OFFSET.size)[0]
+
+    def get(self, height):
+        """Block at `height` (negative heights count from the tip)."""
+        if height < 0:
+            height += len(self)
+        offset = self.offset(height)
+        return unpack_block(self._maps()[0], offset)[0]
+
+    def find(self, block_hash):
+        """Height of the block with this hex hash, or None."""
+        raw = bytes.fromhex(block_hash)
+        key = _slot_key(raw)
+        i = key & (self._slots - 1)
+        while True:
+            slot_key, value = SLOT.unpack_from(self._hidx, HIDX_HEADER.size + i * SLOT.size)
+            if not value:
+                return None
+            if slot_key == key:
+                offset = self.offset(value - 1)
+                if self._maps()[0][offset:offset + 32] == raw:
+                    return value - 1
+            i = (i + 1) & (self._slots - 1)
+
+    def get_by_hash(self, block_hash):
+        height = self.find(block_hash)
+        return None if height is None else self.get(height)
+
+    def flush(self):
+        self._dat.flush()
+        self._idx.flush()
+        self._hidx.flush()
+
+    def close(self):
+        self.flush()
+        for m in (self._dat_map, self._idx_map, self._hidx):
+            if m is not None:
+                m.close()
+        self._dat_map = self._idx_map = None
+        self._hidx_file.close()
+        self._dat.close()
+        self._idx.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- validation -----------------------------------------------------------------------
+
+def _validate_range(path, start, stop):
+    """Check heights [start, stop); returns (height, reason) for the first bad block, or None."""
+    dat, idx = _map(path + ".dat"), _map(path + ".idx")
+    try:
+        offset = OFFSET.unpack_from(idx, start * OFFSET.size)[0]
+        prev_hash = None
+        if start:
+            prev_offset = OFFSET.unpack_from(idx, (start - 1) * OFFSET.size)[0]
+            prev_hash = dat[prev_offset:prev_offset + 32]
+        targets = {}
+        sha256 = hashlib.sha256
+        unpack_from = HEADER.unpack_from
+        for height in range(start, stop):
+            raw_hash, prev_raw, nonce, difficulty, bits, prev_len, _, data_len = unpack_from(dat, offset)
+            body = offset + HEADER.size
+            if prev_len:
+                if height:
+                    return height, "prev_hash does not link to the previous block"
+                prev = dat[body:body + prev_len]
+            else:
+                if height and prev_raw != prev_hash:
+                    return height, "prev_hash does not link to the previous block"
+                prev = prev_raw.hex().encode()
+            end = body + prev_len + data_len
+            digest = sha256(dat[body + prev_len:end] + prev + b"%d" % nonce).digest()
+            if digest != raw_hash:
+                return height, "hash does not match the block contents"
+            key = (difficulty, bits)
+            target = targets.get(key)
+            if target is None:
+                target = targets[key] = target_bytes(difficulty, None if bits == NO_BITS else bits)
+            if digest >= target:
+                return height, "hash does not meet the difficulty target"
+            prev_hash = raw_hash
+            offset = end
+        return None
+    finally:
+        dat.close()
+        idx.close()
+
+
+def validate_chain(path, workers=None, chunk=100000):
+    """
+    Recompute every block hash and check difficulty and prev_hash links, in parallel chunks.
+
+    Returns (True, None, None) or (False, first bad height, reason). The store is only read:
+    an incomplete tail left by a crash is skipped here and cut off the next time it is opened
+    for writing. Raises FileNotFoundError if there is no store at `path`.
+    """
+    for suffix in (".dat", ".idx"):
+        if not os.path.isfile(path + suffix):
+            raise FileNotFoundError(f"No chain store at {path} ({path + suffix} is missing)")
+    total = _complete_records(path)[0]
+    ranges = [(start, min(start + chunk, total)) for start in range(0, total, chunk)]
+    if workers == 1 or len(ranges) <= 1:
+        failures = (_validate_range(path, a, b) for a, b in ranges)
+        return _first_failure(failures)
+    with ProcessPoolExecutor(workers) as pool:
+        failures = pool.map(_validate_range, [path] * len(ranges), *zip(*ranges))
+        result = _first_failure(failures)
+        # Chunks after the first failure no longer matter
+        pool.shutdown(cancel_futures=True)
+    return result
+
+
+def _first_failure(failures):
+    for failure in failures:
+        if failure is not None:
+            return (False,) + failure
+    return True, None, None
+
+
+def build_chain(path, blocks, difficulty=1, bits=None):
+    """Mine `blocks` synthetic blocks onto the store at `path`."""
+    with ChainStore(path) as store:
+        prev = store.tip or "0"
+        for i in range(len(store), len(store) + blocks):
+            block = Block(f"Block {i}", prev, difficulty, bits=bits)
+            store.append(block)
+            prev = block.hash
+        return len(store)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Append-only chain store")
+    sub = ap.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("build", help="Mine synthetic blocks onto a store")
+    b.add_argument("path")
+    b.add_argument("--blocks", type=int, default=10000)
+    b.add_argument("--difficulty", type=int, default=1)
+    b.add_argument("--bits", type=int, default=None)
+    v = sub.add_parser("validate", help="Validate every block of a store")
+    v.add_argument("path")
+    v.add_argument("--workers", type=int, default=None)
+    v.add_argument("--chunk", type=int, default=100000)
+    args = ap.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "build":
+        total = build_chain(args.path, args.blocks, args.difficulty, args.bits)
+        print(f"{total} blocks in {args.path} ({args.blocks} mined in {time.perf_counter() - start:.1f}s)")
+        return
+    try:
+        ok, height, reason = validate_chain(args.path, args.workers, args.chunk)
+    except FileNotFoundError as e:
+        sys.exit(str(e))
+    elapsed = time.perf_counter() - start
+    blocks = _complete_records(args.path)[0]
+    print(f"{blocks} blocks validated in {elapsed:.2f}s ({blocks / elapsed:,.0f} blocks/s)")
+    if not ok:
+        print(f"INVALID at height {height}: {reason}")
+        sys.exit(1)
+    print("Chain is valid")
+
+
+if __name__ == "__main__":
+    main()
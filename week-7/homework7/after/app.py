@@ -1,14 +1,21 @@
 from flask import Flask, request, jsonify
 import os
-import subprocess
-import ast
-import ipaddress
+from safe_calc import evaluate, ExpressionError
+from pinger import Pinger, parse_ip
 
 app = Flask(__name__)
 
 # Retrieve password from environment variable instead of hardcoding
 PASSWORD = os.environ.get('PASSWORD', 'default_password')
 
+# Shared async pinger: bounded concurrency, per-target timeout, short-lived cache per IP
+pinger = Pinger(
+    concurrency=int(os.environ.get('PING_CONCURRENCY', '64')),
+    timeout=float(os.environ.get('PING_TIMEOUT', '2')),
+    cache_ttl=float(os.environ.get('PING_CACHE_TTL', '5')),
+)
+PING_BATCH_MAX = int(os.environ.get('PING_BATCH_MAX', '512'))
+
 @app.route('/')
 def hello():
     name = request.args.get('name', 'World')
@@ -21,21 +28,45 @@ def hello():
 def ping():
     ip = request.args.get('ip')
     try:
-        ipaddress.ip_address(ip)  # Validate IP address
-        result = subprocess.check_output(["ping", "-c", "1", ip])
-        return result
+        ip = parse_ip(ip)  # Validate IP address
     except ValueError:
         return jsonify({"error": "Invalid IP address"}), 400
+    result = pinger.ping(ip)
+    if result["error"] == "timeout":
+        return jsonify({"error": "Ping timed out"}), 504
+    if not result["alive"]:
+        return jsonify({"error": "Host unreachable"}), 502
+    return result["output"]
+
+# Ping many validated addresses in parallel; body: {"ips": ["10.0.0.1", ...]}
+@app.route('/ping/batch', methods=['POST'])
+def ping_batch():
+    payload = request.get_json(silent=True)
+    ips = payload.get('ips') if isinstance(payload, dict) else None
+    if not isinstance(ips, list) or not ips:
+        return jsonify({"error": "Expected a JSON body with a non-empty 'ips' list"}), 400
+    if len(ips) > PING_BATCH_MAX:
+        return jsonify({"error": f"At most {PING_BATCH_MAX} addresses per batch"}), 400
+    valid, invalid = [], []
+    for ip in ips:
+        try:
+            valid.append(parse_ip(ip))
+        except ValueError:
+            invalid.append(ip)
+    if invalid:
+        return jsonify({"error": "Invalid IP address", "invalid": invalid}), 400
+    results = pinger.ping_many(valid)
+    return jsonify({ip: {k: v for k, v in r.items() if k != "output"} for ip, r in results.items()})
 
-# Secure calculate route using ast.literal_eval instead of eval
+# Secure calculate route: whitelisted arithmetic compiled by safe_calc instead of eval
 @app.route('/calculate')
 def calculate():
     expression = request.args.get('expr')
     try:
-        result = ast.literal_eval(expression)
+        result = evaluate(expression)
         return str(result)
-    except (SyntaxError, ValueError):
-        return jsonify({"error": "Invalid expression"}), 400
+    except ExpressionError as e:
+        return jsonify({"error": "Invalid expression", "detail": str(e)}), 400
 
 if __name__ == '__main__':
     app.run(host='127.0.0.1', port=5000)
\ No newline at end of file
@@ -1,14 +1,40 @@
 import os
+import sys
 import json
+import time
 import yaml
-import subprocess
+import difflib
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
 # Paths to files (adjust as necessary)
 DAEMON_JSON_PATH = '/etc/docker/daemon.json'
 DOCKERFILE_PATH = 'Dockerfile'
 DOCKER_COMPOSE_PATH = 'docker-compose.yml'
 
-def update_daemon_json():
+# Fleet mode: file names treated as targets, and directories never descended into
+COMPOSE_NAMES = ('docker-compose.yml', 'docker-compose.yaml', 'compose.yml', 'compose.yaml')
+TARGET_NAMES = ('Dockerfile',) + COMPOSE_NAMES
+SKIP_DIRS = {'.git', 'node_modules', '.venv', 'venv', '__pycache__'}
+STATE_PATH = '.docker-hardening.json'
+
+USER_LINE = 'RUN adduser -D appuser\n'
+HEALTHCHECK_LINE = 'HEALTHCHECK --interval=30s --timeout=10s CMD curl -f http://localhost:5000/ || exit 1\n'
+SWITCH_USER_LINE = 'USER appuser\n'
+SERVICE_SETTINGS = {
+    'mem_limit': '512m',
+    'read_only': True,
+    'security_opt': ['no-new-privileges:true'],
+    'pids_limit': 100,
+}
+
+def _print_diff(old, new, path):
+    sys.stdout.write(''.join(difflib.unified_diff(
+        old.splitlines(keepends=True), new.splitlines(keepends=True),
+        fromfile=f"a/{path.lstrip('/')}", tofile=f"b/{path.lstrip('/')}")))
+
+def update_daemon_json(dry_run=False):
     """Update or create daemon.json with security settings."""
     settings = {
         "icc": False,
@@ -16,49 +42,213 @@ def update_daemon_json():
         "live-restore": True,
         "userland-proxy": False
     }
+    old_text = ''
     if os.path.exists(DAEMON_JSON_PATH):
         with open(DAEMON_JSON_PATH, 'r') as f:
-            current_settings = json.load(f)
+            old_text = f.read()
+        current_settings = json.loads(old_text)
         current_settings.update(settings)
     else:
         current_settings = settings
+    if dry_run:
+        _print_diff(old_text, json.dumps(current_settings, indent=4) + '\n', DAEMON_JSON_PATH)
+        return
     with open(DAEMON_JSON_PATH, 'w') as f:
         json.dump(current_settings, f, indent=4)
     print(f"Updated {DAEMON_JSON_PATH} with security settings.")
 
-def update_dockerfile():
+def harden_dockerfile(text):
+    """Return (new_text, changes) with a non-root user and health check added if missing."""
+    lines = text.splitlines(keepends=True)
+    if lines and not lines[-1].endswith('\n'):
+        lines[-1] += '\n'
+    # One pass over the file for all three checks
+    has_user = has_healthcheck = has_switch = False
+    for line in lines:
+        has_user = has_user or 'RUN adduser -D appuser' in line
+        has_healthcheck = has_healthcheck or 'HEALTHCHECK' in line
+        has_switch = has_switch or 'USER appuser' in line
+    changes = []
+    if not has_user:
+        lines.insert(1, USER_LINE)
+        changes.append('add non-root user')
+    if not has_healthcheck:
+        lines.insert(-1, HEALTHCHECK_LINE)
+        changes.append('add HEALTHCHECK')
+    if not has_switch:
+        lines.insert(-1, SWITCH_USER_LINE)
+        changes.append('switch to USER appuser')
+    return (''.join(lines) if changes else text), changes
+
+def harden_compose(text):
+    """Return (new_text, changes) with resource limits, security options and localhost-only ports."""
+    compose_data = yaml.safe_load(text) or {}
+    services = compose_data.get('services') if isinstance(compose_data, dict) else None
+    if not isinstance(services, dict):
+        return text, []
+    changes = []
+    for name, service in services.items():
+        if not isinstance(service, dict):
+            # `web:` with no body, or not a service definition at all: nothing to harden
+            continue
+        for key, value in SERVICE_SETTINGS.items():
+            if service.get(key) != value:
+                service[key] = value
+                changes.append(f'services.{name}.{key} = {value}')
+        for i, port in enumerate(service.get('ports') or []):
+            if isinstance(port, str) and port.startswith('0.0.0.0'):
+                service['ports'][i] = port.replace('0.0.0.0', '127.0.0.1')
+                changes.append(f'services.{name}.ports: {port} -> {service["ports"][i]}')
+    # yaml.dump reformats the whole file, so only rewrite it when a setting actually changed
+    return (yaml.dump(compose_data) if changes else text), changes
+
+def update_dockerfile(dry_run=False):
     """Modify Dockerfile to add non-root user and health check."""
     with open(DOCKERFILE_PATH, 'r') as f:
-        lines = f.readlines()
-    # Insert non-root user and health check if not present
-    if not any('RUN adduser -D appuser' in line for line in lines):
-        lines.insert(1, 'RUN adduser -D appuser\n')
-    if not any('HEALTHCHECK' in line for line in lines):
-        lines.insert(-1, 'HEALTHCHECK --interval=30s --timeout=10s CMD curl -f http://localhost:5000/ || exit 1\n')
-    if not any('USER appuser' in line for line in lines):
-        lines.insert(-1, 'USER appuser\n')
-    with open(DOCKERFILE_PATH, 'w') as f:
-        f.writelines(lines)
-    print(f"Updated {DOCKERFILE_PATH} with non-root user and health check.")
-
-def update_docker_compose():
+        old_text = f.read()
+    text, changes = harden_dockerfile(old_text)
+    if changes and dry_run:
+        _print_diff(old_text, text, DOCKERFILE_PATH)
+    elif changes:
+        with open(DOCKERFILE_PATH, 'w') as f:
+            f.write(text)
+        print(f"Updated {DOCKERFILE_PATH} with non-root user and health check.")
+    else:
+        print(f"{DOCKERFILE_PATH} already hardened.")
+
+def update_docker_compose(dry_run=False):
     """Update docker-compose.yml with security settings for containers."""
     with open(DOCKER_COMPOSE_PATH, 'r') as f:
-        compose_data = yaml.safe_load(f)
-    for service in compose_data.get('services', {}).values():
-        service['mem_limit'] = '512m'
-        service['read_only'] = True
-        service['security_opt'] = ['no-new-privileges:true']
-        service['pids_limit'] = 100
-        if 'ports' in service:
-            for i, port in enumerate(service['ports']):
-                if port.startswith('0.0.0.0'):
-                    service['ports'][i] = port.replace('0.0.0.0', '127.0.0.1')
-    with open(DOCKER_COMPOSE_PATH, 'w') as f:
-        yaml.dump(compose_data, f)
-    print(f"Updated {DOCKER_COMPOSE_PATH} with security settings.")
+        old_text = f.read()
+    text, changes = harden_compose(old_text)
+    if changes and dry_run:
+        _print_diff(old_text, text, DOCKER_COMPOSE_PATH)
+    elif changes:
+        with open(DOCKER_COMPOSE_PATH, 'w') as f:
+            f.write(text)
+        print(f"Updated {DOCKER_COMPOSE_PATH} with security settings.")
+    else:
+        print(f"{DOCKER_COMPOSE_PATH} already hardened.")
+
+def find_targets(root):
+    """Dockerfiles and compose files under root, sorted by path."""
+    targets = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+        targets.extend(os.path.join(dirpath, name) for name in TARGET_NAMES if name in filenames)
+    return targets
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+def process_file(path, known_digest=None, dry_run=False, label=None):
+    """Harden one file; returns a summary entry (path, status, changes, seconds, digest, diff)."""
+    label = label or path
+    start = time.perf_counter()
+    entry = {'path': path, 'status': 'unchanged', 'changes': []}
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read()
+        digest = _digest(raw)
+        if digest == known_digest:
+            # Same bytes as after the last run that hardened or checked it
+            entry['status'] = 'skipped'
+            entry['digest'] = digest
+        else:
+            text = raw.decode('utf-8')
+            harden = harden_compose if os.path.basename(path) in COMPOSE_NAMES else harden_dockerfile
+            new_text, changes = harden(text)
+            entry['changes'] = changes
+            if changes:
+                entry['status'] = 'changed'
+                if dry_run:
+                    entry['diff'] = ''.join(difflib.unified_diff(
+                        text.splitlines(keepends=True), new_text.splitlines(keepends=True),
+                        fromfile=f'a/{label}', tofile=f'b/{label}'))
+                else:
+                    with open(path, 'w', encoding='utf-8') as f:
+                        f.write(new_text)
+                    digest = _digest(new_text.encode('utf-8'))
+            if not (changes and dry_run):
+                entry['digest'] = digest
+    except Exception as e:
+        # Any failure is reported for this file only; the rest of the fleet carries on
+        entry['status'] = 'error'
+        entry['error'] = f'{type(e).__name__}: {e}'
+    entry['seconds'] = round(time.perf_counter() - start, 6)
+    return entry
+
+def run_fleet(root, workers=None, dry_run=False, state_path=None, summary_path=None):
+    """Harden every target under root in a process pool; returns the JSON summary."""
+    start = time.perf_counter()
+    state_path = state_path or os.path.join(root, STATE_PATH)
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+    targets = find_targets(root)
+    # Keyed relative to root, so the state survives a differently spelled root or working directory
+    keys = [os.path.relpath(path, root) for path in targets]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(process_file, path, state.get(key), dry_run, key)
+                   for path, key in zip(targets, keys)]
+        files = []
+        for path, future in zip(targets, futures):
+            try:
+                files.append(future.result())
+            except Exception as e:  # worker process died
+                files.append({'path': path, 'status': 'error', 'changes': [],
+                              'error': f'{type(e).__name__}: {e}'})
+
+    counts = {}
+    new_state = {}
+    for key, entry in zip(keys, files):
+        counts[entry['status']] = counts.get(entry['status'], 0) + 1
+        if 'digest' in entry:
+            new_state[key] = entry.pop('digest')
+        diff = entry.pop('diff', None)
+        if diff:
+            sys.stdout.write(diff)
+    if not dry_run:
+        # Only files that exist now: entries for removed files (or older path keys) are dropped
+        with open(state_path, 'w') as f:
+            json.dump(new_state, f, indent=2, sort_keys=True)
+
+    summary = {
+        'root': root,
+        'dry_run': dry_run,
+        'files': files,
+        'counts': counts,
+        'seconds': round(time.perf_counter() - start, 4),
+    }
+    if summary_path:
+        with open(summary_path, 'w') as f:
+            json.dump(summary, f, indent=2)
+    return summary
 
 def main():
+    parser = argparse.ArgumentParser(description='Apply Docker security fixes')
+    parser.add_argument('--fleet', metavar='ROOT', help='Harden every Dockerfile and compose file under ROOT')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for --fleet')
+    parser.add_argument('--dry-run', action='store_true', help='Print unified diffs instead of writing files')
+    parser.add_argument('--state', default=None, help=f'Content hash file for --fleet (default ROOT/{STATE_PATH})')
+    parser.add_argument('--summary', default=None, help='Write the --fleet JSON summary to this file')
+    args = parser.parse_args()
+
+    if args.fleet:
+        summary = run_fleet(args.fleet, args.workers, args.dry_run, args.state, args.summary)
+        counts = ', '.join(f'{n} {status}' for status, n in sorted(summary['counts'].items()))
+        print(f"{len(summary['files'])} files under {args.fleet} in {summary['seconds']}s: {counts or 'none found'}",
+              file=sys.stderr)
+        sys.exit(1 if summary['counts'].get('error') else 0)
+
+    if args.dry_run:
+        # Show what would change, write nothing
+        update_daemon_json(dry_run=True)
+        update_dockerfile(dry_run=True)
+        update_docker_compose(dry_run=True)
+        return
+
     print("Applying Docker security fixes...")
     update_daemon_json()
     update_dockerfile()
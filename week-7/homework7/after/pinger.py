@@ -0,0 +1,143 @@
+"""
+Non-blocking ping for the Flask app.
+
+Pings run as asyncio subprocesses on one background event loop shared by all request
+threads. A semaphore caps concurrent pings, each target gets its own timeout, and results
+are cached per IP for a few seconds (concurrent requests for the same IP share one ping).
+Addresses must go through `parse_ip` before they get here; no shell is involved.
+"""
+import re
+import math
+import time
+import asyncio
+import ipaddress
+import threading
+import concurrent.futures
+
+LATENCY_RE = re.compile(rb"time[=<]([\d.]+) ?ms")
+
+
+def parse_ip(value):
+    """Normalized address string; ValueError unless `value` is a string holding an IP address.
+
+    ipaddress also accepts integers (2130706433 is 127.0.0.1), which JSON bodies can carry.
+    """
+    if not isinstance(value, str):
+        raise ValueError(f"{value!r} is not an IP address string")
+    return str(ipaddress.ip_address(value))
+
+
+class Pinger:
+    def __init__(self, concurrency=64, timeout=2.0, cache_ttl=5.0, cache_size=4096, grace=5.0):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.grace = grace  # seconds a batch waits beyond its own share of the semaphore
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._cache = {}  # ip -> (expires_at, result)
+        self._inflight = {}  # ip -> [probe task, waiters], only touched on the loop thread
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        threading.Thread(target=self._loop.run_forever, name="pinger", daemon=True).start()
+
+    def ping(self, ip):
+        """Ping one address; returns a result dict (see _probe)."""
+        return self.ping_many([ip])[ip]
+
+    def ping_many(self, ips):
+        """Ping many addresses concurrently; returns {ip: result}."""
+        ips = list(dict.fromkeys(ips))
+        results, missing = {}, []
+        now = time.monotonic()
+        for ip in ips:
+            cached = self._cache.get(ip)
+            if cached and cached[0] > now:
+                results[ip] = dict(cached[1], cached=True)
+            else:
+                missing.append(ip)
+        if missing:
+            future = asyncio.run_coroutine_threadsafe(self._ping_all(missing), self._loop)
+            # Every probe is bounded by its own timeout; probes beyond `concurrency` wait their turn.
+            # The semaphore is shared with other batches, so this can still run out under load.
+            rounds = math.ceil(len(missing) / self.concurrency)
+            try:
+                results.update(future.result(timeout=self.timeout * (rounds + 1) + self.grace))
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                results.update(self._timed_out(missing))
+        return {ip: results[ip] for ip in ips}
+
+    def _timed_out(self, ips):
+        """Results for a batch that ran out of time: whatever finished meanwhile, else a timeout."""
+        now = time.monotonic()
+        results = {}
+        for ip in ips:
+            cached = self._cache.get(ip)
+            if cached and cached[0] > now:
+                results[ip] = dict(cached[1], cached=False)
+            else:
+                results[ip] = {"alive": False, "latency_ms": None, "error": "timeout", "output": "",
+                               "cached": False}
+        return results
+
+    async def _ping_all(self, ips):
+        results = await asyncio.gather(*(self._ping_shared(ip) for ip in ips))
+        return dict(zip(ips, results))
+
+    async def _ping_shared(self, ip):
+        entry = self._inflight.get(ip)
+        if entry is None:
+            entry = self._inflight[ip] = [asyncio.ensure_future(self._probe(ip)), 0]
+            entry[0].add_done_callback(lambda _: self._forget(ip, entry))
+        entry[1] += 1
+        try:
+            return dict(await asyncio.shield(entry[0]), cached=False)
+        finally:
+            entry[1] -= 1
+            if not entry[1] and not entry[0].done():
+                # Every batch waiting for it was cancelled: free its semaphore slot
+                self._forget(ip, entry)
+                entry[0].cancel()
+
+    def _forget(self, ip, entry):
+        if self._inflight.get(ip) is entry:
+            del self._inflight[ip]
+
+    async def _probe(self, ip):
+        async with self._semaphore:
+            start = time.perf_counter()
+            proc = await asyncio.create_subprocess_exec(
+                "ping", "-c", "1", "-W", str(max(1, math.ceil(self.timeout))), ip,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+            )
+            try:
+                output, _ = await asyncio.wait_for(proc.communicate(), self.timeout)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                result = {"alive": False, "latency_ms": None, "error": "timeout", "output": ""}
+            except asyncio.CancelledError:
+                proc.kill()
+                await proc.wait()
+                raise
+            else:
+                elapsed = (time.perf_counter() - start) * 1000
+                match = LATENCY_RE.search(output)
+                alive = proc.returncode == 0
+                result = {
+                    "alive": alive,
+                    "latency_ms": (float(match.group(1)) if match else round(elapsed, 3)) if alive else None,
+                    "error": None if alive else "unreachable",
+                    "output": output.decode(errors="replace"),
+                }
+        self._store(ip, result)
+        return result
+
+    def _store(self, ip, result):
+        now = time.monotonic()
+        if len(self._cache) >= self.cache_size:
+            for key in [k for k, (expires, _) in self._cache.items() if expires <= now]:
+                del self._cache[key]
+            if len(self._cache) >= self.cache_size:
+                self._cache.pop(next(iter(self._cache)))
+        self._cache[ip] = (now + self.cache_ttl, result)
@@ -0,0 +1,144 @@
+"""
+Safe arithmetic for /calculate.
+
+Expressions are parsed with `ast` and rejected unless every node is a number or one of
++ - * / // % ** (binary) and + - (unary). The checked tree is compiled to bytecode with
+`**` and `*` routed through guards that cap exponents and integer size, and evaluated with
+no builtins. Compiled expressions are kept in an LRU keyed by the expression text.
+
+    python safe_calc.py --bench
+"""
+import ast
+import time
+import argparse
+from functools import lru_cache
+
+MAX_LENGTH = 1000  # characters
+MAX_NODES = 200
+MAX_EXPONENT = 1000
+MAX_INT_BITS = 4096
+CACHE_SIZE = 1024
+
+_BINARY_OPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+_UNARY_OPS = (ast.UAdd, ast.USub)
+
+
+class ExpressionError(ValueError):
+    pass
+
+
+def _check_int(value):
+    if isinstance(value, int) and value.bit_length() > MAX_INT_BITS:
+        raise ExpressionError("Result too large")
+    return value
+
+
+def _pow(base, exponent):
+    if abs(exponent) > MAX_EXPONENT:
+        raise ExpressionError(f"Exponent larger than {MAX_EXPONENT}")
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 \
+            and max(base.bit_length() - 1, 0) * exponent > MAX_INT_BITS:
+        raise ExpressionError("Result too large")
+    return _check_int(base ** exponent)
+
+
+def _mul(left, right):
+    if isinstance(left, int) and isinstance(right, int) \
+            and left.bit_length() + right.bit_length() > MAX_INT_BITS + 1:
+        raise ExpressionError("Result too large")
+    return left * right
+
+
+_GUARDS = {"_pow": _pow, "_mul": _mul, "__builtins__": {}}
+
+
+class _Guard(ast.NodeTransformer):
+    """Replace `a ** b` and `a * b` with calls to the guarded helpers."""
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        for op, name in ((ast.Pow, "_pow"), (ast.Mult, "_mul")):
+            if isinstance(node.op, op):
+                return ast.copy_location(
+                    ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=[node.left, node.right], keywords=[]),
+                    node)
+        return node
+
+
+def _validate(tree):
+    count = 0
+    for node in ast.walk(tree):
+        count += 1
+        if count > MAX_NODES:
+            raise ExpressionError(f"Expression has more than {MAX_NODES} nodes")
+        if isinstance(node, (ast.Expression, ast.operator, ast.unaryop)):
+            ok = isinstance(node, (ast.Expression,) + _BINARY_OPS + _UNARY_OPS)
+        elif isinstance(node, ast.Constant):
+            ok = type(node.value) in (int, float)
+        else:
+            ok = isinstance(node, (ast.BinOp, ast.UnaryOp))
+        if not ok:
+            raise ExpressionError(f"Unsupported syntax: {type(node).__name__}")
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def compile_expression(text):
+    """Parse, check and compile an expression; returns a code object for evaluate_compiled."""
+    if len(text) > MAX_LENGTH:
+        raise ExpressionError(f"Expression longer than {MAX_LENGTH} characters")
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except (SyntaxError, RecursionError, MemoryError):
+        raise ExpressionError("Invalid expression") from None
+    _validate(tree)
+    tree = ast.fix_missing_locations(_Guard().visit(tree))
+    return compile(tree, "<expression>", "eval")
+
+
+def evaluate_compiled(code):
+    try:
+        result = eval(code, _GUARDS)  # nosec B307 - only whitelisted arithmetic nodes reach here
+    except (ZeroDivisionError, OverflowError) as e:
+        raise ExpressionError(str(e)) from None
+    if not isinstance(result, (int, float)):
+        raise ExpressionError("Result is not a real number")
+    return _check_int(result)
+
+
+def evaluate(text):
+    """Evaluate an arithmetic expression such as '2*(3+4)'; raises ExpressionError (a ValueError)."""
+    if not isinstance(text, str):
+        raise ExpressionError("Missing expression")
+    return evaluate_compiled(compile_expression(text))
+
+
+def benchmark(expressions, rounds=10000):
+    """Evaluations/s for repeated expressions: LRU-cached compiled code vs. parsing every time."""
+    uncached = compile_expression.__wrapped__
+    compile_expression.cache_clear()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in expressions:
+            evaluate_compiled(uncached(text))
+    reparse = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in expressions:
+            evaluate(text)
+    cached = time.perf_counter() - start
+    total = rounds * len(expressions)
+    return {"evaluations": total, "reparse_per_s": round(total / reparse),
+            "cached_per_s": round(total / cached), "speedup": round(reparse / cached, 1)}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Safe arithmetic evaluator")
+    ap.add_argument("expression", nargs="?")
+    ap.add_argument("--bench", action="store_true", help="Benchmark cached vs. re-parsed evaluation")
+    ap.add_argument("--rounds", type=int, default=10000)
+    args = ap.parse_args()
+    if args.bench:
+        samples = ["2*(3+4)", "1 + 2 * 3 - 4 / 5", "(1.5 + 2.25) ** 2 % 7", "-(2 ** 10) // 3 + 10 % 4 * 8"]
+        print(benchmark(samples, args.rounds))
+    else:
+        print(evaluate(args.expression))
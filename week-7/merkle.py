@@ -0,0 +1,193 @@
+"""
+Merkle trees over block transactions, with O(log n) inclusion proofs.
+
+Each level is stored as one flat bytes object of concatenated 32-byte hashes, so a node is a
+slice and a parent hashes the contiguous slice holding both of its children. Leaves and inner
+nodes are domain-separated (0x00 / 0x01 prefix), and an odd node at the end of a level is
+promoted unchanged instead of being paired with a copy of itself.
+
+    python merkle.py --transactions 100000 --proofs 10000
+"""
+import time
+import random
+import hashlib
+import argparse
+from collections import namedtuple
+
+LEAF = b"\x00"
+NODE = b"\x01"
+HASH_SIZE = 32
+
+# siblings: hashes from the leaf's level upwards; levels where the node was promoted have none
+MerkleProof = namedtuple("MerkleProof", ["index", "leaf_count", "siblings"])
+
+
+def _encode(tx):
+    return tx if isinstance(tx, (bytes, bytearray)) else str(tx).encode()
+
+
+def leaf_hash(tx):
+    return hashlib.sha256(LEAF + _encode(tx)).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(NODE + left + right).digest()
+
+
+def _parent_level(level):
+    count = len(level) // HASH_SIZE
+    pairs = count // 2
+    base = hashlib.sha256(NODE)
+    copy = base.copy
+    view = memoryview(level)
+    parents = []
+    append = parents.append
+    for start in range(0, pairs * 2 * HASH_SIZE, 2 * HASH_SIZE):
+        h = copy()
+        h.update(view[start:start + 2 * HASH_SIZE])
+        append(h.digest())
+    if count % 2:
+        append(level[-HASH_SIZE:])
+    return b"".join(parents)
+
+
+class MerkleTree:
+    def __init__(self, transactions):
+        transactions = [_encode(tx) for tx in transactions]
+        if not transactions:
+            raise ValueError("a Merkle tree needs at least one transaction")
+        leaf_base = hashlib.sha256(LEAF)
+        leaves = []
+        for tx in transactions:
+            h = leaf_base.copy()
+            h.update(tx)
+            leaves.append(h.digest())
+        self.leaf_count = len(transactions)
+        self.levels = [b"".join(leaves)]
+        while len(self.levels[-1]) > HASH_SIZE:
+            self.levels.append(_parent_level(self.levels[-1]))
+        self._positions = None
+        self._transactions = transactions
+
+    @property
+    def root(self):
+        return self.levels[-1]
+
+    def leaf(self, index):
+        return self.levels[0][index * HASH_SIZE:(index + 1) * HASH_SIZE]
+
+    def proof(self, index):
+        """Inclusion proof for the transaction at `index`."""
+        if not 0 <= index < self.leaf_count:
+            raise IndexError(index)
+        siblings = []
+        i = index
+        for level in self.levels[:-1]:
+            sibling = i ^ 1
+            if sibling * HASH_SIZE < len(level):
+                siblings.append(level[sibling * HASH_SIZE:(sibling + 1) * HASH_SIZE])
+            i >>= 1
+        return MerkleProof(index, self.leaf_count, siblings)
+
+    def proofs(self, indices):
+        """Proofs for many transactions, built one level at a time."""
+        indices = list(indices)
+        for index in indices:
+            if not 0 <= index < self.leaf_count:
+                raise IndexError(index)
+        siblings = [[] for _ in indices]
+        positions = indices
+        for level in self.levels[:-1]:
+            size = len(level)
+            for path, i in zip(siblings, positions):
+                start = (i ^ 1) * HASH_SIZE
+                if start < size:
+                    path.append(level[start:start + HASH_SIZE])
+            positions = [i >> 1 for i in positions]
+        return [MerkleProof(index, self.leaf_count, path) for index, path in zip(indices, siblings)]
+
+    def index_of(self, tx):
+        """Position of a transaction (first occurrence), or None."""
+        if self._positions is None:
+            self._positions = {}
+            for i, t in enumerate(self._transactions):
+                self._positions.setdefault(t, i)
+        return self._positions.get(_encode(tx))
+
+    def prove_transaction(self, tx):
+        index = self.index_of(tx)
+        return None if index is None else self.proof(index)
+
+
+def verify_proof(tx, proof, root):
+    """True if `tx` is at proof.index in a tree with this root."""
+    if not 0 <= proof.index < proof.leaf_count:
+        return False
+    h = leaf_hash(tx)
+    i, count = proof.index, proof.leaf_count
+    siblings = proof.siblings
+    used = 0
+    while count > 1:
+        if i ^ 1 < count:
+            if used == len(siblings):
+                return False
+            sibling = siblings[used]
+            used += 1
+            h = node_hash(sibling, h) if i & 1 else node_hash(h, sibling)
+        i >>= 1
+        count = (count + 1) // 2
+    return used == len(siblings) and h == root
+
+
+def verify_proofs(transactions, proofs, root):
+    """Verify a batch of (transaction, proof) pairs against one root; False if the counts differ."""
+    transactions, proofs = list(transactions), list(proofs)
+    if len(transactions) != len(proofs):
+        return False
+    return all(verify_proof(tx, proof, root) for tx, proof in zip(transactions, proofs))
+
+
+def benchmark(transactions=100000, proofs=10000, seed=0):
+    rng = random.Random(seed)
+    txs = [f"tx-{i}:{rng.getrandbits(64):016x}" for i in range(transactions)]
+    indices = [rng.randrange(transactions) for _ in range(proofs)]
+
+    start = time.perf_counter()
+    tree = MerkleTree(txs)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    single = [tree.proof(i) for i in indices]
+    single_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = tree.proofs(indices)
+    batch_time = time.perf_counter() - start
+    assert batch == single
+
+    start = time.perf_counter()
+    assert verify_proofs([txs[i] for i in indices], batch, tree.root)
+    verify_time = time.perf_counter() - start
+
+    return {
+        "transactions": transactions,
+        "depth": len(tree.levels) - 1,
+        "build_ms": round(build * 1000, 2),
+        "proof_us": round(single_time / proofs * 1e6, 2),
+        "batch_proof_us": round(batch_time / proofs * 1e6, 2),
+        "verify_us": round(verify_time / proofs * 1e6, 2),
+        "proof_bytes": HASH_SIZE * len(batch[0].siblings),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Merkle tree benchmark")
+    ap.add_argument("--transactions", type=int, default=100000)
+    ap.add_argument("--proofs", type=int, default=10000)
+    args = ap.parse_args()
+    for key, value in benchmark(args.transactions, args.proofs).items():
+        print(f"{key:>16}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Tests for merkle.py.
+
+    python -m pytest test_merkle.py
+"""
+import unittest
+
+from merkle import MerkleProof, MerkleTree, verify_proof, verify_proofs
+
+
+class MerkleTest(unittest.TestCase):
+    def setUp(self):
+        self.txs = [f"tx-{i}" for i in range(7)]  # odd counts promote a node on some levels
+        self.tree = MerkleTree(self.txs)
+
+    def test_every_proof_verifies(self):
+        for i, tx in enumerate(self.txs):
+            self.assertTrue(verify_proof(tx, self.tree.proof(i), self.tree.root), i)
+
+    def test_batch_proofs_match_single_proofs(self):
+        indices = [6, 0, 3, 3]
+        self.assertEqual(self.tree.proofs(indices), [self.tree.proof(i) for i in indices])
+
+    def test_rejects_wrong_transaction_or_root(self):
+        proof = self.tree.proof(2)
+        self.assertFalse(verify_proof("tx-3", proof, self.tree.root))
+        self.assertFalse(verify_proof("tx-2", proof, MerkleTree(["other"]).root))
+        self.assertFalse(verify_proof("tx-2", MerkleProof(2, 7, proof.siblings[:-1]), self.tree.root))
+        self.assertFalse(verify_proof("tx-2", MerkleProof(9, 7, proof.siblings), self.tree.root))
+
+    def test_verify_proofs(self):
+        proofs = self.tree.proofs(range(len(self.txs)))
+        self.assertTrue(verify_proofs(self.txs, proofs, self.tree.root))
+        self.assertFalse(verify_proofs(self.txs[::-1], proofs, self.tree.root))
+
+    def test_verify_proofs_count_mismatch(self):
+        proofs = self.tree.proofs(range(len(self.txs)))
+        self.assertFalse(verify_proofs(self.txs, [], self.tree.root))
+        self.assertFalse(verify_proofs(self.txs, proofs[:-1], self.tree.root))
+        self.assertFalse(verify_proofs(self.txs[:-1], proofs, self.tree.root))
+        self.assertFalse(verify_proofs(iter(self.txs), iter(proofs[:3]), self.tree.root))
+
+
+if __name__ == "__main__":
+    unittest.main()